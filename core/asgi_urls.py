@@ -0,0 +1,17 @@
+from django.urls import path
+from movie_app import views
+from .urls import urlpatterns as wsgi_urlpatterns
+
+# ASGI altında aynı URL'ler; sadece upstream bekleyen endpoint'ler async view'lara gider.
+# Sıra korunur (SLUG yolu yine en altta).
+ASYNC_VIEWS = {
+    'analyze': views.aanalyze_movie,
+    'analysis_stream': views.aanalysis_stream,
+    'autocomplete': views.aautocomplete_movies,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if getattr(pattern, 'name', None) in ASYNC_VIEWS else pattern
+    for pattern in wsgi_urlpatterns
+]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En dışta: tüm isteğin süresini ölçer, Server-Timing başlığını ekler
+    'movie_app.metrics.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,7 +53,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'core.urls'
+# Aşama süreleri / token / önbellek sayaçları (/metrics/, Server-Timing). False: kayıt yapılmaz
+METRICS_ENABLED = True
+# /metrics/ ve `run_worker --metrics-port` için "Authorization: Bearer <token>". Boşsa /metrics/
+# sadece admin'e giriş yapmış staff kullanıcılara açıktır.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# asgi.py bunu 'core.asgi_urls' yapar: analyze/autocomplete async view'larla servis edilir
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'core.urls')
 
 TEMPLATES = [
     {
@@ -116,3 +126,42 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+# Web, run_worker ve manage.py komutları aynı önbelleği görmeli: worker'ın kaydettiği analiz
+# web process'indeki detay sayfası / ana sayfa önbelleğini düşürebilsin. Dosya tabanlı önbellek
+# aynı sunucudaki tüm process'lerce paylaşılır; birden çok sunucuda Redis/Memcached kullanılmalı.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# Testler paylaşılan önbellek yerine geçici bir dizin kullanır (bkz. movie_app/test_runner.py)
+TEST_RUNNER = 'movie_app.test_runner.DiscoverRunner'
+
+# İndirilen altyazıların sıkıştırılmış arşivi (bkz. movie_app/subtitle_store.py)
+SUBTITLE_STORE_DIR = BASE_DIR / 'subtitle_store'
+
+# Boyutlandırılmış poster kopyaları (bkz. movie_app/posters.py) ve indirilmesine izin verilen sunucular
+POSTER_CACHE_DIR = BASE_DIR / 'poster_cache'
+POSTER_HOSTS = ('m.media-amazon.com', 'ia.media-imdb.com', 'images-na.ssl-images-amazon.com')
+
+# --- ANALİZ MODU ---
+# True: API'leri atlar, sadece ana dizindeki 'test.srt' dosyasını okur.
+# False: Gerçek dünya modu. Altyazı sağlayıcıları aynı anda denenir.
+ANALYSIS_TEST_MODE = os.environ.get('ANALYSIS_TEST_MODE', '') == '1'
+
+# Altyazı yarışına katılan sağlayıcılar (bkz. movie_app/providers.py)
+SUBTITLE_PROVIDERS = ('opensubtitles', 'subliminal')
+
+# Upstream'lerin tüm process'lerce paylaşılan hız sınırı ve günlük kotası (bkz. movie_app/ratelimit.py)
+# rate: saniyede çağrı, burst: art arda yapılabilecek çağrı, daily: UTC günü başına çağrı (yoksa sınırsız)
+UPSTREAM_LIMITS = {
+    'omdb': {'rate': 5, 'burst': 10, 'daily': 1000},    # Ücretsiz anahtar: günde 1000 istek
+    'opensubtitles': {'rate': 1, 'burst': 5},
+    'opensubtitles_download': {'daily': 100},           # İndirme kotası hesap türüne göre değişir
+    'subliminal': {'rate': 1, 'burst': 2},
+    'gemini': {'rate': 1, 'burst': 10},                 # Chunked modun paralel özet çağrıları için burst
+}
@@ -1,6 +1,7 @@
 from django.contrib import admin # Bu satırın olduğundan emin ol
 from django.urls import path
 from movie_app import views
+from movie_app.metrics import metrics_view
 
 urlpatterns = [
     # ADMIN EN ÜSTTE OLMALI
@@ -9,8 +10,13 @@ urlpatterns = [
     # Diğer sabit yollar
     path('', views.index, name='index'),
     path('analyze/', views.analyze_movie, name='analyze'),
+    path('analyze/status/<int:job_id>/', views.analysis_status, name='analysis_status'),
+    path('analyze/stream/<int:job_id>/', views.analysis_stream, name='analysis_stream'),
     path('autocomplete/', views.autocomplete_movies, name='autocomplete'),
+    path('metrics/', metrics_view, name='metrics'),
     path('open/<str:imdb_id>/', views.open_movie_by_id, name='open_movie'),
+    path('poster/<str:variant>/', views.poster, name='poster'),
+    path('transcript/<str:imdb_id>/', views.episode_transcript, name='transcript'),
 
     # SLUG EN ALTTA OLMALI
     path('<slug:slug>/', views.movie_detail, name='movie_detail'),
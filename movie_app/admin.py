@@ -1,16 +1,37 @@
 from django.contrib import admin
-from .models import Movie
+from .models import Movie, AnalysisJob, UpstreamBucket
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
     # Listede görünecek sütunlar
-    list_display = ('title', 'imdb_id', 'slug', 'created_at')
+    list_display = ('title', 'imdb_id', 'slug', 'year', 'analysis_status', 'episode_count', 'created_at')
     
     # Arama yapılacak alanlar
     search_fields = ('title', 'imdb_id', 'slug')
     
-    # Filtreleme
-    list_filter = ('created_at',)
+    # Filtreleme (indeksli kolonlar)
+    list_filter = ('analysis_status', 'created_at')
+    readonly_fields = ('analysis_status', 'analyzed_at', 'episode_count', 'poster_url', 'year')
+
+    def get_queryset(self, request):
+        # Liste sayfası JSON blob'larına ihtiyaç duymaz
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('episode_data', 'movie_info')
+        return queryset
     
     # Otomatik slug oluşturma (Panelde elle yazarken kolaylık sağlar)
-    prepopulated_fields = {'slug': ('title',)}
\ No newline at end of file
+    prepopulated_fields = {'slug': ('title',)}
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('imdb_id', 'status', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('imdb_id',)
+
+
+@admin.register(UpstreamBucket)
+class UpstreamBucketAdmin(admin.ModelAdmin):
+    # Upstream başına bugünkü kota kullanımı (bkz. ratelimit.py)
+    list_display = ('name', 'day', 'used', 'tokens')
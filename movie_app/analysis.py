@@ -0,0 +1,305 @@
+import asyncio
+import os
+import time
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from . import metrics, steps
+from .models import Movie
+from .services import AIService, MovieInfoService
+from .providers import arace_providers, race_providers
+from .splitters import get_splitter, is_error_result, snap_episodes
+from .subtitle_store import find_subtitle, save_subtitle, text_digest
+from .subtitles import parse_subtitle
+from .transcripts import remember_cues
+from .singleflight import SingleFlight, acquire_lease, release_lease, lease_is_held
+from .steps import Step
+
+# Lider worker'ın analizi bitirmesi için tanınan süre (Gemini uzun sürebilir)
+LEASE_SECONDS = 300
+# Takipçilerin liderin sonucunu DB'de bekleme aralığı
+POLL_INTERVAL = 0.5
+
+# Gemini başarısız olursa kullanılacak bölümleme motoru (None: hata sonucu döner)
+FALLBACK_SPLITTER = 'local'
+
+PROVIDER_LABELS = {
+    'opensubtitles': "OpenSubtitles",
+    'subliminal': "Subliminal (Alternatif Kaynaklar)",
+}
+
+_flight = SingleFlight()
+
+
+class AnalysisError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@metrics.timed('db_read')
+def analyzed_movie(imdb_id):
+    """Analizi tamamlanmış film kaydı; yoksa None. İndeksli durum kolonu ile tek sorgu."""
+    return (Movie.objects.filter(imdb_id=imdb_id, analysis_status=Movie.DONE)
+            .only('imdb_id', 'episode_data', 'movie_info').first())
+
+
+@metrics.timed('db_read')
+async def aanalyzed_movie(imdb_id):
+    return await (Movie.objects.filter(imdb_id=imdb_id, analysis_status=Movie.DONE)
+                  .only('imdb_id', 'episode_data', 'movie_info').afirst())
+
+
+def cached_result(movie_obj):
+    """Film daha önce analiz edildiyse veritabanındaki sonucu döner."""
+    if movie_obj and movie_obj.episode_data:
+        return {
+            'source': 'Veritabanı',
+            'episodes': movie_obj.episode_data,
+            'movie_info': movie_obj.movie_info
+        }
+    return None
+
+
+def ensure_movie(imdb_id, info_service=None):
+    """
+    Film kaydını döner; yoksa OMDb'den detaylarını çekip oluşturur.
+    OMDb filmi bulamazsa None döner.
+    """
+    movie = Movie.objects.filter(imdb_id=imdb_id).defer('episode_data').first()
+    if movie and movie.movie_info:
+        return movie
+
+    details = (info_service or MovieInfoService()).get_movie_details(imdb_id)
+    if not details or not details.get('title'):
+        return movie
+
+    if movie:
+        movie.title = movie.title or details['title']
+        movie.movie_info = details
+        movie.save()
+        return movie
+
+    return Movie.objects.create(
+        imdb_id=imdb_id,
+        title=details['title'],
+        movie_info=details,
+        episode_data=[]
+    )
+
+
+def _load_movie(imdb_id):
+    return Movie.objects.filter(imdb_id=imdb_id).defer('episode_data').first()
+
+
+def _offline_subtitle(imdb_id):
+    """Ağa çıkmadan bulunabilen altyazı (arşiv ya da test modu): (metin, etiket) veya None."""
+    if settings.ANALYSIS_TEST_MODE:
+        # TEST MODU: Sadece yerel dosya
+        try:
+            with open(os.path.join(settings.BASE_DIR, 'test.srt'), 'r', encoding='utf-8') as f:
+                return f.read(), "Yerel Test Dosyası"
+        except FileNotFoundError:
+            raise AnalysisError('test.srt bulunamadı.', status=500)
+
+    stored = find_subtitle(imdb_id)
+    metrics.cache_result('subtitle_store', stored is not None)
+    if stored:
+        # ARŞİV: Daha önce indirilmiş altyazı, ağa hiç çıkmadan kullanılır
+        entry, raw_sub = stored
+        return raw_sub, f"{PROVIDER_LABELS.get(entry.provider, entry.provider)} (Arşiv)"
+    return None
+
+
+def _archive_winner(imdb_id, winner):
+    try:
+        # Savepoint: eşzamanlı kayıttan gelen IntegrityError çağıranın transaction'ını bozmasın
+        with transaction.atomic():
+            save_subtitle(imdb_id, winner.provider, winner.text, winner.language)
+    except (OSError, DatabaseError) as e:
+        # Arşive yazılamaması (disk ya da indeks) analizi durdurmasın
+        print(f"Subtitle Store Error: {e}")
+
+
+def _parse_subtitle(imdb_id, raw_sub, ai_service):
+    """
+    Altyazıyı bir kez ayrıştırır: zaman damgalı metin AI'ya, sıralı cue indeksi transkript
+    önbelleğine ve bölüm sınırlarının hizalanmasına gider. (cues, AI metni) döner.
+    """
+    with metrics.stage('clean_subtitle'):
+        cues = parse_subtitle(raw_sub)
+    if not cues:
+        # Zaman kodu olmayan düz metin
+        return None, ai_service.clean_subtitle(raw_sub)
+    remember_cues(imdb_id, cues, text_digest(raw_sub))
+    return cues, cues.to_prompt_text()
+
+
+def _movie_title(movie_info, movie_obj):
+    return (movie_info or {}).get('title') or (movie_obj.title if movie_obj else None)
+
+
+@metrics.timed('db_write')
+def _save_episodes(movie_obj, episodes):
+    if isinstance(episodes, dict) and "error" in episodes:
+        raise AnalysisError(episodes['error'], status=500)
+    if is_error_result(episodes):
+        # Hata sonucu kaydedilmez; AIService negatif önbellek süresi dolunca tekrar dener
+        raise AnalysisError('Yapay zeka analizi başarısız oldu, lütfen biraz sonra tekrar deneyin.', status=503)
+
+    # Sonucu Veritabanına Yaz
+    if movie_obj:
+        movie_obj.episode_data = episodes
+        movie_obj.analyzed_at = None
+        movie_obj.save()
+
+
+def _analysis_flow(imdb_id, on_episode):
+    """
+    run_analysis ve arun_analysis'in ortak akışı (bkz. steps.py). Upstream çağrıları async
+    yolda event loop'u bloklamaz; veritabanı ve dosya işlemleri sync_to_async ile yapılır.
+    """
+    movie_obj = yield Step(_load_movie, imdb_id)
+
+    info_service = MovieInfoService()
+    ai_service = AIService()
+
+    movie_info = movie_obj.movie_info if movie_obj else (
+        yield Step(info_service.get_movie_details, imdb_id, afunc=info_service.aget_movie_details))
+
+    # --- ALTYAZI TEMİN HİYERARŞİSİ ---
+    raw_sub, source_label = (yield Step(_offline_subtitle, imdb_id)) or ("", "")
+    source_latency_ms = None
+
+    if not raw_sub:
+        # GERÇEK MOD: OpenSubtitles ve Subliminal aynı anda yarışır, ilk geçerli altyazı kazanır
+        winner = yield Step(race_providers, imdb_id, _movie_title(movie_info, movie_obj), afunc=arace_providers)
+
+        if winner:
+            raw_sub = winner.text
+            source_label = PROVIDER_LABELS[winner.provider]
+            source_latency_ms = winner.latency_ms
+            yield Step(_archive_winner, imdb_id, winner)
+
+    if not raw_sub:
+        raise AnalysisError('Hiçbir kaynakta uygun altyazı bulunamadı.', status=404)
+
+    # --- AI ANALİZ ---
+    cues, clean_sub = yield Step(_parse_subtitle, imdb_id, raw_sub, ai_service,
+                                 afunc=partial(asyncio.to_thread, _parse_subtitle))
+    episodes = yield Step(ai_service.split_movie_into_episodes, clean_sub, on_episode=on_episode,
+                          afunc=ai_service.asplit_movie_into_episodes)
+
+    if FALLBACK_SPLITTER and is_error_result(episodes):
+        # Gemini hata verdi (kota, zaman aşımı, geçersiz cevap): yerel motorla anında sonuç üret.
+        # Bu geçici sonuç DB'ye yazılmaz; film sonraki istekte Gemini ile tekrar analiz edilir.
+        print(f"⚠️ AI başarısız, yerel bölümleme kullanılıyor: {episodes[0]['title']}")
+        splitter = get_splitter(FALLBACK_SPLITTER)
+        with metrics.stage('local_split'):
+            episodes = yield Step(splitter.split_movie_into_episodes, clean_sub,
+                                  afunc=splitter.asplit_movie_into_episodes)
+        source_label = f"{source_label} · Yerel Bölümleme"
+    else:
+        # AI sınırları saniye hassasiyetinde tahmin eder; en yakın gerçek repliğe hizala
+        episodes = snap_episodes(episodes, cues)
+        yield Step(_save_episodes, movie_obj, episodes)
+
+    return {
+        'source': source_label,
+        'source_latency_ms': source_latency_ms,
+        'episodes': episodes,
+        'movie_info': movie_info
+    }
+
+
+def run_analysis(imdb_id, on_episode=None):
+    """
+    Gelişmiş Analiz Motoru:
+    Altyazıyı arşivden ya da yarışan sağlayıcılardan alır, AI ile bölümlere ayırır ve sonucu kaydeder.
+    on_episode: Gemini cevabı akarken tamamlanan bölümlerle çağrılır (bkz. jobs.execute_job).
+    """
+    return steps.run(_analysis_flow(imdb_id, on_episode))
+
+
+async def arun_analysis(imdb_id, on_episode=None):
+    """run_analysis'in async karşılığı (ASGI / async worker); on_episode coroutine dönebilir."""
+    return await steps.arun(_analysis_flow(imdb_id, on_episode))
+
+
+def _leader_flow(imdb_id, key, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = cached_result((yield Step(analyzed_movie, imdb_id, afunc=aanalyzed_movie)))
+        if result:
+            return result
+        if not (yield Step(lease_is_held, key)):
+            return None
+        yield steps.sleep(POLL_INTERVAL)
+    return None
+
+
+def wait_for_leader(imdb_id, key, timeout):
+    """Başka bir worker analiz yaparken sonucun DB'ye yazılmasını bekler."""
+    return steps.run(_leader_flow(imdb_id, key, timeout))
+
+
+async def await_leader(imdb_id, key, timeout):
+    """wait_for_leader'ın async karşılığı."""
+    return await steps.arun(_leader_flow(imdb_id, key, timeout))
+
+
+def _lease_flow(imdb_id, key):
+    """
+    Analiz lease'ini alır; başka worker'da sürüyorsa liderin sonucunu bekler.
+    (owner, None) ya da liderin sonucu için (None, sonuç) döner.
+    """
+    owner = yield Step(acquire_lease, key, LEASE_SECONDS)
+
+    if owner is None:
+        result = yield Step(wait_for_leader, imdb_id, key, LEASE_SECONDS, afunc=await_leader)
+        if result:
+            return None, result
+        # Lider sonucu kaydedemeden bitti (hata, kayıtsız film): işi biz devralalım
+        owner = yield Step(acquire_lease, key, LEASE_SECONDS)
+        if owner is None:
+            raise AnalysisError('Analiz devam ediyor, lütfen biraz sonra tekrar deneyin.', status=503)
+    return owner, None
+
+
+def _analyze_with_lease(imdb_id, on_episode=None):
+    key = f"analyze:{imdb_id}"
+    owner, result = steps.run(_lease_flow(imdb_id, key))
+    if result:
+        return result
+
+    try:
+        return run_analysis(imdb_id, on_episode=on_episode)
+    finally:
+        release_lease(key, owner)
+
+
+def analyze_single_flight(imdb_id, on_episode=None):
+    """
+    Aynı imdb_id için eşzamanlı istekleri tek analize indirir:
+    process içinde SingleFlight, worker'lar arasında DB lease ile.
+    Ara bölümler sadece liderin on_episode'una gider; takipçiler tam sonucu alır.
+    """
+    return _flight.do(imdb_id, lambda: _analyze_with_lease(imdb_id, on_episode))
+
+
+async def aanalyze_with_lease(imdb_id, on_episode=None):
+    """
+    _analyze_with_lease'in async karşılığı. Aynı process'teki eşzamanlı coroutine'ler de
+    DB lease üzerinden tek analize iner (takipçiler liderin sonucunu bekler).
+    """
+    key = f"analyze:{imdb_id}"
+    owner, result = await steps.arun(_lease_flow(imdb_id, key))
+    if result:
+        return result
+
+    try:
+        return await arun_analysis(imdb_id, on_episode=on_episode)
+    finally:
+        await sync_to_async(release_lease)(key, owner)
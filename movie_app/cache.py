@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+import unidecode
+from django.conf import settings
+
+MISSING = object()
+
+
+def isolated_cache(directory):
+    """
+    Paylaşılan önbellek yerine `directory`'yi kullanan override_settings. Testler ve
+    benchmark'lar çalışan sunucunun önbelleğini okumasın ve silmesin.
+    """
+    from django.test.utils import override_settings
+    return override_settings(CACHES={'default': {**settings.CACHES['default'], 'LOCATION': str(directory)}})
+
+
+def normalize_query(text):
+    """Arama metnini önbellek anahtarına çevirir: aksansız, küçük harf, tek boşluk."""
+    return " ".join(unidecode.unidecode(text or "").lower().split())
+
+
+class TTLCache:
+    """
+    Process içi, thread-safe TTL + LRU önbellek.
+    Kapasite dolunca en uzun süredir kullanılmayan kayıt atılır.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,284 @@
+import csv
+import gzip
+import json
+import random
+import re
+import sys
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from .featured import invalidate_pool
+from .models import Movie
+from .response_cache import INDEX_KEY, invalidate_movie
+from .search_index import local_index
+
+# Büyük bir film kataloğunu (JSONL/CSV/TSV) veritabanına aktarır (bkz. import_catalog komutu).
+# Girdi satır satır okunur ve CHUNK_SIZE'lık parçalar halinde yazılır; bellekte tek bir
+# parça tutulur. Her parça için mevcut filmler ve dolu slug'lar birer sorguyla çekilir,
+# slug'lar Movie.save() ile aynı kuralla bellekte atanır, yazma bulk_create/bulk_update
+# ile tek transaction'da yapılır. bulk_* sinyal göndermez; önbellekler sonda temizlenir.
+CHUNK_SIZE = 2000
+# SQLite'ın sorgu başına parametre sınırının altında kalmak için IN listeleri bölünür
+IN_BATCH = 900
+UPDATE_FIELDS = ['title', 'slug', 'movie_info', 'poster_url', 'year']
+
+IMDB_ID_RE = re.compile(r'^tt\d{5,}$')
+# movie_info alanı -> kaynakta kabul edilen sütun adları: kendi biçimimiz, OMDb cevabı
+# ve IMDb veri setleri (title.basics.tsv)
+FIELD_ALIASES = {
+    'title': ('title', 'Title', 'primaryTitle'),
+    'year': ('year', 'Year', 'startYear'),
+    'poster': ('poster', 'Poster'),
+    'plot': ('plot', 'Plot'),
+    'imdb_rating': ('imdb_rating', 'imdbRating', 'averageRating'),
+    'genre': ('genre', 'Genre', 'genres'),
+    'runtime': ('runtime', 'Runtime', 'runtimeMinutes'),
+}
+ID_ALIASES = ('imdb_id', 'imdbID', 'tconst')
+# IMDb veri setlerinde boş değer
+NULL_VALUES = ('', '\\N')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.tsv'):
+        return 'tsv'
+    return 'jsonl'
+
+
+def open_source(path):
+    """'-' stdin, .gz sıkıştırılmış dosya, diğerleri düz metin."""
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_rows(stream, fmt='jsonl'):
+    """Satır satır sözlük üretir; okunamayan JSON satırı için None (sayılıp atlanır)."""
+    if fmt in ('csv', 'tsv'):
+        yield from csv.DictReader(stream, delimiter='\t' if fmt == 'tsv' else ',')
+        return
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else None
+
+
+def _pick(row, aliases):
+    for name in aliases:
+        value = row.get(name)
+        if value is not None:
+            return None if value in NULL_VALUES else value
+    return None
+
+
+def normalize(row):
+    """Kaynak satırı (imdb_id, movie_info) biçimine çevirir; ID ya da başlık yoksa None."""
+    if not row:
+        return None
+    imdb_id = str(_pick(row, ID_ALIASES) or '').strip()
+    title = str(_pick(row, FIELD_ALIASES['title']) or '').strip()
+    if not IMDB_ID_RE.match(imdb_id) or not title:
+        return None
+    # MovieInfoService._details ile aynı anahtarlar
+    info = {field: _pick(row, aliases) for field, aliases in FIELD_ALIASES.items()}
+    info['title'] = title
+    akas = row.get('aka_titles')
+    if isinstance(akas, list):
+        info['aka_titles'] = akas
+    return imdb_id, info
+
+
+def _in_batches(values):
+    values = list(values)
+    for i in range(0, len(values), IN_BATCH):
+        yield values[i:i + IN_BATCH]
+
+
+class CatalogImporter:
+    """
+    update=False: bilgisi olan filmlere dokunulmaz (ensure_movie gibi); True: bilgileri
+    yenilenir. Başlık ve slug mevcut filmde hiç değişmez, sadece boşsa doldurulur.
+    """
+
+    def __init__(self, update=False, chunk_size=CHUNK_SIZE):
+        self.update = update
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.counts = {'created': 0, 'updated': 0, 'skipped': 0, 'invalid': 0, 'failed': 0}
+
+    def run(self, rows, on_chunk=None):
+        """Tüm satırları aktarır; her parça yazıldıktan sonra on_chunk(importer) çağrılır."""
+        chunk = {}
+        for row in rows:
+            self.rows += 1
+            normalized = normalize(row)
+            if normalized is None:
+                self.counts['invalid'] += 1
+                continue
+            imdb_id, info = normalized
+            if imdb_id in chunk:
+                # Aynı dosyada tekrar eden film: ilk kayıt oluşturur, sonraki onu günceller
+                # (başlık ilk satırdan kalır, bilgiler sonrakinden gelir)
+                if not self.update:
+                    self.counts['skipped'] += 1
+                    continue
+                chunk[imdb_id] = (chunk[imdb_id][0], info)
+            else:
+                chunk[imdb_id] = (info['title'], info)
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = {}
+                if on_chunk:
+                    on_chunk(self)
+        if chunk:
+            self.flush(chunk)
+            if on_chunk:
+                on_chunk(self)
+        self.finish()
+
+    def flush(self, chunk):
+        try:
+            with transaction.atomic():
+                counts, updated = self._write(chunk)
+        except IntegrityError:
+            # Bu arada başka bir process (ör. /open/) aynı filmi ya da slug'ı kaydetti:
+            # güncel duruma göre bir kez daha çöz
+            with transaction.atomic():
+                counts, updated = self._write(chunk)
+        for key, value in counts.items():
+            self.counts[key] += value
+        for movie in updated:
+            invalidate_movie(movie)
+
+    def _write(self, chunk):
+        counts = {'created': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        existing = {}
+        for ids in _in_batches(chunk):
+            movies = Movie.objects.filter(imdb_id__in=ids).only(
+                'id', 'imdb_id', 'title', 'slug', 'movie_info', 'episode_data', 'analyzed_at')
+            existing.update((movie.imdb_id, movie) for movie in movies)
+
+        to_create, to_update, ordered = [], [], []
+        for imdb_id, (title, info) in chunk.items():
+            movie = existing.get(imdb_id)
+            if movie is None:
+                movie = Movie(imdb_id=imdb_id, title=title, movie_info=info, episode_data=[])
+                to_create.append(movie)
+            elif movie.movie_info and not self.update:
+                counts['skipped'] += 1
+                continue
+            else:
+                movie.title = movie.title or title
+                movie.movie_info = info
+                to_update.append(movie)
+            ordered.append(movie)
+
+        # Kaydedilmemiş model örnekleri hash'lenemez; id() ile izlenir
+        failed = {id(movie) for movie in self.assign_slugs(ordered)}
+        counts['failed'] = len(failed)
+        to_create = [movie for movie in to_create if id(movie) not in failed]
+        to_update = [movie for movie in to_update if id(movie) not in failed]
+        for movie in to_create + to_update:
+            movie.sync_denormalized_fields()
+
+        Movie.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        if to_update:
+            Movie.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=500)
+        counts['created'], counts['updated'] = len(to_create), len(to_update)
+        return counts, to_update
+
+    @staticmethod
+    def assign_slugs(movies):
+        """
+        Slug'ı boş filmlere, dosya sırasıyla tek tek save() edilselerdi alacakları slug'ı verir:
+        başlık slug'ı başka bir filmde (DB'de ya da bu parçada) varsa sonuna IMDb ID eklenir.
+        save()'de olduğu gibi ID'li slug da doluysa film kaydedilemez; bu filmler döner.
+        """
+        pending = [(movie, Movie.base_slug(movie.title)) for movie in movies if not movie.slug and movie.title]
+        candidates = set()
+        for movie, base in pending:
+            candidates.add(base)
+            candidates.add(Movie.fallback_slug(base, movie.imdb_id))
+        # slug -> sahibinin id'si; bu parçada atananlar için sahibin kendisi
+        owners = {}
+        for slugs in _in_batches(candidates):
+            owners.update(Movie.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+
+        failed = []
+        for movie, base in pending:
+            owner = movie.pk if movie.pk is not None else id(movie)
+            slug = base
+            # save(): .exclude(id=self.id) — filmin kendi satırı çakışma sayılmaz
+            if owners.get(slug, owner) != owner:
+                slug = Movie.fallback_slug(base, movie.imdb_id)
+                if owners.get(slug, owner) != owner:
+                    failed.append(movie)
+                    continue
+            movie.slug = slug
+            owners[slug] = owner
+        return failed
+
+    def finish(self):
+        """
+        bulk_* sinyal göndermediği için ana sayfa havuzu ve arama indeksi burada tazelenir.
+        Hepsi paylaşılan önbellek üzerinden gider; web process'leri yeniden başlatılmadan görür
+        (yerel arama indeksi en geç search_index.GENERATION_CHECK_INTERVAL saniyede yenilenir).
+        """
+        invalidate_pool()
+        cache.delete(INDEX_KEY)
+        local_index.invalidate()
+
+
+# --- Sentetik katalog (ölçüm için) ---
+
+TITLE_WORDS = ('Matrix', 'Yüzük', 'Kardeşliği', 'Dune', 'Çöl', 'Gece', 'Şehir', 'Alien', 'Heat',
+               'Memento', 'Işık', 'Deniz', 'Yıldız', 'Savaş', 'Dönüş', 'Son', 'İlk', 'Kayıp')
+
+
+def generate_rows(count, seed=0):
+    """
+    OMDb biçiminde sentetik satırlar. Başlık havuzu satır sayısından küçük tutulur ki
+    slug çakışmaları (ve ID'li slug'lar) gerçekçi oranda oluşsun.
+    """
+    rng = random.Random(seed)
+    titles = max(1, count // 3)
+    for i in range(count):
+        title_rng = random.Random(rng.randrange(titles))
+        title = ' '.join(title_rng.choice(TITLE_WORDS) for _ in range(title_rng.randint(1, 4)))
+        yield {
+            'imdbID': f'tt{1000000 + i:07d}',
+            'Title': f'{title} {title_rng.randint(1, 99)}' if title_rng.random() < 0.5 else title,
+            'Year': str(rng.randint(1950, 2026)),
+            'Poster': 'N/A',
+            'Plot': 'Sentetik katalog kaydı.',
+            'imdbRating': f'{rng.uniform(1, 10):.1f}',
+            'Genre': 'Drama',
+            'Runtime': f'{rng.randint(80, 180)} min',
+        }
+
+
+def write_rows(path, rows, fmt='jsonl'):
+    """Satırları JSONL/CSV/TSV olarak yazar; yazılan satır sayısını döner."""
+    written = 0
+    with (gzip.open(path, 'wt', encoding='utf-8', newline='') if path.endswith('.gz')
+          else open(path, 'w', encoding='utf-8', newline='')) as f:
+        writer = None
+        for row in rows:
+            if fmt == 'jsonl':
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            else:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row), delimiter='\t' if fmt == 'tsv' else ',')
+                    writer.writeheader()
+                writer.writerow(row)
+            written += 1
+    return written
@@ -0,0 +1,71 @@
+import random
+from django.core.cache import cache
+from django.db.models import Max, Min
+from .models import Movie
+
+# Ana sayfada gösterilen rastgele filmler, önceden seçilmiş bir havuzdan çekilir.
+# Havuz önbellekte tutulur; her istek sıfır sorguyla 12 kart seçer.
+POOL_KEY = 'featured:pool'
+POOL_SIZE = 300
+POOL_TTL = 15 * 60
+# Seyrek id aralıklarında (silinmiş kayıtlar) havuzu doldurmak için en fazla deneme
+MAX_SAMPLE_ROUNDS = 4
+
+# JSON blob'ları yerine Movie üzerindeki türetilmiş kolonlar okunur
+CARD_FIELDS = ('id', 'title', 'slug', 'poster_url', 'year', 'episode_count')
+
+
+def movie_card(movie):
+    """Şablonun ihtiyaç duyduğu alanlar."""
+    return {
+        'slug': movie.slug,
+        'title': movie.title,
+        'poster': movie.poster_url,
+        'year': movie.year,
+        'episode_count': movie.episode_count,
+    }
+
+
+def build_pool(size=POOL_SIZE):
+    """
+    pk aralığından rastgele id'ler çekerek havuz oluşturur (ORDER BY RANDOM() yok).
+    Küçük tablolarda tüm filmleri alır.
+    """
+    featured = Movie.objects.exclude(title__isnull=True).exclude(slug='')
+    # Filtresiz Min/Max birincil anahtar indeksinden okunur; filtre id__in sorgusunda uygulanır
+    bounds = Movie.objects.aggregate(low=Min('id'), high=Max('id'))
+    low, high = bounds['low'], bounds['high']
+    if low is None:
+        return []
+
+    span = high - low + 1
+    if span <= size * 2:
+        return [movie_card(m) for m in featured.only(*CARD_FIELDS)]
+
+    cards = {}
+    for _ in range(MAX_SAMPLE_ROUNDS):
+        needed = size - len(cards)
+        if needed <= 0:
+            break
+        ids = random.sample(range(low, high + 1), min(span, needed * 2))
+        for movie in featured.filter(id__in=ids).only(*CARD_FIELDS):
+            cards.setdefault(movie.id, movie_card(movie))
+    return list(cards.values())[:size]
+
+
+def refresh_pool():
+    pool = build_pool()
+    cache.set(POOL_KEY, pool, POOL_TTL)
+    return pool
+
+
+def invalidate_pool():
+    cache.delete(POOL_KEY)
+
+
+def featured_movies(count=12):
+    """Havuzdan rastgele `count` film kartı döner; havuz yoksa (süresi dolduysa) yeniden kurar."""
+    pool = cache.get(POOL_KEY)
+    if pool is None:
+        pool = refresh_pool()
+    return random.sample(pool, min(count, len(pool)))
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .ratelimit import RateLimited
+
+# (connect, read) saniye. Asılı kalan bir upstream worker'ı sonsuza kadar bloklamasın.
+DEFAULT_TIMEOUT = (3.05, 20)
+
+# Host başına açık tutulacak bağlantı sayısı (thread/worker havuzu ile uyumlu olmalı)
+POOL_MAXSIZE = 10
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Bundan uzun Retry-After beklenmez: worker uyuyarak bloklanmaz, çağıran RateLimited alır
+MAX_RETRY_AFTER = 30
+
+_sessions = {}
+_lock = threading.Lock()
+
+# httpx.AsyncClient bağlantıları oluşturulduğu event loop'a bağlıdır: loop -> {isim: client}
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class TimeoutSession(requests.Session):
+    """timeout verilmeyen her isteğe varsayılan timeout ekleyen Session."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class CappedRetry(Retry):
+    """Retry-After MAX_RETRY_AFTER'ı aşarsa beklemek yerine RateLimited fırlatan Retry."""
+    upstream = 'upstream'
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.upstream = self.upstream
+        return retry
+
+    def increment(self, method=None, url=None, response=None, *args, **kwargs):
+        retry_after = self.get_retry_after(response) if response is not None else None
+        if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+            response.drain_conn()
+            raise RateLimited(self.upstream, retry_after)
+        return super().increment(method, url, response, *args, **kwargs)
+
+
+def build_session(timeout=DEFAULT_TIMEOUT, retries=3, backoff=0.5, pool_maxsize=POOL_MAXSIZE, upstream='upstream'):
+    """
+    Keep-alive bağlantı havuzlu, 429/5xx'te artan beklemeyle tekrar deneyen session.
+    POST istekleri tekrar denenmez (ör. OpenSubtitles indirme kotası iki kez düşmesin).
+    Çok uzun Retry-After'da `upstream` adıyla RateLimited fırlatılır.
+    """
+    session = TimeoutSession(timeout=timeout)
+    retry = CappedRetry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    retry.upstream = upstream
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(name, **kwargs):
+    """İsim başına process genelinde tek bir session döner (ör. 'omdb', 'opensubtitles')."""
+    session = _sessions.get(name)
+    if session is None:
+        with _lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = build_session(upstream=name, **kwargs)
+                _sessions[name] = session
+    return session
+
+
+def get_async_client(name, timeout=DEFAULT_TIMEOUT, max_connections=POOL_MAXSIZE):
+    """
+    get_session()'ın async karşılığı: isim ve event loop başına tek bir keep-alive havuzlu
+    httpx.AsyncClient döner. Bağlantı hataları transport seviyesinde tekrar denenir.
+    """
+    per_loop = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = per_loop.get(name)
+    if client is None:
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        client = per_loop[name] = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=httpx.AsyncHTTPTransport(retries=3),
+            follow_redirects=True,
+        )
+    return client
+
+
+async def aclose_async_clients():
+    """Bu event loop'un istemcilerini kapatır (asyncio.run bitmeden çağrılmalı)."""
+    per_loop = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in per_loop.values():
+        await client.aclose()
+
+
+async def arequest(client, method, url, retries=3, backoff=0.5, upstream='upstream', **kwargs):
+    """
+    build_session()'daki Retry ayarının async karşılığı: GET istekleri 429/5xx'te
+    artan beklemeyle (Retry-After'a uyarak) tekrar denenir, POST denenmez.
+    Retry-After MAX_RETRY_AFTER'ı aşarsa beklenmez, RateLimited fırlatılır.
+    """
+    attempt = 0
+    while True:
+        response = await client.request(method, url, **kwargs)
+        if method != 'GET' or response.status_code not in RETRY_STATUSES or attempt >= retries:
+            return response
+        retry_after = response.headers.get('Retry-After', '')
+        delay = float(retry_after) if retry_after.isdigit() else backoff * (2 ** attempt)
+        await response.aclose()
+        if delay > MAX_RETRY_AFTER:
+            raise RateLimited(upstream, delay)
+        attempt += 1
+        await asyncio.sleep(delay)
@@ -0,0 +1,226 @@
+import json
+import time
+import traceback
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from . import steps
+from .models import AnalysisJob
+from .ratelimit import RateLimited
+from .analysis import AnalysisError, LEASE_SECONDS, aanalyze_with_lease, analyze_single_flight
+from .steps import Step
+
+ACTIVE_STATUSES = (AnalysisJob.QUEUED, AnalysisJob.RUNNING)
+FINISH_FIELDS = ['status', 'result', 'error', 'error_status', 'finished_at']
+STREAM_FIELDS = ['status', 'result', 'error', 'partial', 'imdb_id']
+
+# /analyze/stream/ işin durumunu bu aralıkla DB'den okur (worker ayrı process'te olabilir).
+# Yeni olay gelmedikçe aralık STREAM_MAX_POLL_INTERVAL'a kadar ikiye katlanır; yeni bölüm gelince
+# tekrar kısalır. Böylece Gemini'yi bekleyen her izleyici DB'yi saniyede 4 kez yoklamaz.
+STREAM_POLL_INTERVAL = 0.25
+STREAM_MAX_POLL_INTERVAL = 2.0
+# Uzun sessizlikte proxy'ler bağlantıyı kapatmasın diye SSE yorum satırı gönderilir
+STREAM_KEEPALIVE = 15
+STREAM_TIMEOUT = LEASE_SECONDS
+
+
+def _active_job(imdb_id):
+    return AnalysisJob.objects.filter(imdb_id=imdb_id, status__in=ACTIVE_STATUSES).order_by('id').first()
+
+
+def enqueue_analysis(imdb_id):
+    """
+    Film için aktif bir iş varsa onu, yoksa yeni bir iş döner. Aktif iş tekilliği DB
+    kısıtıyla korunur: aynı anda iki istek oluşturmaya çalışırsa kaybeden mevcut işi alır.
+    """
+    while True:
+        job = _active_job(imdb_id)
+        if job:
+            return job
+        try:
+            with transaction.atomic():
+                return AnalysisJob.objects.create(imdb_id=imdb_id)
+        except IntegrityError:
+            continue
+
+
+async def aenqueue_analysis(imdb_id):
+    return await sync_to_async(enqueue_analysis)(imdb_id)
+
+
+def job_payload(job):
+    """Durum endpoint'inin döndürdüğü JSON."""
+    payload = {'job_id': job.id, 'imdb_id': job.imdb_id, 'status': job.status}
+    if job.status == AnalysisJob.DONE:
+        payload.update(job.result)
+    elif job.status == AnalysisJob.FAILED:
+        payload.update(failure_payload(job))
+    return payload
+
+
+def failure_payload(job):
+    """Başarısız işin hata mesajı; upstream sınırına takıldıysa kaç saniye sonra denenebileceği."""
+    payload = {'error': job.error}
+    if job.result and job.result.get('retry_after'):
+        payload['retry_after'] = job.result['retry_after']
+    return payload
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def job_events(job, state):
+    """
+    İşin son halinden gönderilecek SSE mesajlarını üretir. state önceki çağrıdan kalan
+    {'status', 'sent'} sözlüğüdür ve yerinde güncellenir. (mesajlar, iş bitti mi) döner.
+    """
+    messages = []
+    if job.status != state.get('status'):
+        state['status'] = job.status
+        messages.append(sse('status', {'status': job.status}))
+
+    sent, partial = state.get('sent', []), job.partial or []
+    if partial[:len(sent)] != sent:
+        # Gemini yeniden denendi: sayfa listeyi temizlesin
+        messages.append(sse('reset', {}))
+        sent = []
+    messages.extend(sse('episode', episode) for episode in partial[len(sent):])
+    state['sent'] = partial
+
+    if job.status == AnalysisJob.DONE:
+        messages.append(sse('done', job_payload(job)))
+    elif job.status == AnalysisJob.FAILED:
+        messages.append(sse('failed', failure_payload(job)))
+    return messages, job.status in (AnalysisJob.DONE, AnalysisJob.FAILED)
+
+
+def _stream_flow(job_id):
+    """stream_job ve astream_job'ın ortak akışı: SSE mesajlarını ve Step'leri yield eder (bkz. steps.py)."""
+    state = {}
+    started = last_sent = time.monotonic()
+    interval = STREAM_POLL_INTERVAL
+    while time.monotonic() - started < STREAM_TIMEOUT:
+        job = yield Step(_stream_state, job_id)
+        if job is None:
+            yield sse('failed', {'error': 'Analiz işi bulunamadı.'})
+            return
+        messages, finished = job_events(job, state)
+        if messages:
+            yield "".join(messages)
+            last_sent = time.monotonic()
+            interval = STREAM_POLL_INTERVAL
+        else:
+            if time.monotonic() - last_sent >= STREAM_KEEPALIVE:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            interval = min(interval * 2, STREAM_MAX_POLL_INTERVAL)
+        if finished:
+            return
+        yield steps.sleep(interval)
+    yield sse('failed', {'error': 'Analiz zaman aşımına uğradı.'})
+
+
+def _stream_state(job_id):
+    return AnalysisJob.objects.filter(id=job_id).only(*STREAM_FIELDS).first()
+
+
+def stream_job(job_id):
+    """
+    İşi bitene kadar izleyen SSE üreteci (WSGI). Bağlantı açık kaldıkça (en fazla STREAM_TIMEOUT)
+    bir WSGI thread'i tutar; çok sayıda izleyici beklenen kurulumlar ASGI (astream_job) kullanmalı.
+    """
+    return steps.iterate(_stream_flow(job_id))
+
+
+def astream_job(job_id):
+    """stream_job'ın async karşılığı (ASGI); beklerken event loop'u bloklamaz."""
+    return steps.aiterate(_stream_flow(job_id))
+
+
+def claim_next_job():
+    """Kuyruktaki en eski işi atomik olarak RUNNING'e çeker; başka worker kaptıysa sıradakini dener."""
+    while True:
+        job_id = (AnalysisJob.objects.filter(status=AnalysisJob.QUEUED)
+                  .order_by('id').values_list('id', flat=True).first())
+        if job_id is None:
+            return None
+        claimed = AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.QUEUED).update(
+            status=AnalysisJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return job_id
+
+
+def requeue_stale_jobs(max_age_seconds=LEASE_SECONDS):
+    """Çöken worker'dan kalan RUNNING işleri tekrar kuyruğa alır."""
+    cutoff = timezone.now() - timedelta(seconds=max_age_seconds)
+    return AnalysisJob.objects.filter(status=AnalysisJob.RUNNING, started_at__lt=cutoff).update(
+        status=AnalysisJob.QUEUED, started_at=None
+    )
+
+
+def mark_failed(job_id, message, status=500):
+    AnalysisJob.objects.filter(id=job_id).update(
+        status=AnalysisJob.FAILED, error=message, error_status=status, finished_at=timezone.now()
+    )
+
+
+def _finish(job, result=None, error=None):
+    if error is None:
+        job.status = AnalysisJob.DONE
+        job.result = result
+    elif isinstance(error, AnalysisError):
+        job.status = AnalysisJob.FAILED
+        job.error = error.message
+        job.error_status = error.status
+    elif isinstance(error, RateLimited):
+        # Upstream sınırı/kotası: sayfa "X saniye sonra tekrar deneyin" gösterir
+        job.status = AnalysisJob.FAILED
+        job.error = error.message
+        job.error_status = 429
+        job.result = {'retry_after': error.retry_after}
+    else:
+        traceback.print_exc()
+        job.status = AnalysisJob.FAILED
+        job.error = str(error)
+        job.error_status = 500
+    job.finished_at = timezone.now()
+
+
+def publish_partial(job_id, episodes):
+    """Akış sırasında tamamlanan bölümleri işe yazar; /analyze/stream/ buradan okur."""
+    AnalysisJob.objects.filter(id=job_id).update(partial=episodes)
+
+
+async def apublish_partial(job_id, episodes):
+    await AnalysisJob.objects.filter(id=job_id).aupdate(partial=episodes)
+
+
+def execute_job(job_id):
+    """Tek bir işi çalıştırır. Thread ve process havuzundan çağrılabilir."""
+    close_old_connections()
+    try:
+        job = AnalysisJob.objects.get(id=job_id)
+        try:
+            _finish(job, result=analyze_single_flight(
+                job.imdb_id, on_episode=lambda episodes: publish_partial(job_id, episodes)))
+        except Exception as e:
+            _finish(job, error=e)
+        job.save(update_fields=FINISH_FIELDS)
+        return job.status
+    finally:
+        close_old_connections()
+
+
+async def aexecute_job(job_id):
+    """execute_job'ın async karşılığı; `run_worker --mode async` tek event loop'ta çok iş çalıştırır."""
+    job = await AnalysisJob.objects.aget(id=job_id)
+    try:
+        _finish(job, result=await aanalyze_with_lease(
+            job.imdb_id, on_episode=lambda episodes: apublish_partial(job_id, episodes)))
+    except Exception as e:
+        _finish(job, error=e)
+    await job.asave(update_fields=FINISH_FIELDS)
+    return job.status
@@ -0,0 +1,69 @@
+import json
+
+
+class JSONArrayStream:
+    """
+    Parça parça gelen bir JSON dizisini (ör. Gemini streaming cevabı) artımlı ayrıştırır.
+    feed() her çağrıda sadece yeni gelen metni tarar ve tamamlanan üst seviye elemanları döner;
+    önceki metin tekrar okunmaz. Dizi başlamadan önceki metin (```json gibi) yok sayılır.
+
+        stream = JSONArrayStream()
+        stream.feed('[{"episode": 1, "ti')   # -> []
+        stream.feed('tle": "A"}, {')         # -> [{'episode': 1, 'title': 'A'}]
+    """
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self._buffer = ''
+        self._pos = 0           # Taranan son karakterin bir sonrası
+        self._depth = 0         # 1: dizinin içi, 2+: bir elemanın içi
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+
+    def feed(self, text):
+        if self.done or not text:
+            return []
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if char == '[':
+                    self._depth = 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 1:
+                    self._item_start = i
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 1:
+                    completed.append(json.loads(buffer[self._item_start:i + 1]))
+                    self._item_start = None
+                elif self._depth == 0:
+                    self.done = True
+                    break
+
+        self.items.extend(completed)
+        # Tamamlanan elemanların metnine artık gerek yok; tampon büyümesin
+        cut = self._item_start if self._item_start is not None else len(buffer)
+        self._buffer = buffer[cut:]
+        self._pos = len(buffer) - cut
+        if self._item_start is not None:
+            self._item_start = 0
+        return completed
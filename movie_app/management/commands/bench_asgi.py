@@ -0,0 +1,126 @@
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from movie_app import services
+from movie_app.http_sessions import aclose_async_clients
+from movie_app.models import Movie
+from movie_app.response_cache import analyze_key
+from movie_app.stubs import StubOMDbHandler, StubServer
+
+PREFIX = 'ttasgi'
+
+
+class Command(BaseCommand):
+    help = ('Load-tests /autocomplete/ and /analyze/ against a local OMDb stub: '
+            'sync views on a fixed WSGI thread pool vs async views on one ASGI event loop')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and server model')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent clients')
+        parser.add_argument('--wsgi-threads', type=int, default=4,
+                            help='WSGI worker threads (e.g. gunicorn --workers * --threads)')
+        parser.add_argument('--latency', type=float, default=0.1, help='Stub upstream latency in seconds')
+
+    def handle(self, *args, **options):
+        stub = StubServer(StubOMDbHandler, latency=options['latency']).start()
+        env = {'OMDB_BASE_URL': stub.url, 'OMDB_API_KEY': 'bench'}
+        saved_env = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        self.seed()
+        try:
+            self.stdout.write(
+                f"{options['requests']} requests per run, {options['concurrency']} concurrent clients, "
+                f"upstream latency {options['latency'] * 1000:.0f} ms, WSGI threads {options['wsgi_threads']}"
+            )
+            for endpoint in ('autocomplete', 'analyze'):
+                self.stdout.write(self.style.SUCCESS(f'--- /{endpoint}/ ---'))
+                for model in ('wsgi', 'asgi'):
+                    services._search_cache.clear()
+                    cache.delete_many([analyze_key(f'{PREFIX}{i:04d}') for i in range(50)])
+                    calls_before = stub.calls
+                    paths = self.paths(endpoint, options['requests'])
+                    if model == 'wsgi':
+                        latencies, elapsed = self.run_wsgi(paths, options['wsgi_threads'], options['concurrency'])
+                    else:
+                        latencies, elapsed = asyncio.run(self.run_asgi(paths, options['concurrency']))
+                    self.report(model, latencies, elapsed, stub.calls - calls_before)
+        finally:
+            Movie.objects.filter(imdb_id__startswith=PREFIX).delete()
+            stub.stop()
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    def seed(self):
+        for i in range(50):
+            Movie.objects.update_or_create(imdb_id=f'{PREFIX}{i:04d}', defaults={
+                'title': f'ASGI Bench {i}',
+                'movie_info': {'title': f'ASGI Bench {i}', 'year': '2007'},
+                'episode_data': [{'episode': 1, 'start': '00:00:00', 'end': '00:30:00', 'title': 'Tek'}],
+            })
+
+    @staticmethod
+    def paths(endpoint, count):
+        if endpoint == 'autocomplete':
+            # Her istek farklı sorgu: önbellek yerine upstream ölçülsün
+            run = uuid.uuid4().hex[:6]
+            return [f'/autocomplete/?q=zq{run}{i:05d}' for i in range(count)]
+        return [f'/analyze/?imdb_id={PREFIX}{i % 50:04d}' for i in range(count)]
+
+    @staticmethod
+    def run_wsgi(paths, threads, concurrency):
+        """Sync view'lar: aynı anda en fazla `threads` istek işlenir, kalanlar sırada bekler."""
+        server = ThreadPoolExecutor(max_workers=threads)
+        clients = ThreadPoolExecutor(max_workers=concurrency)
+
+        def handle(path):
+            return Client().get(path)
+
+        def request(path):
+            t0 = time.perf_counter()
+            response = server.submit(handle, path).result()
+            assert response.status_code == 200, (path, response.status_code)
+            return time.perf_counter() - t0
+
+        started = time.perf_counter()
+        latencies = list(clients.map(request, paths))
+        elapsed = time.perf_counter() - started
+        clients.shutdown()
+        server.shutdown()
+        return latencies, elapsed
+
+    @staticmethod
+    async def run_asgi(paths, concurrency):
+        """Async view'lar tek event loop'ta; upstream beklenirken diğer istekler ilerler."""
+        gate = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def request(path):
+            async with gate:
+                t0 = time.perf_counter()
+                response = await client.get(path)
+                assert response.status_code == 200, (path, response.status_code)
+                return time.perf_counter() - t0
+
+        with override_settings(ROOT_URLCONF='core.asgi_urls'):
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(request(path) for path in paths))
+            elapsed = time.perf_counter() - started
+        await aclose_async_clients()
+        return latencies, elapsed
+
+    def report(self, model, latencies, elapsed, upstream_calls):
+        ordered = sorted(latencies)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        self.stdout.write(
+            f'  {model}: {len(latencies) / elapsed:8.1f} req/s  p50 {statistics.median(ordered) * 1000:7.1f} ms  '
+            f'p95 {p95 * 1000:7.1f} ms  upstream calls {upstream_calls}'
+        )
@@ -0,0 +1,104 @@
+import os
+import random
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from movie_app.analysis import analyzed_movie
+from movie_app.cache import isolated_cache
+from movie_app.featured import build_pool, featured_movies, refresh_pool
+from movie_app.models import Movie
+
+PREFIX = 'bench'
+
+
+class Command(BaseCommand):
+    help = 'Seeds a large Movie table and compares query count/time of the old and the indexed query paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def seed(self, rows):
+        self.stdout.write(f'Seeding {rows} movies...')
+        plot = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 10
+        batch = []
+        for i in range(rows):
+            movie = Movie(
+                imdb_id=f'{PREFIX}{i:08d}',
+                title=f'Bench Movie {i}',
+                slug=f'{PREFIX}-movie-{i}',
+                movie_info={'title': f'Bench Movie {i}', 'year': str(1950 + i % 75), 'poster': f'https://img/{i}.jpg',
+                            'plot': plot, 'genre': 'Drama', 'runtime': '120 min', 'imdb_rating': '7.1'},
+                # Üçte biri analizli
+                episode_data=[
+                    {'episode': n, 'start': '00:00:00', 'end': '00:30:00', 'title': f'Episode {n}'}
+                    for n in range(1, 7)
+                ] if i % 3 == 0 else [],
+            )
+            movie.sync_denormalized_fields()
+            batch.append(movie)
+            if len(batch) == 5000:
+                Movie.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Movie.objects.bulk_create(batch)
+
+    def measure(self, label, func):
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                t0 = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - t0)
+        self.stdout.write(f'  {label:<52} {len(queries):3d} queries  best {min(timings) * 1000:9.2f} ms')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        scratch_dir = tempfile.TemporaryDirectory()
+        old_db_name = connection.settings_dict['NAME']
+        # Gerçek veritabanına ve çalışan sunucunun önbelleğine (featured havuzu) dokunma
+        scratch_cache = isolated_cache(os.path.join(scratch_dir.name, 'cache'))
+        scratch_cache.enable()
+        try:
+            self.create_scratch_db(scratch_dir.name)
+            self.run_benchmarks(options['rows'])
+        finally:
+            scratch_cache.disable()
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            scratch_dir.cleanup()
+
+    @staticmethod
+    def create_scratch_db(directory):
+        """Her ölçüm boş bir veritabanıyla başlar (replay_bench ile aynı)."""
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+    def run_benchmarks(self, rows):
+        self.seed(rows)
+
+        pending_id = f'{PREFIX}{1:08d}'
+        ids = [f'{PREFIX}{random.randrange(rows):08d}' for _ in range(200)]
+
+        self.stdout.write(self.style.SUCCESS(f'--- index page ({rows} rows) ---'))
+        self.measure("old: order_by('?')[:12], full rows",
+                     lambda: list(Movie.objects.exclude(title__isnull=True).order_by('?')[:12]))
+        self.measure('new: pk-range sample pool (300 cards, .only())', lambda: build_pool())
+        refresh_pool()
+        self.measure('new: featured_movies(12) per request (cached pool)', lambda: featured_movies(12))
+
+        self.stdout.write(self.style.SUCCESS('--- analyze cache check (unanalyzed movie) ---'))
+        self.measure('old: filter(imdb_id).first() + episode_data check',
+                     lambda: bool(Movie.objects.filter(imdb_id=pending_id).first().episode_data))
+        self.measure('new: analyzed_movie() on indexed status', lambda: analyzed_movie(pending_id))
+
+        self.stdout.write(self.style.SUCCESS('--- 200 random lookups ---'))
+        self.measure('old: full rows', lambda: [Movie.objects.filter(imdb_id=i).first() for i in ids])
+        self.measure('new: analyzed_movie()', lambda: [analyzed_movie(i) for i in ids])
+
+        self.stdout.write(self.style.SUCCESS('--- count analyzed movies ---'))
+        self.measure('old: exclude(episode_data=[])', lambda: Movie.objects.exclude(episode_data=[]).count())
+        self.measure('new: filter(analysis_status=DONE)',
+                     lambda: Movie.objects.filter(analysis_status=Movie.DONE).count())
@@ -0,0 +1,109 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Her senaryo ayrı, temiz bir Python process'inde çalışır (modül önbelleği ısınmamış olsun)
+SETUP = (
+    "import os, sys, time, json\n"
+    "started = time.perf_counter()\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')\n"
+    "import django\n"
+    "django.setup()\n"
+)
+
+SCENARIOS = {
+    # URLconf ve view'lar: her web worker'ın açılışta ödediği maliyet
+    'django setup + urls': SETUP + "import core.urls\n",
+    # run_worker komutu ve analiz modülleri (işi almadan önceki hazırlık)
+    'worker startup': SETUP + "import movie_app.management.commands.run_worker\nimport movie_app.jobs\n",
+    # Açılıştan ilk cevaba kadar (upstream'e çıkmayan kısa sorgu)
+    'first request': SETUP + (
+        "from django.test import Client\n"
+        "t0 = time.perf_counter()\n"
+        "Client().get('/autocomplete/?q=ab')\n"
+        "extra = {'request_ms': (time.perf_counter() - t0) * 1000}\n"
+    ),
+    # Gemini istemcisinin ilk kullanımı: tembel yükleme maliyeti buraya taşındı
+    'first gemini client': SETUP + (
+        "os.environ.setdefault('GEMINI_API_KEY', 'bench')\n"
+        "from movie_app.services import AIService\n"
+        "t0 = time.perf_counter()\n"
+        "AIService().client\n"
+        "extra = {'client_ms': (time.perf_counter() - t0) * 1000}\n"
+    ),
+}
+REPORT = (
+    "extra = globals().get('extra', {})\n"
+    "extra['total_ms'] = (time.perf_counter() - started) * 1000\n"
+    "extra['heavy'] = [m for m in ('google.genai', 'subliminal', 'babelfish') if m in sys.modules]\n"
+    "print(json.dumps(extra))\n"
+)
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+WATCHED_MODULES = ('core.urls', 'movie_app.views', 'movie_app.services', 'movie_app.jobs',
+                   'google.genai', 'subliminal', 'babelfish')
+
+
+class Command(BaseCommand):
+    help = ('Measures cold-start cost in fresh interpreters: python -X importtime for the URLconf and '
+            'worker modules, process start to first response, and first Gemini client construction')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per scenario (median is reported)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def run_python(self, code, importtime=False):
+        args = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+        env = dict(os.environ, PYTHONPATH=str(settings.BASE_DIR))
+        t0 = time.perf_counter()
+        proc = subprocess.run(args, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - t0) * 1000
+        if proc.returncode:
+            raise RuntimeError(proc.stderr[-2000:])
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['wall_ms'] = wall_ms
+        return result, proc.stderr
+
+    @staticmethod
+    def import_times(stderr):
+        """-X importtime çıktısından izlenen modüllerin kümülatif süreleri (ms)."""
+        times = {}
+        for line in stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match and match.group(4) in WATCHED_MODULES:
+                times[match.group(4)] = int(match.group(2)) / 1000
+        return times
+
+    def handle(self, *args, **options):
+        report = {}
+        for name, code in SCENARIOS.items():
+            runs = [self.run_python(code + REPORT)[0] for _ in range(options['repeat'])]
+            row = {key: statistics.median(run[key] for run in runs)
+                   for key in runs[0] if key != 'heavy'}
+            row['heavy'] = runs[0]['heavy']
+            report[name] = row
+
+        # URLconf önce: kümülatif süresi views -> services zincirini de kapsasın
+        _, stderr = self.run_python(SCENARIOS['django setup + urls'] + "import movie_app.jobs\n" + REPORT,
+                                    importtime=True)
+        imports = self.import_times(stderr)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'scenarios': report, 'importtime_ms': imports}, indent=2))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"--- cold start, median of {options['repeat']} fresh processes ---"))
+        for name, row in report.items():
+            details = '  '.join(f"{key} {value:7.1f} ms" for key, value in row.items()
+                                if key.endswith('_ms') and key != 'wall_ms')
+            self.stdout.write(f"{name:<22} process {row['wall_ms']:7.1f} ms  {details}  "
+                              f"heavy modules: {', '.join(row['heavy']) or 'none'}")
+        self.stdout.write(self.style.SUCCESS('--- python -X importtime (cumulative) ---'))
+        for module in WATCHED_MODULES:
+            value = imports.get(module)
+            self.stdout.write(f"{module:<22} {'not imported' if value is None else f'{value:7.1f} ms'}")
@@ -0,0 +1,57 @@
+import os
+import re
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from movie_app.subtitles import parse_subtitle, parse_subtitle_file
+
+
+def legacy_clean_subtitle(raw_text):
+    """Eski regex tabanlı AIService.clean_subtitle (karşılaştırma için birebir kopya)."""
+    if not raw_text:
+        return ""
+    clean_text = re.sub(r'\d+\n\d{2}:\d{2}:\d{2},\d{3} --> \d{2}:\d{2}:\d{2},\d{3}', '', raw_text)
+    clean_text = re.sub(r'<[^>]*>', '', clean_text)
+    clean_text = re.sub(r'(?i)(opensubtitles|subtitles|translated|encoded|advertisement).*', '', clean_text)
+    return " ".join(clean_text.split())
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the streaming subtitle parser against the legacy regex cleaner'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default='test.srt')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, label, func):
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(self.repeat):
+            t0 = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - t0)
+
+        best = min(timings) * 1000
+        self.stdout.write(f'{label:<32} best {best:8.2f} ms   peak mem {peak / 1024:9.1f} KiB')
+
+    def handle(self, *args, **options):
+        file_path = options['file']
+        self.repeat = options['repeat']
+        if not os.path.exists(file_path):
+            self.stdout.write(self.style.ERROR(f'{file_path} not found!'))
+            return
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            raw_content = f.read()
+
+        cues = parse_subtitle(raw_content)
+        self.stdout.write(f'{file_path}: {len(raw_content)} chars, {len(cues)} cues')
+
+        self.measure('legacy clean_subtitle (str)', lambda: legacy_clean_subtitle(raw_content))
+        self.measure('parse_subtitle (str)', lambda: parse_subtitle(raw_content))
+        self.measure('parse_subtitle_file (stream)', lambda: parse_subtitle_file(file_path))
+        self.measure('parse + to_prompt_text (str)', lambda: parse_subtitle(raw_content).to_prompt_text())
@@ -0,0 +1,73 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from movie_app.catalog import (
+    CHUNK_SIZE, CatalogImporter, detect_format, generate_rows, open_source, read_rows, write_rows,
+)
+
+# Bu kadar satırda bir ilerleme yazılır
+PROGRESS_EVERY = 100000
+
+
+class Command(BaseCommand):
+    help = ('Streams a JSONL/CSV/TSV dump of movie metadata into the database in chunks '
+            '(slugs resolved in memory exactly as Movie.save() would) and reports rows/s')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?',
+                            help='JSONL/CSV/TSV file, optionally .gz ("-" for stdin)')
+        parser.add_argument('--format', choices=['jsonl', 'csv', 'tsv'],
+                            help='Input format (default: from the file extension, jsonl for stdin)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows written per transaction')
+        parser.add_argument('--update', action='store_true',
+                            help='Overwrite movie info of existing movies (titles and slugs are kept)')
+        parser.add_argument('--generate', type=int, metavar='N',
+                            help='Import (or with --write-file, write) N synthetic movies instead of a source file')
+        parser.add_argument('--write-file', help='Write the generated catalog to this path and exit')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        if bool(options['source']) == (options['generate'] is not None):
+            raise CommandError('Give either a source file or --generate N')
+        if options['write_file'] and options['generate'] is None:
+            raise CommandError('--write-file needs --generate N')
+
+        if options['generate'] is not None:
+            rows = generate_rows(options['generate'], seed=options['seed'])
+            if options['write_file']:
+                fmt = options['format'] or detect_format(options['write_file'])
+                written = write_rows(options['write_file'], rows, fmt)
+                self.stdout.write(f"{written} rows written to {options['write_file']}")
+                return
+            self.import_rows(rows, options)
+            return
+
+        fmt = options['format'] or detect_format(options['source'])
+        try:
+            stream = open_source(options['source'])
+        except FileNotFoundError:
+            raise CommandError(f"{options['source']} not found")
+        with stream:
+            self.import_rows(read_rows(stream, fmt), options)
+
+    def import_rows(self, rows, options):
+        importer = CatalogImporter(update=options['update'], chunk_size=options['chunk_size'])
+        started = time.perf_counter()
+        reported = [0]
+
+        def progress(importer):
+            if importer.rows - reported[0] >= PROGRESS_EVERY:
+                reported[0] = importer.rows
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{importer.rows} rows, {importer.rows / elapsed:.0f} rows/s")
+
+        importer.run(rows, on_chunk=progress)
+        elapsed = time.perf_counter() - started
+        counts = importer.counts
+        self.stdout.write(self.style.SUCCESS(
+            f"{importer.rows} rows in {elapsed:.1f}s ({importer.rows / max(elapsed, 1e-9):.0f} rows/s): "
+            f"{counts['created']} created, {counts['updated']} updated, {counts['skipped']} skipped, "
+            f"{counts['invalid']} invalid, {counts['failed']} failed (slug taken)"
+        ))
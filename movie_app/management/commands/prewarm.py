@@ -0,0 +1,128 @@
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from movie_app import ratelimit
+from movie_app.analysis import AnalysisError, analyze_single_flight, ensure_movie
+from movie_app.models import Movie
+
+IMDB_ID_RE = re.compile(r'tt\d{5,}')
+
+
+def read_ids(stream):
+    """Her satırdaki ilk IMDb ID'sini okur (düz liste, CSV veya JSONL olabilir)."""
+    seen = set()
+    for line in stream:
+        match = IMDB_ID_RE.search(line)
+        if match and match.group(0) not in seen:
+            seen.add(match.group(0))
+            yield match.group(0)
+
+
+def load_checkpoint(path):
+    """Daha önce başarıyla tamamlanan ID'ler."""
+    done = set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) >= 2 and fields[1] == 'done':
+                    done.add(fields[0])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class Command(BaseCommand):
+    help = 'Pre-computes movie info and episodes for a list of IMDb IDs (file or stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', default='-', help='File with one IMDb ID per line, "-" for stdin')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--checkpoint', default='prewarm.checkpoint',
+                            help='Progress file; finished IDs are skipped on the next run')
+        parser.add_argument('--omdb-rps', type=float, default=5, help='Max OMDb calls per second (0: unlimited)')
+        parser.add_argument('--opensubtitles-rps', type=float, default=1)
+        parser.add_argument('--subliminal-rps', type=float, default=1)
+        parser.add_argument('--gemini-rps', type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        for name in ('omdb', 'opensubtitles', 'subliminal', 'gemini'):
+            ratelimit.configure(name, options[f'{name}_rps'])
+
+        if options['source'] == '-':
+            ids = list(read_ids(sys.stdin))
+        else:
+            try:
+                with open(options['source'], 'r', encoding='utf-8') as f:
+                    ids = list(read_ids(f))
+            except FileNotFoundError:
+                raise CommandError(f"{options['source']} not found")
+
+        done = load_checkpoint(options['checkpoint'])
+        todo = [imdb_id for imdb_id in ids if imdb_id not in done]
+        self.stdout.write(f'{len(ids)} IDs, {len(ids) - len(todo)} already done, {len(todo)} to process')
+        if not todo:
+            return
+
+        self.checkpoint_lock = threading.Lock()
+        counts = {'done': 0, 'failed': 0}
+        started = time.monotonic()
+
+        with open(options['checkpoint'], 'a', encoding='utf-8') as checkpoint, \
+                ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+            futures = {pool.submit(self.warm, imdb_id): imdb_id for imdb_id in todo}
+            try:
+                for i, future in enumerate(as_completed(futures), 1):
+                    imdb_id = futures[future]
+                    status, detail = future.result()
+                    counts[status] += 1
+                    # Satır satır yaz ki kesintide ilerleme kaybolmasın
+                    with self.checkpoint_lock:
+                        checkpoint.write(f'{imdb_id}\t{status}\t{detail}\n')
+                        checkpoint.flush()
+
+                    style = self.style.SUCCESS if status == 'done' else self.style.ERROR
+                    rate = i / (time.monotonic() - started)
+                    self.stdout.write(style(f'[{i}/{len(todo)}] {imdb_id} {status} {detail} ({rate:.2f}/s)'))
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('Interrupted, waiting for running titles; rerun to resume'))
+                for future in futures:
+                    future.cancel()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished: {counts['done']} done, {counts['failed']} failed in {time.monotonic() - started:.1f}s"
+        ))
+
+    def warm(self, imdb_id):
+        """
+        Tek bir filmi ısıtır. ('done' | 'failed', açıklama) döner. Upstream çağrıları toplu iş
+        önceliğiyle yapılır: paylaşılan kovada ve günlük kotada etkileşimli isteklere pay kalır.
+        """
+        close_old_connections()
+        try:
+            with ratelimit.bulk():
+                return self._warm(imdb_id)
+        except AnalysisError as e:
+            return 'failed', e.message
+        except Exception as e:
+            return 'failed', str(e)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _warm(imdb_id):
+        movie = ensure_movie(imdb_id)
+        if not movie:
+            return 'failed', 'OMDb kaydı bulunamadı'
+        if movie.analysis_status == Movie.DONE:
+            return 'done', 'zaten analizli'
+        result = analyze_single_flight(imdb_id)
+        # Gemini başarısız olunca yerel motorun geçici sonucu DB'ye yazılmaz. 'done' sayılırsa
+        # checkpoint filmi bir daha denetmez ve bölümler hiç kaydedilmemiş kalır.
+        if not Movie.objects.filter(imdb_id=imdb_id, analysis_status=Movie.DONE).exists():
+            return 'failed', f"sonuç kaydedilmedi ({result['source']})"
+        return 'done', result['source']
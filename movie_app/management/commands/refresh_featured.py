@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from movie_app.featured import refresh_pool
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the cached pool of featured movies shown on the home page (run from cron)'
+
+    def handle(self, *args, **options):
+        pool = refresh_pool()
+        self.stdout.write(self.style.SUCCESS(f'Featured pool refreshed with {len(pool)} movies'))
@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+import tempfile
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from movie_app import services
+from movie_app.cache import isolated_cache
+from movie_app.replay import Replayer, generate_log, read_log
+from movie_app.search_index import local_index
+from movie_app.stubs import STUB_HANDLERS, start_stubs
+
+
+def per_upstream(value, option):
+    """'0.2' -> herkese 0.2; 'omdb=0.05,gemini=1' -> upstream başına."""
+    if not value:
+        return {}
+    try:
+        if '=' not in value:
+            return {name: float(value) for name in STUB_HANDLERS}
+        pairs = (item.split('=', 1) for item in value.split(','))
+        result = {name.strip(): float(number) for name, number in pairs}
+    except ValueError:
+        raise CommandError(f'{option}: expected a number or name=number pairs, got {value!r}')
+    unknown = set(result) - set(STUB_HANDLERS)
+    if unknown:
+        raise CommandError(f'{option}: unknown upstream(s) {", ".join(sorted(unknown))}')
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Replays a JSONL request log against the app with local OMDb/OpenSubtitles/Gemini stubs '
+            'and reports p50/p95/p99 latency, throughput and upstream calls per endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', nargs='?', help='JSONL request log ("-" for stdin); omitted: a generated mix')
+        parser.add_argument('--generate', type=int, default=200, help='Size of the generated log when no log is given')
+        parser.add_argument('--write-log', help='Write the generated log to this path and exit')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--speed', type=float, default=0.0,
+                            help='Replay "at" timestamps at this speed (2 = twice as fast); 0 ignores them')
+        parser.add_argument('--workers', type=int, default=2, help='Background analysis worker threads (0: none)')
+        parser.add_argument('--no-follow-jobs', action='store_true', help='Do not poll queued analyses until done')
+        parser.add_argument('--job-timeout', type=float, default=120.0)
+        parser.add_argument('--latency', default='omdb=0.05,opensubtitles=0.2,gemini=1.0',
+                            help='Stub latency in seconds, e.g. "0.1" or "omdb=0.05,gemini=1"')
+        parser.add_argument('--jitter', type=float, default=0.2, help='Relative latency jitter (0.2 = ±20%%)')
+        parser.add_argument('--error-rate', default='', help='Injected error ratio, e.g. "gemini=0.1"')
+        parser.add_argument('--error-status', type=int, default=503)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if options['log']:
+            try:
+                stream = sys.stdin if options['log'] == '-' else open(options['log'], encoding='utf-8')
+            except FileNotFoundError:
+                raise CommandError(f"{options['log']} not found")
+            with stream:
+                entries = read_log(stream)
+        else:
+            records = generate_log(options['generate'], seed=options['seed'])
+            if options['write_log']:
+                with open(options['write_log'], 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(record) + '\n' for record in records)
+                self.stdout.write(f"{len(records)} requests written to {options['write_log']}")
+                return
+            entries = read_log(json.dumps(record) for record in records)
+
+        servers, env = start_stubs(
+            latency=per_upstream(options['latency'], '--latency'),
+            error_rate=per_upstream(options['error_rate'], '--error-rate'),
+            error_status=options['error_status'],
+            jitter=options['jitter'],
+        )
+        saved_env = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        store_dir = tempfile.TemporaryDirectory()
+        old_db_name = connection.settings_dict['NAME']
+        # Çalışan sunucunun (paylaşılan) önbelleğine dokunma
+        scratch_cache = isolated_cache(os.path.join(store_dir.name, 'cache'))
+        scratch_cache.enable()
+        try:
+            self.create_scratch_db(store_dir.name)
+            cache.clear()
+            services._search_cache.clear()
+            local_index.clear()
+
+            replayer = Replayer(
+                entries, mode=options['mode'], concurrency=options['concurrency'], speed=options['speed'],
+                workers=options['workers'], follow_jobs=not options['no_follow_jobs'],
+                job_timeout=options['job_timeout'],
+            )
+            # Subliminal gerçek ağa çıkar; yarışta sadece stub'lı OpenSubtitles kalsın.
+            # Stub'ların kotası yok: paylaşılan hız sınırı ölçümü bozmasın
+            with override_settings(SUBTITLE_STORE_DIR=store_dir.name, SUBTITLE_PROVIDERS=('opensubtitles',),
+                                   ANALYSIS_TEST_MODE=False, UPSTREAM_LIMITS={}):
+                rows, elapsed = replayer.run()
+            upstream = {name: {'calls': s.calls, 'errors': s.errors} for name, s in servers.items()}
+            self.report(rows, elapsed, upstream, options)
+        finally:
+            scratch_cache.disable()
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            for server in servers.values():
+                server.stop()
+            store_dir.cleanup()
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    @staticmethod
+    def create_scratch_db(directory):
+        """Her oynatma boş bir veritabanıyla başlar; gerçek veritabanına dokunulmaz."""
+        if connection.vendor == 'sqlite':
+            # Bellek içi test DB thread'ler arasında kilitlenir; dosya kullan
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'replay.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+    def report(self, rows, elapsed, upstream, options):
+        if options['json']:
+            self.stdout.write(json.dumps({'elapsed_s': elapsed, 'endpoints': rows, 'upstream': upstream}, indent=2))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"--- replay ({options['mode']}, concurrency {options['concurrency']}) finished in {elapsed:.1f}s ---"
+        ))
+        self.stdout.write(f"{'endpoint':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint']:<22}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>10.1f}"
+                f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['rps']:>9.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS('--- upstream calls ---'))
+        for name, counts in upstream.items():
+            self.stdout.write(f"{name:<22}{counts['calls']:>7} calls{counts['errors']:>8} injected errors")
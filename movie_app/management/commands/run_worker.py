@@ -0,0 +1,134 @@
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from movie_app import metrics
+from movie_app.http_sessions import aclose_async_clients
+from movie_app.jobs import aexecute_job, claim_next_job, execute_job, mark_failed, requeue_stale_jobs
+
+
+def _init_process():
+    # spawn ile başlatılan process'lerde Django'yu yeniden kur
+    django.setup()
+
+
+def _execute_in_process(job_id):
+    # Alt process'in metrikleri sonuçla birlikte ana process'e taşınır (bkz. --metrics-port)
+    return execute_job(job_id), metrics.drain()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued movie analysis jobs on a thread pool, a process pool or a single asyncio event loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of jobs to run at once')
+        parser.add_argument('--mode', choices=['thread', 'process', 'async'], default='thread',
+                            help='"async" awaits upstream calls on one event loop instead of blocking a thread per job')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--metrics-port', type=int,
+                            help="Serve this worker's Prometheus metrics on the given port")
+        parser.add_argument('--metrics-host', default='127.0.0.1', help='Address for --metrics-port')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+
+        if options['metrics_port'] is not None:
+            server = metrics.start_http_server(options['metrics_port'], options['metrics_host'])
+            self.stdout.write(f'Metrics on http://{options["metrics_host"]}:{server.server_port}/metrics')
+
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'{requeued} stale job(s) re-queued'))
+
+        if options['mode'] == 'async':
+            self.stdout.write(self.style.SUCCESS(f'Worker started (async, concurrency={concurrency})'))
+            try:
+                asyncio.run(self.run_async(concurrency, poll_interval, options['once']))
+            except KeyboardInterrupt:
+                self.stdout.write('Stopped')
+            return
+
+        if options['mode'] == 'process':
+            # Fork edilen process'ler ana process'in DB bağlantısını paylaşmasın
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=concurrency, initializer=_init_process)
+            execute = _execute_in_process
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='analysis')
+            execute = execute_job
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker started ({options["mode"]} pool, concurrency={concurrency})'
+        ))
+
+        running = {}
+        try:
+            while True:
+                # Havuzda boş yer oldukça yeni iş al
+                while len(running) < concurrency:
+                    job_id = claim_next_job()
+                    if job_id is None:
+                        break
+                    running[executor.submit(execute, job_id)] = job_id
+                    self.stdout.write(f'Job #{job_id} started')
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        status = future.result()
+                        if execute is _execute_in_process:
+                            status, collected = status
+                            metrics.merge(collected)
+                        self.stdout.write(f'Job #{job_id} {status}')
+                    except Exception as e:
+                        # Havuz çöktü (ör. process öldü): iş RUNNING'de asılı kalmasın
+                        mark_failed(job_id, str(e))
+                        self.stdout.write(self.style.ERROR(f'Job #{job_id} crashed: {e}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping, waiting for running jobs...')
+        finally:
+            executor.shutdown(wait=True)
+
+    async def run_async(self, concurrency, poll_interval, once):
+        """Thread havuzlu döngünün async karşılığı: her iş bir asyncio görevi."""
+        claim = sync_to_async(claim_next_job)
+        running = {}
+        try:
+            while True:
+                while len(running) < concurrency:
+                    job_id = await claim()
+                    if job_id is None:
+                        break
+                    running[asyncio.ensure_future(aexecute_job(job_id))] = job_id
+                    self.stdout.write(f'Job #{job_id} started')
+
+                if not running:
+                    if once:
+                        break
+                    await asyncio.sleep(poll_interval)
+                    continue
+
+                done, _ = await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job_id = running.pop(task)
+                    try:
+                        self.stdout.write(f'Job #{job_id} {task.result()}')
+                    except Exception as e:
+                        await sync_to_async(mark_failed)(job_id, str(e))
+                        self.stdout.write(self.style.ERROR(f'Job #{job_id} crashed: {e}'))
+        finally:
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            await aclose_async_clients()
@@ -1,13 +1,22 @@
 from django.core.management.base import BaseCommand
-from movie_app.services import AIService
+from movie_app.splitters import get_splitter
+from movie_app.subtitles import parse_subtitle
+import json
 import os
+import time
 
 class Command(BaseCommand):
     help = 'Tests the movie splitting logic using a local test.srt file'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['single', 'chunked', 'both'], default='single',
+                            help='Splitting mode to run; "both" compares wall time and token use')
+        parser.add_argument('--engine', choices=['gemini', 'local'], default='gemini',
+                            help='Episode splitter to use; "local" makes no API calls')
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting test...'))
-        
+
         file_path = 'test.srt'
         if not os.path.exists(file_path):
             self.stdout.write(self.style.ERROR(f'{file_path} not found!'))
@@ -16,15 +25,30 @@ class Command(BaseCommand):
         with open(file_path, 'r', encoding='utf-8') as f:
             raw_content = f.read()
 
-        ai_service = AIService()
-        
         # Önce temizle (Token tasarrufu)
         self.stdout.write('Cleaning subtitles...')
-        clean_content = ai_service.clean_subtitle(raw_content)
-        
-        # Gemini'ye gönder
-        self.stdout.write('Sending to Gemini (this may take a few seconds)...')
-        result = ai_service.split_movie_into_episodes(clean_content)
-        
-        self.stdout.write(self.style.SUCCESS('--- Result from AI ---'))
-        self.stdout.write(result)
\ No newline at end of file
+        clean_content = parse_subtitle(raw_content).to_prompt_text()
+
+        modes = ['single', 'chunked'] if options['mode'] == 'both' else [options['mode']]
+        report = []
+        for mode in modes:
+            # Her mod kendi servis nesnesiyle çalışsın ki token sayaçları karışmasın
+            ai_service = get_splitter(options['engine'])
+
+            # Gemini'ye gönder
+            self.stdout.write(f'Splitting with {ai_service.name} engine in {mode} mode (this may take a few seconds)...')
+            started = time.perf_counter()
+            result = ai_service.split_movie_into_episodes(clean_content, mode=mode)
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(self.style.SUCCESS(f'--- Result from AI ({mode}) ---'))
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+            usage = getattr(ai_service, 'usage', {'calls': 0, 'prompt_tokens': 0, 'output_tokens': 0})
+            report.append((mode, elapsed, usage))
+
+        self.stdout.write(self.style.SUCCESS('--- Summary ---'))
+        for mode, elapsed, usage in report:
+            self.stdout.write(
+                f"{mode:<8} wall {elapsed:7.1f}s  calls {usage['calls']:3d}  "
+                f"prompt tokens {usage['prompt_tokens']:8d}  output tokens {usage['output_tokens']:6d}"
+            )
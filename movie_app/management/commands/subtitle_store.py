@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.utils import timezone
+from movie_app.models import StoredSubtitle
+from movie_app.subtitle_store import delete_entries, orphan_blobs, store_root
+
+
+class Command(BaseCommand):
+    help = 'Reports the size of the local subtitle store and prunes it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='Delete entries matching the options below')
+        parser.add_argument('--older-than', type=int, metavar='DAYS', help='Prune entries older than DAYS')
+        parser.add_argument('--max-size', type=float, metavar='MB', help='Prune oldest entries until the store fits in MB')
+        parser.add_argument('--imdb-id', help='Prune all entries of one movie')
+
+    def report(self):
+        totals = StoredSubtitle.objects.aggregate(
+            entries=Count('id'), raw=Sum('size'), stored=Sum('stored_size')
+        )
+        blobs = StoredSubtitle.objects.values('sha256').distinct().count()
+        raw = totals['raw'] or 0
+        stored = StoredSubtitle.objects.values('sha256', 'stored_size').distinct()
+        on_disk = sum(row['stored_size'] for row in stored)
+        ratio = f"{on_disk / raw:.0%}" if raw else "-"
+
+        self.stdout.write(f"Store: {store_root()}")
+        self.stdout.write(f"Entries: {totals['entries']}  unique files: {blobs}")
+        self.stdout.write(f"Raw size: {raw / 1024 / 1024:.2f} MB  on disk: {on_disk / 1024 / 1024:.2f} MB ({ratio})")
+        for row in StoredSubtitle.objects.values('provider').annotate(n=Count('id')).order_by('-n'):
+            self.stdout.write(f"  {row['provider']}: {row['n']}")
+
+    def handle(self, *args, **options):
+        if not options['prune']:
+            self.report()
+            return
+
+        freed = 0
+        entries = StoredSubtitle.objects.all()
+
+        if options['imdb_id']:
+            freed += delete_entries(entries.filter(imdb_id=options['imdb_id']))
+
+        if options['older_than'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['older_than'])
+            freed += delete_entries(entries.filter(created_at__lt=cutoff))
+
+        if options['max_size'] is not None:
+            limit = int(options['max_size'] * 1024 * 1024)
+            rows = list(StoredSubtitle.objects.order_by('created_at'))
+            # Aynı dosyayı paylaşan kayıtlar diskte tek sefer yer kaplar
+            total = sum({e.sha256: e.stored_size for e in rows}.values())
+            for entry in rows:
+                if total <= limit:
+                    break
+                released = delete_entries([entry])
+                freed += released
+                total -= released
+
+        for path in orphan_blobs():
+            freed += path.stat().st_size
+            path.unlink()
+
+        self.stdout.write(self.style.SUCCESS(f'Pruned, {freed / 1024 / 1024:.2f} MB freed'))
+        self.report()
@@ -0,0 +1,274 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+# Hafif, process içi ölçüm katmanı: aşama süreleri (histogram), sayaçlar (token, sağlayıcı
+# sonucu, önbellek isabeti). /metrics/ Prometheus metin formatında döner; her yanıta
+# o isteğin aşamalarını gösteren Server-Timing başlığı eklenir.
+# Kayıtlar process'e aittir: web process'i /metrics/'te, analiz worker'ı kendi
+# `run_worker --metrics-port` endpoint'inde yayınlar (Prometheus ikisini ayrı hedef olarak toplar).
+# settings.METRICS_ENABLED False iken tüm kayıt fonksiyonları hemen döner.
+PREFIX = 'movie'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_histograms = {}    # aşama -> [bucket sayıları..., +Inf], toplam süre
+_counters = {}      # (isim, ((etiket, değer), ...)) -> değer
+# İsteğe ait (aşama, ms) listesi; middleware kurar, Server-Timing başlığına yazılır
+_request_timings = ContextVar('request_timings', default=None)
+# settings.METRICS_ENABLED'ın önbelleği; her çağrıda settings'e bakılmasın
+_enabled = None
+
+
+def enabled():
+    global _enabled
+    if _enabled is None:
+        _enabled = getattr(settings, 'METRICS_ENABLED', True)
+    return _enabled
+
+
+@receiver(setting_changed)
+def _reset_enabled(setting, **kwargs):
+    global _enabled
+    if setting == 'METRICS_ENABLED':
+        _enabled = None
+
+
+def observe(stage, seconds):
+    if not enabled():
+        return
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = [[0] * (len(BUCKETS) + 1), 0.0]
+        hist[0][bisect_left(BUCKETS, seconds)] += 1
+        hist[1] += seconds
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds * 1000))
+
+
+def inc(name, value=1, **labels):
+    if not enabled() or not value:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def cache_result(cache, hit):
+    """Önbellek isabet oranı için: cache_requests_total{cache=..., result=hit|miss}."""
+    inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def stage(name):
+    """`with stage('gemini'):` bloğunun süresini ölçer."""
+    if not enabled():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Fonksiyon/metot dekoratörü; sync ve async fonksiyonları destekler."""
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not enabled():
+                    return await func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(name, time.perf_counter() - started)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def drain():
+    """Kayıtların kopyasını döner ve sıfırlar; process havuzundaki worker sonuçlarıyla ana process'e taşınır."""
+    with _lock:
+        snapshot = {k: ([*v[0]], v[1]) for k, v in _histograms.items()}, dict(_counters)
+        _histograms.clear()
+        _counters.clear()
+    return snapshot
+
+
+def merge(snapshot):
+    """drain() çıktısını bu process'in kayıtlarına ekler."""
+    histograms, counters = snapshot
+    with _lock:
+        for stage_name, (buckets, total) in histograms.items():
+            hist = _histograms.get(stage_name)
+            if hist is None:
+                hist = _histograms[stage_name] = [[0] * (len(BUCKETS) + 1), 0.0]
+            hist[0] = [a + b for a, b in zip(hist[0], buckets)]
+            hist[1] += total
+        for key, value in counters.items():
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def _labels(pairs):
+    return ','.join(f'{k}="{v}"' for k, v in pairs)
+
+
+def render():
+    """Prometheus text exposition formatı (0.0.4)."""
+    with _lock:
+        histograms = {k: ([*v[0]], v[1]) for k, v in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [f'# TYPE {PREFIX}_stage_seconds histogram']
+    for stage_name in sorted(histograms):
+        buckets, total = histograms[stage_name]
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += count
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage_name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage_name}"}} {total:.6f}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage_name}"}} {cumulative}')
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f'# TYPE {PREFIX}_{name} counter')
+        for (counter, labels), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f'{PREFIX}_{name}{{{_labels(labels)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def token_matches(authorization):
+    """Authorization başlığı settings.METRICS_TOKEN ile eşleşiyor mu (token ayarlı değilse False)."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    return bool(token) and hmac.compare_digest(authorization or '', f'Bearer {token}')
+
+
+def metrics_view(request):
+    """Prometheus hedefi: METRICS_TOKEN ile ya da staff oturumuyla erişilir."""
+    if not (token_matches(request.headers.get('Authorization')) or request.user.is_staff):
+        response = HttpResponse('Forbidden', status=403, content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Worker'ın metrik endpoint'i; METRICS_TOKEN ayarlıysa her istekte istenir."""
+
+    def do_GET(self):
+        if getattr(settings, 'METRICS_TOKEN', '') and not token_matches(self.headers.get('Authorization')):
+            self.send_response(403)
+            self.send_header('WWW-Authenticate', 'Bearer')
+            self.end_headers()
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """
+    Bu process'in metriklerini ayrı bir thread'de HTTP ile yayınlar (web sunucusu olmayan
+    worker'lar için). Varsayılan olarak sadece localhost'a bağlanır; dışarı açılacaksa
+    METRICS_TOKEN ayarlanmalı.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+
+def _server_timing(timings, total_ms):
+    entries = [f'{name};dur={ms:.1f}' for name, ms in timings]
+    entries.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Her isteğin toplam süresini `view:<url adı>` aşaması olarak kaydeder ve istek sırasında
+    ölçülen aşamaları Server-Timing başlığına yazar (tarayıcı geliştirici araçlarında görünür).
+    contextvars.copy_context() ile çalışan yan thread'ler (sağlayıcı yarışı, chunked map)
+    isteğin listesini paylaşır; süreleri başlığa da girer. Yanıttan sonra biten thread'lerin
+    (yarışı kaybeden sağlayıcı) süreleri sadece histograma yansır.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        token = _request_timings.set([])
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            return self._finish(request, response, started)
+        finally:
+            _request_timings.reset(token)
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        token = _request_timings.set([])
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            return self._finish(request, response, started)
+        finally:
+            _request_timings.reset(token)
+
+    @staticmethod
+    def _finish(request, response, started):
+        elapsed = time.perf_counter() - started
+        timings = list(_request_timings.get())
+        match = getattr(request, 'resolver_match', None)
+        observe(f"view:{match.url_name if match else 'unknown'}", elapsed)
+        response['Server-Timing'] = _server_timing(timings, elapsed * 1000)
+        return response
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0002_movie_movie_info_movie_slug_alter_movie_episode_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('owner', models.CharField(max_length=32)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
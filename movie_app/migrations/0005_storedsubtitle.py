@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0004_analysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredSubtitle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imdb_id', models.CharField(db_index=True, max_length=50)),
+                ('language', models.CharField(blank=True, max_length=10)),
+                ('provider', models.CharField(max_length=30)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('stored_size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('imdb_id', 'language', 'provider')},
+            },
+        ),
+    ]
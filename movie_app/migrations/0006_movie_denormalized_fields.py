@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Movie = apps.get_model('movie_app', 'Movie')
+    batch = []
+    for movie in Movie.objects.all().iterator(chunk_size=1000):
+        info = movie.movie_info or {}
+        poster = info.get('poster') or ''
+        movie.poster_url = poster if poster != 'N/A' else ''
+        movie.year = str(info.get('year') or '')[:10]
+        episodes = movie.episode_data or []
+        failed = len(episodes) == 1 and str(episodes[0].get('title', '')).startswith('Analiz Hatası')
+        if episodes and not failed:
+            movie.analysis_status = 'done'
+            movie.episode_count = len(episodes)
+            movie.analyzed_at = movie.created_at
+        elif failed:
+            movie.analysis_status = 'failed'
+        batch.append(movie)
+        if len(batch) >= 1000:
+            Movie.objects.bulk_update(batch, ['poster_url', 'year', 'analysis_status', 'episode_count', 'analyzed_at'])
+            batch = []
+    if batch:
+        Movie.objects.bulk_update(batch, ['poster_url', 'year', 'analysis_status', 'episode_count', 'analyzed_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0005_storedsubtitle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='analysis_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='analyzed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='episode_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='poster_url',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='year',
+            field=models.CharField(blank=True, db_index=True, max_length=10),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0006_movie_denormalized_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='partial',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0007_analysisjob_partial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpstreamBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('tokens', models.FloatField(default=0)),
+                ('refilled_at', models.FloatField(default=0)),
+                ('day', models.DateField(blank=True, null=True)),
+                ('used', models.PositiveIntegerField(default=0)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
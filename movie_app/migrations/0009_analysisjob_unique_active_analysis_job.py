@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # Kısıttan önce açılmış çift aktif işler: film başına en eskisi kalır
+    AnalysisJob = apps.get_model('movie_app', 'AnalysisJob')
+    seen = set()
+    duplicates = []
+    for job in AnalysisJob.objects.filter(status__in=['queued', 'running']).order_by('id').only('id', 'imdb_id'):
+        if job.imdb_id in seen:
+            duplicates.append(job.id)
+        seen.add(job.imdb_id)
+    AnalysisJob.objects.filter(id__in=duplicates).update(status='failed', error='Aynı film için başka bir iş var.')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_app', '0008_upstreambucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='analysisjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('imdb_id',), name='unique_active_analysis_job'),
+        ),
+    ]
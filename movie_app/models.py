@@ -1,8 +1,19 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 import unidecode # Eğer yüklü değilse: pip install unidecode
+from .splitters import is_error_result
 
 class Movie(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=255, blank=True, null=True)
     imdb_id = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=255, unique=True, blank=True) # YENİ ALAN
@@ -10,18 +21,147 @@ class Movie(models.Model):
     movie_info = models.JSONField(default=dict, blank=True) # Cache için
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # JSON alanlarından türetilen, indeksli kolonlar (save() içinde güncellenir).
+    # Liste sayfaları ve "analiz var mı" kontrolleri blob'ları yüklemeden bunları kullanır.
+    analysis_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    analyzed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    episode_count = models.PositiveSmallIntegerField(default=0)
+    poster_url = models.URLField(max_length=500, blank=True)
+    year = models.CharField(max_length=10, blank=True, db_index=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Slug değişirse eski adresin önbellekteki sayfası da silinebilsin (response_cache.invalidate_movie)
+        instance._loaded_slug = instance.__dict__.get('slug')
+        return instance
+
+    def sync_denormalized_fields(self):
+        info = self.movie_info or {}
+        poster = info.get('poster') or ''
+        self.poster_url = poster if poster != 'N/A' else ''
+        self.year = str(info.get('year') or '')[:10]
+
+        if not self.episode_data:
+            self.analysis_status = Movie.PENDING
+            self.episode_count = 0
+            self.analyzed_at = None
+        elif is_error_result(self.episode_data):
+            self.analysis_status = Movie.FAILED
+            self.episode_count = 0
+        else:
+            self.analysis_status = Movie.DONE
+            self.episode_count = len(self.episode_data)
+            self.analyzed_at = self.analyzed_at or timezone.now()
+
+    @staticmethod
+    def base_slug(title):
+        # Türkçe karakterleri İngilizce karşılıklarına çevir (Ş -> s, ı -> i)
+        return slugify(unidecode.unidecode(title))
+
+    @staticmethod
+    def fallback_slug(base_slug, imdb_id):
+        # Başlık slug'ı doluysa sonuna ID eklenir (Matrix ve Matrix Reloaded karışmasın)
+        return f"{base_slug}-{imdb_id}"
+
     def save(self, *args, **kwargs):
-        # Eğer slug yoksa ve başlık varsa oluştur
+        # Eğer slug yoksa ve başlık varsa oluştur (import_catalog aynı kuralı toplu uygular)
         if not self.slug and self.title:
-            # Türkçe karakterleri İngilizce karşılıklarına çevir (Ş -> s, ı -> i)
-            base_slug = slugify(unidecode.unidecode(self.title))
+            base_slug = Movie.base_slug(self.title)
             self.slug = base_slug
-            
-            # Eğer bu slug zaten varsa sonuna ID ekle (Matrix ve Matrix Reloaded karışmasın)
+
             if Movie.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                self.slug = f"{base_slug}-{self.imdb_id}"
-        
+                self.slug = Movie.fallback_slug(base_slug, self.imdb_id)
+
+        self.sync_denormalized_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'episode_data', 'movie_info'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {
+                'analysis_status', 'analyzed_at', 'episode_count', 'poster_url', 'year'
+            }
+
         super(Movie, self).save(*args, **kwargs)
+        self._loaded_slug = self.slug
+
+    def __str__(self):
+        return self.title or self.imdb_id
+
+
+class AnalysisLease(models.Model):
+    """Aynı film için birden fazla worker'ın aynı anda analiz yapmasını engelleyen kilit."""
+    key = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=32)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.key
+
+
+class AnalysisJob(models.Model):
+    """Arka planda çalışan analiz işi. /analyze/ kuyruğa ekler, run_worker komutu işler."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    imdb_id = models.CharField(max_length=50, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    result = models.JSONField(default=dict, blank=True)
+    # Gemini cevabı akarken tamamlanan bölümler; /analyze/stream/ bunları sayfaya iter
+    partial = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    error_status = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Film başına tek aktif iş: aynı anda gelen iki /analyze/ iki iş açamaz
+            models.UniqueConstraint(
+                fields=['imdb_id'], condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_analysis_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.imdb_id} ({self.status})"
+
+
+class StoredSubtitle(models.Model):
+    """İndirilen altyazının diskteki (içerik hash'i ile adreslenen) kopyasının indeksi."""
+    imdb_id = models.CharField(max_length=50, db_index=True)
+    language = models.CharField(max_length=10, blank=True)
+    provider = models.CharField(max_length=30)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveIntegerField(default=0)  # Ham boyut (byte)
+    stored_size = models.PositiveIntegerField(default=0)  # Sıkıştırılmış boyut (byte)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('imdb_id', 'language', 'provider')
+
+    def __str__(self):
+        return f"{self.imdb_id} [{self.provider}/{self.language}]"
+
+
+class UpstreamBucket(models.Model):
+    """
+    Upstream başına paylaşılan token bucket ve günlük kota sayacı (bkz. ratelimit.py).
+    Tüm web ve worker process'leri aynı satırı günceller; eşzamanlı yazımlar version ile çözülür.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField(default=0)
+    refilled_at = models.FloatField(default=0)  # Unix zamanı (saniye)
+    day = models.DateField(null=True, blank=True)  # Kota sayacının ait olduğu UTC günü
+    used = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return self.title or self.imdb_id
\ No newline at end of file
+        return f"{self.name} ({self.used} bugün)"
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from . import metrics
+from .http_sessions import get_session
+from .singleflight import SingleFlight
+
+# OMDb posterleri bir kez indirilir, boyutlandırılmış kopyaları diskte saklanır ve
+# /poster/<varyant>/?src=... üzerinden uzun süreli önbellek başlıklarıyla sunulur.
+# Dosyalar kaynak URL'nin hash'i ile adreslenir: aynı URL'nin içeriği değişmez kabul edilir.
+#
+#     poster_cache/ab/abcdef.../original      indirilen dosya (olduğu gibi)
+#     poster_cache/ab/abcdef.../grid.v1.jpg   boyutlandırılmış kopya
+
+# Varyant -> en fazla (genişlik, yükseklik). 2x ekranlar için CSS boyutunun iki katı.
+VARIANTS = {
+    'thumb': (80, 120),     # Otomatik tamamlama listesi (35x50)
+    'grid': (300, 450),     # Ana sayfa kartları
+    'hero': (600, 900),     # Detay sayfası (280 px genişlik)
+}
+JPEG_QUALITY = 82
+# Boyutlandırma ayarı değişirse artırılır; ETag'ler ve dosya adları yenilenir
+RENDER_VERSION = 1
+# Bundan büyük kaynak dosyalar indirilmez
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# İndirilemeyen poster bu süre boyunca tekrar denenmez
+MISSING_TTL = 60 * 60
+
+# Dosya başlığındaki imza -> içerik tipi (Pillow yoksa orijinal dosya sunulur)
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG', 'image/png'),
+    (b'GIF8', 'image/gif'),
+)
+
+_flight = SingleFlight()
+_pil = None
+
+
+def poster_root():
+    return Path(getattr(settings, 'POSTER_CACHE_DIR', Path(settings.BASE_DIR) / 'poster_cache'))
+
+
+def is_allowed(src):
+    """Sadece settings.POSTER_HOSTS'taki https/http adresleri indirilir (açık proxy olmasın)."""
+    try:
+        parts = urlsplit(src or '')
+    except ValueError:
+        return False
+    return parts.scheme in ('http', 'https') and parts.hostname in settings.POSTER_HOSTS
+
+
+def source_digest(src):
+    return hashlib.sha256(src.encode('utf-8')).hexdigest()
+
+
+def poster_dir(digest):
+    return poster_root() / digest[:2] / digest
+
+
+def original_path(digest):
+    return poster_dir(digest) / 'original'
+
+
+def is_original(path):
+    """poster_file() varyant yerine indirilen orijinali döndüyse True."""
+    return path.name == 'original'
+
+
+def variant_path(digest, variant):
+    return poster_dir(digest) / f"{variant}.v{RENDER_VERSION}.jpg"
+
+
+def poster_url(src, variant):
+    """Şablon ve JSON için yerel poster adresi; izin verilmeyen adres olduğu gibi, 'N/A' boş döner."""
+    if not src or src == 'N/A':
+        return ''
+    if not is_allowed(src):
+        return src
+    return f"{reverse('poster', args=[variant])}?{urlencode({'src': src})}"
+
+
+def etag(digest, path):
+    # Dosya adı varyantı ve RENDER_VERSION'ı içerir; orijinal sunulduysa ETag farklı olur
+    return f'"{digest[:32]}-{path.name}"'
+
+
+def content_type(path):
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+def _image_module():
+    """Pillow opsiyonel: yoksa varyantlar üretilmez, orijinal dosya sunulur."""
+    global _pil
+    if _pil is None:
+        try:
+            from PIL import Image
+        except ImportError:
+            print("Pillow yüklü değil; posterler boyutlandırılmadan sunulacak.")
+            Image = False
+        _pil = Image
+    return _pil
+
+
+def _atomic_write(path, write):
+    """Önce geçici dosyaya yazar, sonra taşır; yarım dosya sunulmaz."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            written = write(f)
+        if written is False:
+            os.unlink(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+@metrics.timed('poster_fetch')
+def _download(src, path):
+    """Kaynağı parça parça diske yazar; resim değilse ya da çok büyükse False."""
+    session = get_session('posters', timeout=(3.05, 10))
+    with session.get(src, stream=True, allow_redirects=False) as response:
+        if response.status_code != 200 or not response.headers.get('Content-Type', '').startswith('image/'):
+            print(f"Poster Error: {src} -> {response.status_code}")
+            return False
+
+        def write(f):
+            size = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_SOURCE_BYTES:
+                    print(f"Poster Error: {src} {MAX_SOURCE_BYTES} byte sınırını aşıyor")
+                    return False
+                f.write(chunk)
+            return size > 0
+
+        return _atomic_write(path, write)
+
+
+def _render(digest):
+    """Orijinalden eksik varyantları üretir (Pillow gerekir)."""
+    Image = _image_module()
+    if not Image:
+        return
+    missing = [v for v in VARIANTS if not variant_path(digest, v).exists()]
+    if not missing:
+        return
+    with metrics.stage('poster_resize'), Image.open(original_path(digest)) as source:
+        # JPEG'i hedefe yakın boyutta çöz: tam çözünürlüklü bitmap belleğe açılmaz
+        source.draft('RGB', max(VARIANTS[v] for v in missing))
+        image = source.convert('RGB')
+        for variant in missing:
+            resized = image.copy()
+            resized.thumbnail(VARIANTS[variant], Image.LANCZOS)
+            _atomic_write(variant_path(digest, variant),
+                          lambda f: resized.save(f, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True))
+
+
+def _prepare(src, digest):
+    original = original_path(digest)
+    if not original.exists():
+        missing_key = f'poster:missing:{digest}'
+        if cache.get(missing_key):
+            return
+        try:
+            downloaded = _download(src, original)
+        except Exception as e:
+            print(f"Poster Error: {e}")
+            downloaded = False
+        if not downloaded:
+            cache.set(missing_key, True, MISSING_TTL)
+            return
+    try:
+        _render(digest)
+    except Exception as e:
+        # Bozuk/desteklenmeyen resim: orijinal sunulur
+        print(f"Poster Resize Error: {e}")
+
+
+def poster_file(src, variant):
+    """
+    Varyantın diskteki yolu. İlk istekte kaynak indirilir ve tüm varyantlar üretilir
+    (aynı poster için eşzamanlı istekler tek indirmeye iner). Varyant üretilemiyorsa
+    orijinal, kaynak hiç alınamıyorsa None döner.
+    """
+    digest = source_digest(src)
+    path = variant_path(digest, variant)
+    hit = path.exists()
+    metrics.cache_result('poster', hit)
+    if not hit:
+        _flight.do(digest, lambda: _prepare(src, digest))
+    for candidate in (path, original_path(digest)):
+        if candidate.exists():
+            return candidate
+    return None
@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from django.conf import settings
+from django.db import close_old_connections
+from . import metrics, ratelimit
+from .services import SubtitleService
+
+# Sağlayıcı başına yarışa başlangıçtan itibaren tanınan süre (saniye)
+PROVIDER_DEADLINES = {
+    'opensubtitles': 20,
+    'subliminal': 45,
+}
+
+# Tüm yarışların paylaştığı thread havuzu. Sağlayıcı sayısı x eşzamanlı analiz kadar olmalı;
+# dolarsa yeni yarışın sağlayıcıları sırada bekler (son süreleri başlangıçtan sayılır).
+PROVIDER_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=PROVIDER_WORKERS, thread_name_prefix='subtitle')
+
+# limited: sağlayıcı upstream sınırı/kotası yüzünden denenemediyse ratelimit.RateLimited
+ProviderResult = namedtuple('ProviderResult', ['provider', 'text', 'language', 'latency_ms', 'limited'],
+                            defaults=(None,))
+
+
+def is_valid_subtitle(text):
+    """Boş ya da zaman kodu içermeyen (HTML hata sayfası vb.) cevapları elemek için."""
+    return bool(text) and '-->' in text
+
+
+def _fetchers(imdb_id, title, asynchronous):
+    """Yarışacak sağlayıcılar: isim -> fetch(service). settings.SUBTITLE_PROVIDERS dışındakiler çıkarılır."""
+    if asynchronous:
+        fetchers = {'opensubtitles': lambda service: service.aget_subtitle(imdb_id),
+                    'subliminal': lambda service: service.aget_subtitle_alt(title)}
+    else:
+        fetchers = {'opensubtitles': lambda service: service.get_subtitle(imdb_id),
+                    'subliminal': lambda service: service.get_subtitle_alt(title)}
+    if not title:
+        del fetchers['subliminal']
+    return {name: fetch for name, fetch in fetchers.items() if name in settings.SUBTITLE_PROVIDERS}
+
+
+def _result(provider, service, started, text=None, error=None):
+    if error is not None:
+        print(f"{provider} Error: {error}")
+    limited = error if isinstance(error, ratelimit.RateLimited) else None
+    latency_ms = int((time.monotonic() - started) * 1000)
+    return ProviderResult(provider, text, service.last_language, latency_ms, limited)
+
+
+def _fetch(provider, fetch, service, started):
+    # Havuz thread'i kendi DB bağlantısını açar (ratelimit kovası); yarış bitince kapatılmalı
+    try:
+        return _result(provider, service, started, text=fetch(service))
+    except Exception as e:
+        return _result(provider, service, started, error=e)
+    finally:
+        close_old_connections()
+
+
+def _expire(pending, names, deadlines, elapsed):
+    """Süresi dolan sağlayıcıları yarıştan çıkarır; kalanların en yakın son süresine kalan zamanı döner."""
+    for item in [p for p in pending if elapsed >= deadlines[names[p]]]:
+        print(f"⏱️ {names[item]} süresi doldu ({deadlines[names[item]]}s)")
+        metrics.inc('provider_results_total', provider=names[item], result='timeout')
+        pending.discard(item)
+    return min((deadlines[names[p]] for p in pending), default=0) - elapsed
+
+
+def _accept(result):
+    """Biten sağlayıcının sonucunu kaydeder; geçerli altyazıysa True."""
+    if is_valid_subtitle(result.text):
+        print(f"🏁 Altyazı kaynağı: {result.provider} ({result.latency_ms} ms)")
+        metrics.inc('provider_results_total', provider=result.provider, result='hit')
+        return True
+    print(f"{result.provider} altyazı bulamadı ({result.latency_ms} ms)")
+    metrics.inc('provider_results_total', provider=result.provider, result='miss')
+    return False
+
+
+def race_providers(imdb_id, title=None, deadlines=None):
+    """
+    OpenSubtitles ve Subliminal'i aynı anda başlatır, ilk geçerli altyazıyı döner.
+    Süresi dolan ya da geç kalan sağlayıcıların sonucu beklenmez. Henüz başlamamış olanlar
+    iptal edilir; çalışanlar (thread durdurulamaz) kota harcayan indirmeye geçmeden bırakır.
+    Hiçbiri bulamazsa None döner; bulamayanlardan biri upstream sınırına takıldıysa
+    RateLimited fırlatılır ki çağıran "bulunamadı" yerine "sonra tekrar dene" desin.
+    """
+    deadlines = {**PROVIDER_DEADLINES, **(deadlines or {})}
+    fetchers = _fetchers(imdb_id, title, asynchronous=False)
+    if not fetchers:
+        return None
+
+    started = time.monotonic()
+    services = {name: SubtitleService() for name in fetchers}
+    # Her thread çağıranın context'iyle çalışır (ratelimit.bulk önceliği kaybolmasın)
+    futures = {_executor.submit(contextvars.copy_context().run, _fetch, name, fetch, services[name], started): name
+               for name, fetch in fetchers.items()}
+    limited = None
+
+    try:
+        pending = set(futures)
+        while pending:
+            timeout = _expire(pending, futures, deadlines, time.monotonic() - started)
+            if not pending:
+                break
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if _accept(result):
+                    return result
+                limited = limited or result.limited
+        if limited:
+            raise limited
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+        for service in services.values():
+            service.cancelled.set()
+
+
+async def _afetch(provider, fetch, started):
+    service = SubtitleService()
+    try:
+        return _result(provider, service, started, text=await fetch(service))
+    except Exception as e:
+        return _result(provider, service, started, error=e)
+
+
+async def arace_providers(imdb_id, title=None, deadlines=None):
+    """race_providers'ın async karşılığı: kaybeden sağlayıcıların görevleri iptal edilir."""
+    deadlines = {**PROVIDER_DEADLINES, **(deadlines or {})}
+    fetchers = _fetchers(imdb_id, title, asynchronous=True)
+    if not fetchers:
+        return None
+
+    started = time.monotonic()
+    tasks = {asyncio.ensure_future(_afetch(name, fetch, started)): name for name, fetch in fetchers.items()}
+    limited = None
+
+    try:
+        pending = set(tasks)
+        while pending:
+            timeout = _expire(pending, tasks, deadlines, time.monotonic() - started)
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if _accept(result):
+                    return result
+                limited = limited or result.limited
+        if limited:
+            raise limited
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,257 @@
+import asyncio
+import math
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone as dt_timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, OperationalError, connection, transaction
+from . import metrics
+from .models import UpstreamBucket
+
+# Upstream adı -> RateLimiter. Kayıtlı limiter yoksa acquire() hiç beklemez.
+_limiters = {}
+
+# Async (ASGI) yolda upstream başına aynı anda açık tutulabilecek istek sayısı.
+# Event loop tek thread'de binlerce isteği bekletebildiği için upstream'i korumak gerekir.
+CONCURRENCY = {
+    'omdb': 16,
+    'opensubtitles': 4,
+    'subliminal': 2,
+    'gemini': 4,
+}
+DEFAULT_CONCURRENCY = 8
+
+# asyncio.Semaphore bir event loop'a bağlıdır: loop -> {upstream adı: semaphore}
+_semaphores = weakref.WeakKeyDictionary()
+
+
+class RateLimiter:
+    """Process içi, thread-safe hız sınırlayıcı: saniyede en fazla `rate` çağrıya izin verir."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Sıradaki çağrı hakkını ayırır; beklenmesi gereken süreyi (saniye) döner."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# --- Process'ler arası token bucket ve günlük kota ---
+#
+# settings.UPSTREAM_LIMITS upstream başına {'rate', 'burst', 'daily'} verir. Kova durumu
+# UpstreamBucket tablosunda tutulur, böylece tüm web ve worker process'leri aynı sınırı görür.
+# Yukarıdaki RateLimiter process içidir (prewarm'ın --*-rps seçenekleri); ikisi birlikte uygulanır.
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+# Toplu işler (prewarm gibi) kovanın bu oranını etkileşimli isteklere bırakır: jeton bu seviyenin
+# altındaysa beklerler. Günlük kotanın da en fazla BULK_QUOTA_SHARE kadarını kullanabilirler.
+BULK_RESERVE = 0.5
+BULK_QUOTA_SHARE = 0.8
+# Etkileşimli çağrı sırasını bundan uzun beklemez; RateLimited (retry_after ile) fırlatılır
+INTERACTIVE_MAX_WAIT = 10.0
+# Aynı satırı eşzamanlı güncelleyen process'ler çakışırsa (ya da SQLite kilidi) tekrar deneme sayısı
+UPDATE_ATTEMPTS = 20
+# SQLite "locked" hatasında ilk bekleme (saniye); her denemede ikiye katlanır, en fazla 0.1 s
+LOCKED_BACKOFF = 0.002
+
+_priority = ContextVar('ratelimit_priority', default=INTERACTIVE)
+
+
+class RateLimited(Exception):
+    """Upstream'in hız sınırı ya da günlük kotası doldu; retry_after saniye sonra tekrar denenebilir."""
+
+    def __init__(self, upstream, retry_after, quota=False):
+        self.upstream = upstream
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.quota = quota
+        reason = 'günlük kotası doldu' if quota else 'istek sınırına ulaşıldı'
+        self.message = f"{upstream} {reason}, lütfen {self.retry_after} saniye sonra tekrar deneyin."
+        super().__init__(self.message)
+
+
+@contextmanager
+def bulk():
+    """Bloğun içindeki upstream çağrılarını düşük öncelikli (toplu iş) olarak işaretler."""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _seconds_until_tomorrow(now):
+    return 86400 - now % 86400
+
+
+def take(name, spec, priority=INTERACTIVE):
+    """
+    Paylaşılan kovadan bir jeton almayı dener; (alındı mı, bekleme süresi) döner.
+    Etkileşimli çağrı jetonu hemen ayırır (kova eksiye düşebilir) ve sırası gelene kadar bekler.
+    Toplu çağrı rezerv dolmadan jeton almaz; bekleyip tekrar dener, böylece sırayı etkileşimli
+    isteklere bırakır. Kota dolduysa ya da bekleme çok uzunsa RateLimited fırlatır.
+    """
+    rate, burst, daily = spec.get('rate'), spec.get('burst', 1), spec.get('daily')
+    if daily and priority == BULK:
+        daily = int(daily * BULK_QUOTA_SHARE)
+
+    for attempt in range(UPDATE_ATTEMPTS):
+        now = time.time()
+        today = datetime.fromtimestamp(now, dt_timezone.utc).date()
+        try:
+            bucket = UpstreamBucket.objects.filter(name=name).first()
+        except OperationalError as e:
+            _backoff_if_locked(e, attempt)
+            continue
+        if bucket is None:
+            try:
+                with transaction.atomic():
+                    UpstreamBucket.objects.create(name=name, tokens=burst, refilled_at=now, day=today)
+            except IntegrityError:
+                pass
+            except OperationalError as e:
+                _backoff_if_locked(e, attempt)
+            continue
+
+        used = bucket.used if bucket.day == today else 0
+        if daily is not None and used >= daily:
+            metrics.inc('ratelimit_rejected_total', upstream=name, reason='quota')
+            raise RateLimited(name, _seconds_until_tomorrow(now), quota=True)
+
+        tokens, wait = bucket.tokens, 0.0
+        if rate:
+            tokens = min(burst, tokens + max(0.0, now - bucket.refilled_at) * rate)
+            if priority == BULK and tokens - 1 < burst * BULK_RESERVE:
+                return False, (burst * BULK_RESERVE + 1 - tokens) / rate
+            wait = max(0.0, (1 - tokens) / rate)
+            if priority == INTERACTIVE and wait > INTERACTIVE_MAX_WAIT:
+                metrics.inc('ratelimit_rejected_total', upstream=name, reason='rate')
+                raise RateLimited(name, wait)
+
+        # Okuma ve yazma ayrı (autocommit) sorgular: araya giren yazımı version koşulu yakalar
+        try:
+            updated = UpstreamBucket.objects.filter(pk=bucket.pk, version=bucket.version).update(
+                tokens=tokens - 1, refilled_at=now, day=today, used=used + 1, version=bucket.version + 1
+            )
+        except OperationalError as e:
+            _backoff_if_locked(e, attempt)
+            continue
+        if updated:
+            return True, wait
+    # Sürekli çakışma: kova çok yoğun kullanılıyor
+    raise RateLimited(name, 1 / rate if rate else 1)
+
+
+def _backoff_if_locked(error, attempt):
+    """
+    SQLite kilit hatası geçicidir: kısa bekleyip tekrar denenir. Diğer DB hataları ve son
+    denemedeki kilit yükselir (_try_take fail-open yapar).
+    """
+    if 'locked' not in str(error) or attempt == UPDATE_ATTEMPTS - 1:
+        raise error
+    time.sleep(min(LOCKED_BACKOFF * (2 ** attempt), 0.1))
+
+
+def _try_take(name, spec, priority):
+    """
+    take()'in kalıcı DB hatasına dayanıklı hali: sınırlayıcı arızası çağrıyı engellemez
+    (fail-open). Aksi halde hata upstream hatası sanılıp Gemini/OMDb sonucu olarak önbelleğe
+    yazılırdı. take() kendi transaction'ını açmaz: SQLite'ta okuyup sonra yazan transaction
+    eşzamanlı kullanımda hemen "database is locked" verir. Çağıran zaten bir transaction
+    içindeyse savepoint, hatanın onu bozmasını önler.
+    """
+    try:
+        if connection.in_atomic_block:
+            with transaction.atomic():
+                return take(name, spec, priority)
+        return take(name, spec, priority)
+    except DatabaseError as e:
+        print(f"Rate Limit Error: {name} paylaşılan sınır okunamadı, çağrıya izin veriliyor: {e}")
+        metrics.inc('ratelimit_errors_total', upstream=name)
+        return True, 0.0
+
+
+def _shared_limit(name):
+    return getattr(settings, 'UPSTREAM_LIMITS', {}).get(name)
+
+
+def configure(name, rate):
+    """`name` upstream'i için saniyede `rate` çağrı sınırı koyar (None/0 sınırı kaldırır)."""
+    if rate:
+        _limiters[name] = RateLimiter(rate)
+    else:
+        _limiters.pop(name, None)
+
+
+def acquire(name):
+    """
+    Servisler her upstream çağrısından önce çağırır. Sırası gelene kadar bekler;
+    beklenemeyecekse (kota, uzun kuyruk) RateLimited fırlatır. Paylaşılan kova DB hatası
+    verirse çağrıya izin verilir.
+    """
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        limiter.acquire()
+    spec = _shared_limit(name)
+    if spec:
+        priority = _priority.get()
+        while True:
+            taken, wait = _try_take(name, spec, priority)
+            if wait > 0:
+                time.sleep(wait)
+            if taken:
+                return
+
+
+async def aacquire(name):
+    """acquire() ile aynı, event loop'u bloklamadan bekler."""
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        await limiter.aacquire()
+    spec = _shared_limit(name)
+    if spec:
+        priority = _priority.get()
+        while True:
+            taken, wait = await sync_to_async(_try_take)(name, spec, priority)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if taken:
+                return
+
+
+def slot(name):
+    """Upstream'in bu event loop'taki eşzamanlılık semaphore'u (`async with` ile kullanılır)."""
+    per_loop = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = per_loop.get(name)
+    if semaphore is None:
+        semaphore = per_loop[name] = asyncio.Semaphore(CONCURRENCY.get(name, DEFAULT_CONCURRENCY))
+    return semaphore
+
+
+@asynccontextmanager
+async def limit(name):
+    """Async servislerin upstream çağrılarını sarar: eşzamanlılık sınırı + hız sınırı."""
+    async with slot(name):
+        await aacquire(name)
+        yield
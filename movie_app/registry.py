@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import weakref
+
+# Ağır bağımlılıklar (google.genai ~0.6 s, subliminal + babelfish ~0.5 s) ve pahalı istemciler
+# için tembel kayıt. Fabrikalar isimle kaydedilir, ilk get() çağrısında çalışır; sonuç process
+# başına bir kez kurulup paylaşılır. Böylece Django açılışı, worker ve sadece DB'ye dokunan
+# manage.py komutları bu modülleri hiç import etmez.
+#
+#     @registry.provider('genai')
+#     def _genai_client(api_key, base_url):
+#         from google import genai
+#         return genai.Client(...)
+#
+#     client = registry.get('genai', api_key, base_url)
+
+_factories = {}
+_instances = {}
+_lock = threading.Lock()
+
+# Async istemciler oluşturuldukları event loop'a bağlıdır: loop -> {(isim, *anahtar): örnek}
+_loop_instances = weakref.WeakKeyDictionary()
+
+
+def provider(name):
+    """Fabrika fonksiyonunu isimle kaydeden dekoratör."""
+    def decorator(factory):
+        _factories[name] = factory
+        return factory
+    return decorator
+
+
+def get(name, *key):
+    """
+    Paylaşılan örneği döner; yoksa fabrikayı key argümanlarıyla çağırıp kurar (thread-safe,
+    aynı anda gelen çağrılar tek örnek görür). key değişirse (ör. başka API anahtarı) ayrı örnek kurulur.
+    """
+    cache_key = (name, *key)
+    instance = _instances.get(cache_key)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(cache_key)
+            if instance is None:
+                instance = _instances[cache_key] = _factories[name](*key)
+    return instance
+
+
+def get_for_loop(name, *key):
+    """get()'in event loop başına karşılığı; loop kapanınca örnekler de bırakılır."""
+    per_loop = _loop_instances.setdefault(asyncio.get_running_loop(), {})
+    cache_key = (name, *key)
+    instance = per_loop.get(cache_key)
+    if instance is None:
+        instance = per_loop[cache_key] = _factories[name](*key)
+    return instance
+
+
+def reset():
+    """Kurulmuş örnekleri unutur (testler, yapılandırma değişikliği)."""
+    with _lock:
+        _instances.clear()
+    _loop_instances.clear()
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import Resolver404, resolve
+from .jobs import claim_next_job, execute_job
+
+# Kayıtlı bir istek günlüğünü (JSONL) uygulamaya karşı yeniden oynatır ve endpoint başına
+# gecikme yüzdeliklerini raporlar. Upstream'ler stubs.py'deki yerel sunuculardır.
+#
+# Günlük formatı, satır başına bir istek:
+#   {"method": "GET", "path": "/autocomplete/?q=matrix", "at": 0.25}
+# "at" (saniye) verilirse istek o anda gönderilir (speed ile ölçeklenir); yoksa
+# istekler `concurrency` kadar paralel, olabildiğince hızlı gönderilir.
+
+LogEntry = namedtuple('LogEntry', ['method', 'path', 'at'])
+
+# /analyze/ 202 dönerse işin bitişi bu aralıkla sorgulanır
+JOB_POLL_INTERVAL = 0.2
+# Analiz bitene kadar geçen toplam süre bu isimle raporlanır
+ANALYZE_DONE = 'analyze (until done)'
+
+SAMPLE_QUERIES = (
+    'matrix', 'transformers', 'inception', 'amelie', 'yuzuklerin efendisi', 'interstellar',
+    'the godfather', 'parasite', 'spirited away', 'dune', 'alien', 'heat', 'memento', 'up',
+)
+
+
+def read_log(stream):
+    """JSONL günlüğünü okur; boş ve '#' ile başlayan satırlar atlanır. "url" de kabul edilir."""
+    entries = []
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        record = json.loads(line)
+        path = record.get('path') or record.get('url')
+        if not path:
+            raise ValueError(f'line {number}: "path" missing')
+        at = record.get('at', record.get('t'))
+        entries.append(LogEntry(record.get('method', 'GET').upper(), path, None if at is None else float(at)))
+    return entries
+
+
+def generate_log(count, rate=20.0, seed=0):
+    """
+    Gerçekçi bir karışım üretir: canlı arama, ana sayfa, film açma ve analiz.
+    Her film analizden önce /open/ ile açılır (kayıt OMDb'den oluşturulur); bazı filmler
+    tekrar analiz edilir ki önbellek yolları da ölçülsün.
+    """
+    rng = random.Random(seed)
+    movie_ids = [f'tt{9000000 + i:07d}' for i in range(max(1, count // 8))]
+    opened = set()
+    records = []
+    while len(records) < count:
+        roll = rng.random()
+        if roll < 0.35:
+            records.append({'path': f'/autocomplete/?q={rng.choice(SAMPLE_QUERIES).replace(" ", "+")}'})
+        elif roll < 0.5:
+            records.append({'path': '/'})
+        else:
+            imdb_id = rng.choice(movie_ids)
+            if imdb_id not in opened:
+                opened.add(imdb_id)
+                records.append({'path': f'/open/{imdb_id}/'})
+            records.append({'path': f'/analyze/?imdb_id={imdb_id}'})
+    records = records[:count]
+    for i, record in enumerate(records):
+        record['method'] = 'GET'
+        record['at'] = round(i / rate, 3)
+    return records
+
+
+def endpoint_name(path):
+    try:
+        return resolve(urlparse(path).path).url_name or 'unknown'
+    except Resolver404:
+        return 'unknown'
+
+
+def percentile(ordered, pct):
+    """Sıralı listede nearest-rank yüzdelik."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def rows(self, elapsed):
+        rows = []
+        for endpoint in sorted(self.latencies):
+            ordered = sorted(self.latencies[endpoint])
+            rows.append({
+                'endpoint': endpoint,
+                'count': len(ordered),
+                'errors': self.errors[endpoint],
+                'p50_ms': percentile(ordered, 50) * 1000,
+                'p95_ms': percentile(ordered, 95) * 1000,
+                'p99_ms': percentile(ordered, 99) * 1000,
+                'rps': len(ordered) / elapsed if elapsed else 0.0,
+            })
+        return rows
+
+
+class Replayer:
+    """
+    mode='wsgi': sync view'lar `concurrency` thread'de (django.test.Client).
+    mode='asgi': async view'lar tek event loop'ta (django.test.AsyncClient, core.asgi_urls).
+    workers > 0 ise kuyruktaki analiz işleri arka plan thread'lerinde çalıştırılır.
+    """
+
+    def __init__(self, entries, mode='wsgi', concurrency=8, speed=0.0, workers=2,
+                 follow_jobs=True, job_timeout=120.0):
+        self.entries = entries
+        self.mode = mode
+        self.concurrency = max(1, concurrency)
+        self.speed = speed
+        self.workers = workers
+        self.follow_jobs = follow_jobs and workers > 0
+        self.job_timeout = job_timeout
+        self.stats = Stats()
+
+    def run(self):
+        """Oynatır; (satırlar, toplam süre) döner."""
+        stop = threading.Event()
+        workers = [threading.Thread(target=self._work, args=(stop,), daemon=True) for _ in range(self.workers)]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        try:
+            if self.mode == 'asgi':
+                asyncio.run(self._run_asgi())
+            else:
+                self._run_wsgi()
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        elapsed = time.perf_counter() - started
+        return self.stats.rows(elapsed), elapsed
+
+    @staticmethod
+    def _work(stop):
+        try:
+            while not stop.is_set():
+                job_id = claim_next_job()
+                if job_id is None:
+                    stop.wait(0.05)
+                    continue
+                execute_job(job_id)
+        finally:
+            close_old_connections()
+
+    def _delay(self, entry, started):
+        if self.speed and entry.at is not None:
+            return started + entry.at / self.speed - time.perf_counter()
+        return 0
+
+    def _record(self, entry, response, seconds):
+        endpoint = endpoint_name(entry.path)
+        self.stats.record(endpoint, seconds, response.status_code < 400)
+
+    # --- WSGI ---
+
+    def _run_wsgi(self):
+        local = threading.local()
+        started = time.perf_counter()
+
+        def send(entry):
+            delay = self._delay(entry, started)
+            if delay > 0:
+                time.sleep(delay)
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            t0 = time.perf_counter()
+            response = local.client.generic(entry.method, entry.path)
+            self._record(entry, response, time.perf_counter() - t0)
+            if self.follow_jobs and response.status_code == 202:
+                self._follow_wsgi(local.client, response.json()['job_id'], t0)
+            close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='replay') as pool:
+            list(pool.map(send, self.entries))
+
+    def _follow_wsgi(self, client, job_id, t0):
+        deadline = time.perf_counter() + self.job_timeout
+        while time.perf_counter() < deadline:
+            time.sleep(JOB_POLL_INTERVAL)
+            poll_started = time.perf_counter()
+            response = client.get(f'/analyze/status/{job_id}/')
+            self.stats.record('analysis_status', time.perf_counter() - poll_started, response.status_code < 400)
+            status = response.json().get('status')
+            if status in ('done', 'failed'):
+                self.stats.record(ANALYZE_DONE, time.perf_counter() - t0, status == 'done')
+                return
+        self.stats.record(ANALYZE_DONE, time.perf_counter() - t0, False)
+
+    # --- ASGI ---
+
+    async def _run_asgi(self):
+        from .http_sessions import aclose_async_clients
+
+        gate = asyncio.Semaphore(self.concurrency)
+        client = AsyncClient()
+        started = time.perf_counter()
+
+        async def send(entry):
+            delay = self._delay(entry, started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with gate:
+                t0 = time.perf_counter()
+                response = await client.generic(entry.method, entry.path)
+                self._record(entry, response, time.perf_counter() - t0)
+            if self.follow_jobs and response.status_code == 202:
+                await self._follow_asgi(client, response.json()['job_id'], t0)
+
+        with override_settings(ROOT_URLCONF='core.asgi_urls'):
+            await asyncio.gather(*(send(entry) for entry in self.entries))
+        await aclose_async_clients()
+
+    async def _follow_asgi(self, client, job_id, t0):
+        deadline = time.perf_counter() + self.job_timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            poll_started = time.perf_counter()
+            response = await client.get(f'/analyze/status/{job_id}/')
+            self.stats.record('analysis_status', time.perf_counter() - poll_started, response.status_code < 400)
+            status = response.json().get('status')
+            if status in ('done', 'failed'):
+                self.stats.record(ANALYZE_DONE, time.perf_counter() - t0, status == 'done')
+                return
+        self.stats.record(ANALYZE_DONE, time.perf_counter() - t0, False)
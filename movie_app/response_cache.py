@@ -0,0 +1,101 @@
+import hashlib
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from . import metrics
+
+# Render edilmiş yanıtlar (gövde + ETag) önbellekte tutulur. Last-Modified gönderilmez:
+# doldurma anı verinin değiştiği an değildir (önbellek düşüp yeniden dolunca ilerler) ve
+# Movie'de güncellenme zamanı yok. Koşullu GET içerikten üretilen ETag ile yapılır.
+# Önbellekten dönen istek ORM'e ve şablon motoruna hiç dokunmaz;
+# Movie kaydedildiğinde ilgili girişler signals.py'de silinir. Önbellek process'ler arası
+# paylaşıldığı için (settings.CACHES) run_worker'ın kaydettiği analiz de web'deki girişi düşürür.
+RESPONSE_TTL = 24 * 60 * 60
+# Ana sayfa rastgele kart gösterdiği için kısa tutulur
+INDEX_TTL = 60
+INDEX_KEY = 'response:index'
+
+
+def detail_key(slug):
+    return f'response:detail:{slug}'
+
+
+def analyze_key(imdb_id):
+    return f'response:analyze:{imdb_id}'
+
+
+def invalidate_movie(movie):
+    """Filmin detay sayfasını, analiz yanıtını ve ana sayfayı önbellekten düşürür."""
+    keys = [INDEX_KEY, analyze_key(movie.imdb_id)]
+    # Slug değiştiyse eski adresin sayfası da düşsün
+    for slug in {movie.slug, getattr(movie, '_loaded_slug', None)}:
+        if slug:
+            keys.append(detail_key(slug))
+    cache.delete_many(keys)
+
+
+def _entry_from(response):
+    content = response.content
+    return {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'etag': '"%s"' % hashlib.md5(content).hexdigest(),
+    }
+
+
+def _respond(request, entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    # Tarayıcı her seferinde doğrulasın; içerik değişmediyse 304 alır
+    patch_cache_control(response, no_cache=True)
+    return get_conditional_response(request, etag=entry['etag'], response=response)
+
+
+def cached_response(key_func, ttl=RESPONSE_TTL):
+    """
+    View dekoratörü. `key_func(request, *args, **kwargs)` önbellek anahtarını döner
+    (None ise önbellek atlanır). Sadece GET/HEAD ve 200 yanıtları saklanır;
+    202 (kuyrukta), 404 ve hata yanıtları her seferinde view'dan geçer. Async view'ları da sarar.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                key = key_func(request, *args, **kwargs)
+                if key is None:
+                    return await view(request, *args, **kwargs)
+
+                entry = await cache.aget(key)
+                metrics.cache_result('response', entry is not None)
+                if entry is None:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != 200 or response.streaming:
+                        return response
+                    entry = _entry_from(response)
+                    await cache.aset(key, entry, ttl)
+                return _respond(request, entry)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = key_func(request, *args, **kwargs)
+            if key is None:
+                return view(request, *args, **kwargs)
+
+            entry = cache.get(key)
+            metrics.cache_result('response', entry is not None)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                entry = _entry_from(response)
+                cache.set(key, entry, ttl)
+            return _respond(request, entry)
+        return wrapper
+    return decorator
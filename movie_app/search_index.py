@@ -0,0 +1,212 @@
+import heapq
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from . import metrics
+from .cache import normalize_query
+from .models import Movie
+from .singleflight import SingleFlight
+
+# Canlı arama önce veritabanındaki filmlerde yapılır; OMDb sadece yerel sonuç azsa çağrılır.
+# İndeks process içinde tutulur: kelime sözlüğü sıralı bir listede, ön ek araması bisect ile.
+MIN_LOCAL_HITS = 3
+RESULT_LIMIT = 5
+# Başka process'lerin eklediği filmler en geç bu sürede görünür (arka planda yeniden kurulur)
+REBUILD_INTERVAL = 10 * 60
+# Toplu değişiklik (import_catalog) paylaşılan önbellekteki nesil anahtarını değiştirir; her
+# process en geç GENERATION_CHECK_INTERVAL saniyede bir bakar ve indeksini arka planda yeniler
+GENERATION_KEY = 'search:local:generation'
+GENERATION_CHECK_INTERVAL = 5
+
+
+def _tokens(text):
+    return normalize_query(text).replace('-', ' ').replace(':', ' ').split()
+
+
+class SearchIndex:
+    """
+    Film başlıkları (ve movie_info['aka_titles']) üzerinde aksansız ön ek indeksi.
+    Sorgudaki her kelime, filmin kelimelerinden birinin ön eki olmalı:
+    'yuzuk kard' -> 'Yüzüklerin Efendisi: Yüzük Kardeşliği'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}        # imdb_id -> (sonuç dict'i, normalize başlık, kelimeler)
+        self._postings = {}    # kelime -> {imdb_id, ...}
+        self._vocab = []       # sıralı kelime listesi
+        self.built_at = None
+        self._rebuilding = False
+        # İndeksin kurulduğu andaki GENERATION_KEY değeri ve son kontrol zamanı
+        self._generation = None
+        self._checked_at = 0.0
+        # İlk kurulum (100k filmde ~1.8 s) istek yolunda: eşzamanlı istekler tek kurulumu bekler
+        self._first_build = SingleFlight()
+
+    def clear(self):
+        """İndeksi boşaltır; bir sonraki aramada yeniden kurulur."""
+        with self._lock:
+            self._docs, self._postings, self._vocab = {}, {}, []
+            self.built_at = None
+
+    def invalidate(self):
+        """Tüm process'lerin indeksini eskimiş sayar (bu process'inkini hemen boşaltır)."""
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+        self.clear()
+
+    def build(self):
+        # Okumadan önce alınır: kurulum sırasında gelen bir invalidate() kaçırılmasın
+        generation = cache.get(GENERATION_KEY)
+        rows = (Movie.objects.exclude(title__isnull=True).exclude(title='')
+                .values_list('imdb_id', 'title', 'year', 'poster_url', 'movie_info__aka_titles'))
+        docs, postings = {}, {}
+        for imdb_id, title, year, poster, akas in rows.iterator(chunk_size=2000):
+            self._index_into(docs, postings, imdb_id, title, year, poster, akas)
+        with self._lock:
+            self._docs, self._postings = docs, postings
+            self._vocab = sorted(postings)
+            self.built_at = self._checked_at = time.monotonic()
+            self._generation = generation
+
+    @staticmethod
+    def _index_into(docs, postings, imdb_id, title, year, poster, akas):
+        result = {'Title': title, 'Year': year or '', 'imdbID': imdb_id, 'Type': 'movie', 'Poster': poster or 'N/A'}
+        names = [title] + [a for a in (akas or []) if isinstance(a, str)]
+        tokens = {token for name in names for token in _tokens(name)}
+        docs[imdb_id] = (result, normalize_query(title), tokens)
+        for token in tokens:
+            postings.setdefault(token, set()).add(imdb_id)
+
+    def update_movie(self, movie):
+        """Kaydedilen filmi indekste günceller (indeks henüz kurulmadıysa bir şey yapmaz)."""
+        if self.built_at is None:
+            return
+        if 'movie_info' in movie.__dict__:
+            akas = (movie.movie_info or {}).get('aka_titles')
+        else:
+            # movie_info ertelenmiş (.only()/update_fields): alternatif adlar kaybolmasın
+            akas = (Movie.objects.filter(pk=movie.pk).values_list('movie_info__aka_titles', flat=True).first()
+                    if movie.title else None)
+        with self._lock:
+            self._remove(movie.imdb_id)
+            if movie.title:
+                self._index_into(self._docs, self._postings, movie.imdb_id,
+                                 movie.title, movie.year, movie.poster_url, akas)
+                # Yeni kelimeleri sıralı listeye yerleştir; silinenler listede kalabilir (boş posting)
+                for token in self._docs[movie.imdb_id][2]:
+                    i = bisect_left(self._vocab, token)
+                    if i == len(self._vocab) or self._vocab[i] != token:
+                        self._vocab.insert(i, token)
+
+    def remove_movie(self, imdb_id):
+        if self.built_at is None:
+            return
+        with self._lock:
+            self._remove(imdb_id)
+
+    def _remove(self, imdb_id):
+        doc = self._docs.pop(imdb_id, None)
+        if doc is None:
+            return
+        for token in doc[2]:
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(imdb_id)
+                if not ids:
+                    del self._postings[token]
+
+    def _ensure_fresh(self):
+        if self.built_at is None:
+            self._first_build.do('build', self._build_if_missing)
+        elif (time.monotonic() - self.built_at > REBUILD_INTERVAL or self._outdated()) and not self._rebuilding:
+            # Eski indeksle cevap vermeye devam et, yenisini arka planda kur
+            self._rebuilding = True
+            threading.Thread(target=self._background_build, daemon=True).start()
+
+    def _outdated(self):
+        now = time.monotonic()
+        if now - self._checked_at < GENERATION_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        return cache.get(GENERATION_KEY) != self._generation
+
+    def _build_if_missing(self):
+        # Bekleyen istek liderin kurduğu indeksi kullanır, tekrar kurmaz
+        if self.built_at is None:
+            self.build()
+
+    def _background_build(self):
+        from django.db import close_old_connections
+        try:
+            self.build()
+        except Exception as e:
+            print(f"Arama indeksi yenilenemedi: {e}")
+        finally:
+            self._rebuilding = False
+            close_old_connections()
+
+    def _prefix_matches(self, prefix):
+        ids = set()
+        i = bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            ids |= self._postings.get(self._vocab[i], set())
+            i += 1
+        return ids
+
+    def search(self, query, limit=RESULT_LIMIT):
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        self._ensure_fresh()
+        key = normalize_query(query)
+        with self._lock:
+            # En seçici (en uzun) kelimeden başla
+            matches = None
+            for token in sorted(tokens, key=len, reverse=True):
+                ids = self._prefix_matches(token)
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+            hits = [self._docs[i] for i in matches if i in self._docs]
+
+        # Tam eşleşme > başlık sorguyla başlıyor > kısa başlık; çok eşleşmede tümünü sıralamaz
+        top = heapq.nsmallest(limit, hits, key=lambda doc: (doc[1] != key, not doc[1].startswith(key), len(doc[1]), doc[1]))
+        return [dict(doc[0]) for doc in top]
+
+
+local_index = SearchIndex()
+
+
+def autocomplete(query, info_service):
+    """
+    `search_candidates` ile aynı biçimde sonuç döner. Yerel sonuç MIN_LOCAL_HITS'ten azsa
+    OMDb sonuçları (yerelde olmayanlar) arkasına eklenir.
+    """
+    results = local_index.search(query, RESULT_LIMIT)
+    metrics.cache_result('local_index', len(results) >= MIN_LOCAL_HITS)
+    if len(results) >= MIN_LOCAL_HITS:
+        return results
+    return _merge(results, info_service.search_candidates(query))
+
+
+async def aautocomplete(query, info_service):
+    """autocomplete'in async karşılığı. İlk aramada indeks DB'den kurulduğu için sync_to_async."""
+    results = await sync_to_async(local_index.search)(query, RESULT_LIMIT)
+    metrics.cache_result('local_index', len(results) >= MIN_LOCAL_HITS)
+    if len(results) >= MIN_LOCAL_HITS:
+        return results
+    return _merge(results, await info_service.asearch_candidates(query))
+
+
+def _merge(results, remote_results):
+    seen = {r['imdbID'] for r in results}
+    for remote in remote_results:
+        if len(results) >= RESULT_LIMIT:
+            break
+        if remote.get('imdbID') not in seen:
+            seen.add(remote.get('imdbID'))
+            results.append(remote)
+    return results
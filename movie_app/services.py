@@ -1,45 +1,268 @@
 import os
-import re
 import json
-import requests
-import io
-import traceback
-import subliminal
-from babelfish import Language
-from google import genai
+import hashlib
+import inspect
+import time
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from django.core.cache import cache
+from .subtitles import parse_subtitle, split_prompt_windows, format_ms
+from .splitters import EpisodeSplitter, ERROR_TITLE_PREFIX, InvalidEpisodes, subtitle_end_ms, validate_episodes
+from .http_sessions import arequest, get_async_client, get_session
+from . import metrics, ratelimit, registry, steps
+from .cache import TTLCache, normalize_query
+from .jsonstream import JSONArrayStream
+from .steps import Step
 
 load_dotenv()
 
-class AIService:
+# Uzun altyazılar için parçalı (map-reduce) analiz ayarları
+CHUNK_WINDOW_MINUTES = 12
+CHUNK_CONCURRENCY = 4
+# mode='auto' iken bu uzunluğun üzerindeki metinler parçalı analiz edilir
+AUTO_CHUNK_CHARS = 80000
+
+# Prompt'lar ya da doğrulama kuralları değişince artırılır; eski önbellek kayıtları kullanılmaz
+PROMPT_VERSION = 2
+# Doğrulanmış sonuçlar (altyazı hash'i, prompt sürümü, model) anahtarıyla saklanır
+LLM_CACHE_TTL = 30 * 24 * 3600
+# Başarısız analiz kısa süre hatırlanır: her istekte Gemini'ye yüklenilmez, süre dolunca tekrar denenir
+LLM_NEGATIVE_TTL = 5 * 60
+# Geçersiz/başarısız cevapta son çağrının toplam deneme sayısı
+LLM_ATTEMPTS = 2
+
+# Gemini'den yapılandırılmış çıktı: cevap doğrudan bu şemaya uyan JSON dizisi olur
+EPISODE_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'episode': {'type': 'INTEGER'},
+            'start': {'type': 'STRING', 'description': 'HH:MM:SS'},
+            'end': {'type': 'STRING', 'description': 'HH:MM:SS'},
+            'title': {'type': 'STRING'},
+        },
+        'required': ['episode', 'start', 'end', 'title'],
+        'property_ordering': ['episode', 'start', 'end', 'title'],
+    },
+}
+
+# Ağır SDK'lar modül seviyesinde import edilmez; ilk kullanımda registry üzerinden yüklenir
+
+@registry.provider('genai')
+def _genai_client(api_key, base_url):
+    """Paylaşılan Gemini istemcisi (kurulumu ~75 ms; eskiden her analizde yeniden kuruluyordu)."""
+    from google import genai
+    http_options = {'api_version': 'v1alpha'}
+    if base_url:
+        # Yerel stub/proxy üzerinden çalıştırmak için (bkz. stubs.py)
+        http_options['base_url'] = base_url
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+@registry.provider('subliminal')
+def _subliminal():
+    """subliminal ve babelfish sadece alternatif kaynak araması yapılınca yüklenir."""
+    import subliminal
+    from babelfish import Language
+    return subliminal, frozenset({Language('eng'), Language('tur')})
+
+
+class _StreamProgress:
+    """
+    Streaming cevabın metnini biriktirir. Dizinin yeni bir elemanı tamamlandığında o ana kadarki
+    bölümleri (ardışıklık kuralıyla doğrulanmış olarak) döner; ilk bölüme kadar geçen süre ölçülür.
+    """
+
     def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        self.client = genai.Client(
-            api_key=api_key,
-            http_options={'api_version': 'v1alpha'} 
-        )
+        self.parser = JSONArrayStream()
+        self.parts = []
+        self.started = time.perf_counter()
+        self.published = 0
+
+    def feed(self, text):
+        if not text:
+            return None
+        self.parts.append(text)
+        if not self.parser.feed(text):
+            return None
+        try:
+            episodes = validate_episodes(self.parser.items)
+        except InvalidEpisodes:
+            # Kuralı bozan cevap sonunda reddedilecek; sayfaya gönderme
+            return None
+        if not self.published:
+            metrics.observe('gemini_first_episode', time.perf_counter() - self.started)
+        self.published = len(episodes)
+        return episodes
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+
+def _publish(on_episode, episodes):
+    """
+    Ara bölümleri on_episode'a verir. Yayın hatası (ör. işe yazılamaması) loglanıp geçilir:
+    Gemini hatası sayılsaydı geçerli cevap yeniden denenir ya da negatif önbelleğe yazılırdı.
+    """
+    try:
+        on_episode(episodes)
+    except Exception as e:
+        print(f"Stream Publish Error: {e}")
+        metrics.inc('stream_publish_errors_total')
+
+
+async def _apublish(on_episode, episodes):
+    """_publish'in async karşılığı; on_episode coroutine dönerse beklenir."""
+    try:
+        published = on_episode(episodes)
+        if inspect.isawaitable(published):
+            await published
+    except Exception as e:
+        print(f"Stream Publish Error: {e}")
+        metrics.inc('stream_publish_errors_total')
+
+
+class AIService(EpisodeSplitter):
+    name = 'gemini'
+
+    def __init__(self):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        self.base_url = os.getenv("GEMINI_BASE_URL")
+        # Testler kendi istemcisini atayabilir; yoksa paylaşılan istemci kullanılır
+        self._client = None
         self.model_id = "models/gemini-2.5-flash"
+        # Bu servis nesnesiyle yapılan Gemini çağrılarının toplam token kullanımı
+        self.usage = {'calls': 0, 'prompt_tokens': 0, 'output_tokens': 0}
+        self._usage_lock = threading.Lock()
 
+    @property
+    def client(self):
+        """Process genelinde paylaşılan genai.Client (thread-safe, ilk kullanımda kurulur)."""
+        if self._client is not None:
+            return self._client
+        return registry.get('genai', self.api_key, self.base_url)
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    @property
+    def aio(self):
+        """Async çağrılar için istemci; httpx bağlantıları event loop'a bağlı olduğundan loop başına bir tane."""
+        if self._client is not None:
+            return self._client.aio
+        return registry.get_for_loop('genai', self.api_key, self.base_url).aio
+
+    @metrics.timed('clean_subtitle')
     def clean_subtitle(self, raw_text):
-        """Altyazıdaki zaman kodlarını ve teknik verileri temizler."""
+        """
+        Altyazıyı satır satır ayrıştırıp zaman damgalı kompakt metne çevirir.
+        Modelin bölüm sınırlarını belirleyebilmesi için her repliğin başlangıç zamanı korunur.
+        """
         if not raw_text: 
             return ""
-        
-        # 1. Zaman kodlarını ve satır numaralarını temizle (00:00:00,000 --> ...)
-        clean_text = re.sub(r'\d+\n\d{2}:\d{2}:\d{2},\d{3} --> \d{2}:\d{2}:\d{2},\d{3}', '', raw_text)
-        
-        # 2. HTML etiketlerini temizle (<i>, <b> vb.)
-        clean_text = re.sub(r'<[^>]*>', '', clean_text)
-        
-        # 3. Reklam içerikli satırları temizle (Örn: OpenSubtitles, Translated by)
-        clean_text = re.sub(r'(?i)(opensubtitles|subtitles|translated|encoded|advertisement).*', '', clean_text)
-        
-        # 4. Gereksiz boşlukları ve yeni satırları temizle
-        return " ".join(clean_text.split())
-
-    def split_movie_into_episodes(self, subtitle_text):
-        """Filmi bölümlere ayırmak için AI kullanır. Bu fonksiyon AIService içindedir."""
-        prompt = f"""
+
+        cues = parse_subtitle(raw_text)
+        if not cues:
+            # Zaman kodu olmayan düz metin: sadece boşlukları sadeleştir
+            return " ".join(raw_text.split())
+        return cues.to_prompt_text()
+
+    @staticmethod
+    def _config(schema):
+        if schema is None:
+            return None
+        from google.genai import types
+        return types.GenerateContentConfig(response_mime_type='application/json', response_schema=schema)
+
+    @metrics.timed('gemini')
+    def _generate(self, prompt, schema=None):
+        """Gemini'ye tek çağrı yapar ve token kullanımını kaydeder. schema verilirse cevap JSON olur."""
+        ratelimit.acquire('gemini')
+        response = self.client.models.generate_content(
+            model=self.model_id,
+            contents=prompt,
+            config=self._config(schema)
+        )
+        self._record_usage(response)
+        return response.text
+
+    @metrics.timed('gemini')
+    async def _agenerate(self, prompt, schema=None):
+        """_generate'in async karşılığı (genai SDK'nın aio istemcisi)."""
+        async with ratelimit.limit('gemini'):
+            response = await self.aio.models.generate_content(
+                model=self.model_id,
+                contents=prompt,
+                config=self._config(schema)
+            )
+        self._record_usage(response)
+        return response.text
+
+    @metrics.timed('gemini')
+    def _generate_stream(self, prompt, schema, on_episode):
+        """
+        _generate'in streaming hali: dizinin her elemanı tamamlandıkça on_episode(o ana kadarki
+        bölümler) çağrılır. Tam metni döner; nihai doğrulama split_movie_into_episodes'ta yapılır.
+        """
+        ratelimit.acquire('gemini')
+        progress = _StreamProgress()
+        last = None
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model_id,
+            contents=prompt,
+            config=self._config(schema)
+        ):
+            episodes = progress.feed(chunk.text)
+            if episodes:
+                _publish(on_episode, episodes)
+            last = chunk
+        self._record_usage(last)
+        return progress.text
+
+    @metrics.timed('gemini')
+    async def _agenerate_stream(self, prompt, schema, on_episode):
+        """_generate_stream'in async karşılığı (bkz. _apublish)."""
+        progress = _StreamProgress()
+        last = None
+        async with ratelimit.limit('gemini'):
+            async for chunk in await self.aio.models.generate_content_stream(
+                model=self.model_id,
+                contents=prompt,
+                config=self._config(schema)
+            ):
+                episodes = progress.feed(chunk.text)
+                if episodes:
+                    await _apublish(on_episode, episodes)
+                last = chunk
+        self._record_usage(last)
+        return progress.text
+
+    def _record_usage(self, response):
+        meta = getattr(response, 'usage_metadata', None)
+        with self._usage_lock:
+            self.usage['calls'] += 1
+            if meta:
+                self.usage['prompt_tokens'] += meta.prompt_token_count or 0
+                self.usage['output_tokens'] += meta.candidates_token_count or 0
+        metrics.inc('gemini_calls_total')
+        if meta:
+            metrics.inc('gemini_tokens_total', meta.prompt_token_count or 0, kind='prompt')
+            metrics.inc('gemini_tokens_total', meta.candidates_token_count or 0, kind='output')
+
+    @staticmethod
+    def _parse_json(text_response):
+        # Şema ile istenince gerekmez; yine de markdown bloklarını temizle
+        clean_json = (text_response or '').replace('```json', '').replace('```', '').strip()
+        return json.loads(clean_json)
+
+    def _episode_prompt(self, subtitle_text):
+        return f"""
         You are a senior film producer. I am giving you the COMPLETE script (subtitles) of a movie. 
         Your task is to deconstruct this movie into a detailed 4 to 8 episode mini-series.
 
@@ -60,103 +283,366 @@ class AIService:
         Subtitles to process:
         {subtitle_text} 
         """
-        
+
+    def _window_prompt(self, window):
+        """Map adımı: tek bir zaman penceresinin olay özetini isteyen prompt."""
+        start_ms, end_ms, text = window
+        return f"""
+        You are a senior film producer. Below is the part of a movie's subtitles from {format_ms(start_ms)} to {format_ms(end_ms)}.
+        Summarize what happens in 5 to 8 short bullet points. Start every bullet with the [HH:MM:SS] timestamp where it happens.
+        Mark scene changes, character introductions, cliffhangers and climaxes explicitly. Plain text only.
+
+        Subtitles:
+        {text}
+        """
+
+    @staticmethod
+    def _prompt_windows(subtitle_text, mode):
+        """'chunked' modda map adımının zaman pencereleri; tek pencere ya da 'single' için None."""
+        if mode != 'chunked':
+            return None
+        windows = split_prompt_windows(subtitle_text, CHUNK_WINDOW_MINUTES * 60 * 1000)
+        return windows if len(windows) >= 2 else None
+
+    def _final_prompt(self, subtitle_text, mode):
+        """
+        Bölüm listesini isteyen son prompt. 'chunked' modda önce map adımı çalışır:
+        pencereler paralel özetlenir, reduce prompt'u özetlerden kurulur.
+        """
+        windows = self._prompt_windows(subtitle_text, mode)
+        if not windows:
+            return self._episode_prompt(subtitle_text)
+        with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY, thread_name_prefix='gemini') as pool:
+            # Çağıranın önceliği (ratelimit.bulk) havuz thread'lerine de geçsin
+            futures = [pool.submit(contextvars.copy_context().run, self._generate, self._window_prompt(window))
+                       for window in windows]
+            summaries = [future.result() for future in futures]
+        return self._reduce_prompt(windows, summaries)
+
+    async def _afinal_prompt(self, subtitle_text, mode):
+        windows = self._prompt_windows(subtitle_text, mode)
+        if not windows:
+            return self._episode_prompt(subtitle_text)
+        # Eşzamanlılık ratelimit.limit('gemini') ile sınırlı
+        summaries = await asyncio.gather(*(self._agenerate(self._window_prompt(window)) for window in windows))
+        return self._reduce_prompt(windows, summaries)
+
+    def _reduce_prompt(self, windows, summaries):
+        timeline = "\n\n".join(
+            f"### {format_ms(start_ms)} - {format_ms(end_ms)}\n{summary.strip()}"
+            for (start_ms, end_ms, _), summary in zip(windows, summaries)
+        )
+        return f"""
+        You are a senior film producer. Below is a timestamped, segment-by-segment summary of a COMPLETE movie.
+        Your task is to deconstruct this movie into a detailed 4 to 8 episode mini-series.
+
+        STRICT REQUIREMENTS:
+        1. **Episode Length**: Each episode MUST be between 20 and 40 minutes of movie time.
+        2. **Total Coverage**: Episodes must be contiguous and the last episode MUST end exactly at {format_ms(windows[-1][1])}.
+        3. **Boundaries**: Cut at the scene changes, cliffhangers and climaxes marked in the summary.
+        4. **Titles**: Give each episode a title that captures its core dramatic question.
+
+        RETURN ONLY A RAW JSON ARRAY. No conversational filler.
+        Format:
+        [
+            {{"episode": 1, "start": "00:00:00", "end": "00:32:15", "title": "The Silent Arrival"}},
+            ...
+        ]
+
+        Movie summary:
+        {timeline}
+        """
+
+    @staticmethod
+    def _resolve_mode(subtitle_text, mode):
+        if mode == 'auto':
+            return 'chunked' if len(subtitle_text) > AUTO_CHUNK_CHARS else 'single'
+        return mode
+
+    def cache_key(self, subtitle_text, mode):
+        """Sonuç önbelleği anahtarı: altyazı hash'i, prompt sürümü (ve modu), model."""
+        digest = hashlib.sha256(subtitle_text.encode('utf-8')).hexdigest()
+        return f"llm:{digest}:v{PROMPT_VERSION}-{mode}:{self.model_id}"
+
+    def _from_cache(self, entry):
+        metrics.cache_result('llm', entry is not None)
+        if entry is None:
+            return None
+        if 'error' in entry:
+            return self._error_result(entry['error'])
+        return entry['episodes']
+
+    def _validated(self, text_response, subtitle_text):
+        return validate_episodes(self._parse_json(text_response), subtitle_end_ms(subtitle_text))
+
+    def _split_flow(self, subtitle_text, mode, on_episode):
+        """split_movie_into_episodes ve async karşılığının ortak akışı (bkz. steps.py)."""
+        mode = self._resolve_mode(subtitle_text, mode)
+        key = self.cache_key(subtitle_text, mode)
+        cached = self._from_cache((yield Step(cache.get, key, afunc=cache.aget)))
+        if cached is not None:
+            return cached
+
         try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt
-            )
-            text_response = response.text
-            # Markdown bloklarını temizle
-            clean_json = text_response.replace('```json', '').replace('```', '').strip()
-            return json.loads(clean_json)
+            prompt = yield Step(self._final_prompt, subtitle_text, mode, afunc=self._afinal_prompt)
         except Exception as e:
             print(f"AI Error: {e}")
-            return [{"episode": 1, "title": f"Analiz Hatası: {str(e)}", "start": "00:00:00", "end": "???"}]
+            error = e
+        else:
+            for attempt in range(1, LLM_ATTEMPTS + 1):
+                try:
+                    if on_episode:
+                        text = yield Step(self._generate_stream, prompt, EPISODE_SCHEMA, on_episode,
+                                          afunc=self._agenerate_stream)
+                    else:
+                        text = yield Step(self._generate, prompt, EPISODE_SCHEMA, afunc=self._agenerate)
+                    episodes = self._validated(text, subtitle_text)
+                except ratelimit.RateLimited as e:
+                    # Kota ya da sıra dolu: hemen tekrar denemek aynı sonucu verir
+                    print(f"AI Error: {e}")
+                    error = e
+                    break
+                except Exception as e:
+                    print(f"AI Error (deneme {attempt}/{LLM_ATTEMPTS}): {e}")
+                    error = e
+                    continue
+                yield Step(cache.set, key, {'episodes': episodes}, LLM_CACHE_TTL, afunc=cache.aset)
+                return episodes
+
+        if not isinstance(error, ratelimit.RateLimited):
+            yield Step(cache.set, key, {'error': str(error)}, LLM_NEGATIVE_TTL, afunc=cache.aset)
+        return self._error_result(error)
+
+    def split_movie_into_episodes(self, subtitle_text, mode='auto', on_episode=None):
+        """
+        Filmi bölümlere ayırmak için AI kullanır.
+        mode: 'single' tüm metni tek çağrıda gönderir, 'chunked' pencereleri paralel özetleyip
+        son bir küçük çağrıyla sınırları seçer, 'auto' metin uzunluğuna göre karar verir.
+        Cevap validate_episodes ile doğrulanır; geçersizse son çağrı tekrarlanır. Geçerli sonuç
+        uzun süre, hata LLM_NEGATIVE_TTL boyunca önbellekte tutulur (hata sonucu DB'ye yazılmaz;
+        upstream sınırı/kotası doluysa önbelleğe de yazılmaz, sıra açılınca tekrar denenir).
+        on_episode verilirse son çağrı streaming yapılır ve bölüm tamamlandıkça o ana kadarki
+        liste ile çağrılır (yeni denemede liste baştan başlar).
+        """
+        return steps.run(self._split_flow(subtitle_text, mode, on_episode))
+
+    async def asplit_movie_into_episodes(self, subtitle_text, mode='auto', on_episode=None):
+        """split_movie_into_episodes'un async karşılığı; çağrılar event loop'u bloklamaz."""
+        return await steps.arun(self._split_flow(subtitle_text, mode, on_episode))
+
+    @staticmethod
+    def _error_result(error):
+        return [{"episode": 1, "title": f"{ERROR_TITLE_PREFIX}: {str(error)}", "start": "00:00:00", "end": "???"}]
+
+# Otomatik tamamlama önbelleği (process başına)
+SEARCH_LIMIT = 5
+SEARCH_TTL = 6 * 3600
+SEARCH_NEGATIVE_TTL = 10 * 60
+_search_cache = TTLCache(maxsize=2048, ttl=SEARCH_TTL)
 
 class MovieInfoService:
     def __init__(self):
         self.api_key = os.getenv("OMDB_API_KEY")
-        self.base_url = "http://www.omdbapi.com/"
+        self.base_url = os.getenv("OMDB_BASE_URL", "http://www.omdbapi.com/")
+        self.session = get_session('omdb', timeout=(3.05, 10))
 
-    def search_candidates(self, query):
+    def _search_flow(self, query):
         if not self.api_key: return []
-        try:
-            params = {'apikey': self.api_key, 's': query, 'type': 'movie'}
-            response = requests.get(self.base_url, params=params)
-            data = response.json()
-            if data.get('Response') == 'True' and data.get('Search'):
-                return data['Search'][:5]
-            return []
-        except Exception:
-            return []
+        key = normalize_query(query)
 
-    def get_movie_details(self, imdb_id):
-        if not self.api_key: return None
+        entry = _search_cache.get(key, None) or self._from_cached_prefix(key)
+        metrics.cache_result('omdb_search', entry is not None)
+        if entry is None:
+            with metrics.stage('omdb'):
+                entry = yield from self._fetch_flow({'apikey': self.api_key, 's': query, 'type': 'movie'},
+                                                    self._search_entry)
+            if entry is None:
+                # Ağ/API hatası: önbelleğe yazma, bir sonraki istekte tekrar dene
+                return []
+            self._remember(key, entry)
+        return list(entry[0])
+
+    def search_candidates(self, query):
+        """
+        Canlı arama önerileri. Sonuçlar normalize edilmiş sorguya göre önbelleğe alınır;
+        boş sonuçlar da (daha kısa süreyle) saklanır.
+        """
+        return steps.run(self._search_flow(query))
+
+    async def asearch_candidates(self, query):
+        """search_candidates'in async karşılığı; aynı önbelleği kullanır."""
+        return await steps.arun(self._search_flow(query))
+
+    @staticmethod
+    def _remember(key, entry):
+        _search_cache.set(key, entry, ttl=SEARCH_TTL if entry[0] else SEARCH_NEGATIVE_TTL)
+
+    def _from_cached_prefix(self, key):
+        """
+        'matrix relo' için önbellekte 'matrix' gibi bir ön ek varsa ve o sonuç listesi
+        eksiksizse (OMDb toplamı limitin altında) onu filtreleyerek cevap verir.
+        OMDb kelime bazlı eşleştirdiği için boş ön ek sonuçları kullanılmaz.
+        """
+        for end in range(len(key) - 1, 2, -1):
+            entry = _search_cache.get(key[:end], None)
+            if entry is None:
+                continue
+            results, complete = entry
+            if not (complete and results):
+                return None
+            filtered = [r for r in results if key in normalize_query(r.get('Title'))]
+            if not filtered:
+                return None
+            entry = (filtered, True)
+            _search_cache.set(key, entry)
+            return entry
+        return None
+
+    @staticmethod
+    def _search_entry(data):
+        if data.get('Response') == 'True' and data.get('Search'):
+            total = int(data.get('totalResults') or 0)
+            return data['Search'][:SEARCH_LIMIT], total <= SEARCH_LIMIT
+        return [], True
+
+    def _request(self, params):
+        ratelimit.acquire('omdb')
+        return self.session.get(self.base_url, params=params)
+
+    async def _arequest(self, params):
+        async with ratelimit.limit('omdb'):
+            return await arequest(get_async_client('omdb', timeout=(3.05, 10)), 'GET', self.base_url,
+                                  upstream='omdb', params=params)
+
+    def _fetch_flow(self, params, parse):
+        """OMDb'ye tek istek; parse(json) sonucunu, ağ/API hatasında None döner."""
         try:
-            params = {'apikey': self.api_key, 'i': imdb_id, 'plot': 'full'}
-            response = requests.get(self.base_url, params=params)
-            data = response.json()
-            if data.get('Response') == 'True':
-                return {
-                    'title': data.get('Title'),
-                    'year': data.get('Year'),
-                    'poster': data.get('Poster'),
-                    'plot': data.get('Plot'),
-                    'imdb_rating': data.get('imdbRating'),
-                    'genre': data.get('Genre'),
-                    'runtime': data.get('Runtime')
-                }
-            return None
+            response = yield Step(self._request, params, afunc=self._arequest)
+            response.raise_for_status()
+            return parse(response.json())
+        except ratelimit.RateLimited:
+            raise
         except Exception:
             return None
 
+    @staticmethod
+    def _details(data):
+        if data.get('Response') == 'True':
+            return {
+                'title': data.get('Title'),
+                'year': data.get('Year'),
+                'poster': data.get('Poster'),
+                'plot': data.get('Plot'),
+                'imdb_rating': data.get('imdbRating'),
+                'genre': data.get('Genre'),
+                'runtime': data.get('Runtime')
+            }
+        return None
+
+    def _details_flow(self, imdb_id):
+        if not self.api_key: return None
+        with metrics.stage('omdb'):
+            return (yield from self._fetch_flow({'apikey': self.api_key, 'i': imdb_id, 'plot': 'full'}, self._details))
+
+    def get_movie_details(self, imdb_id):
+        return steps.run(self._details_flow(imdb_id))
+
+    async def aget_movie_details(self, imdb_id):
+        return await steps.arun(self._details_flow(imdb_id))
+
 class SubtitleService:
     def __init__(self):
         self.api_key = os.getenv("OPENSUBTITLES_API_KEY")
-        self.base_url = "https://api.opensubtitles.com/api/v1"
+        self.base_url = os.getenv("OPENSUBTITLES_BASE_URL", "https://api.opensubtitles.com/api/v1")
         self.headers = {
             'Api-Key': self.api_key,
             'Content-Type': 'application/json',
             'User-Agent': 'Mozilla/5.0'
         }
+        self.session = get_session('opensubtitles', timeout=(3.05, 30))
+        # Son indirilen altyazının dili (arşive kaydederken kullanılır)
+        self.last_language = ''
+        # Yarışı kaybeden sağlayıcıya kota harcayan indirmeyi atlamasını söyler (providers.py)
+        self.cancelled = threading.Event()
 
-    def get_subtitle(self, imdb_id):
-        """OpenSubtitles API üzerinden altyazı indirir."""
+    def _request(self, method, url, upstream='opensubtitles', **kwargs):
+        if upstream:
+            ratelimit.acquire(upstream)
+        return self.session.request(method, url, **kwargs)
+
+    async def _arequest(self, method, url, upstream='opensubtitles', **kwargs):
+        client = get_async_client('opensubtitles', timeout=(3.05, 30))
+        if not upstream:
+            return await arequest(client, method, url, upstream='opensubtitles', **kwargs)
+        async with ratelimit.limit(upstream):
+            return await arequest(client, method, url, upstream='opensubtitles', **kwargs)
+
+    def _subtitle_flow(self, imdb_id):
         try:
             clean_id = int(imdb_id.replace('tt', ''))
             print(f"🌍 OpenSubtitles: {clean_id} aranıyor...")
-            
+
             search_url = f"{self.base_url}/subtitles?imdb_id={clean_id}&languages=tr,en"
-            response = requests.get(search_url, headers=self.headers)
+            response = yield Step(self._request, 'GET', search_url, headers=self.headers, afunc=self._arequest)
             data = response.json()
 
             if not data.get('data'):
                 return None
 
-            file_id = data['data'][0]['attributes']['files'][0]['file_id']
-            dl_response = requests.post(f"{self.base_url}/download", json={"file_id": file_id}, headers=self.headers)
+            attributes = data['data'][0]['attributes']
+            file_id = attributes['files'][0]['file_id']
+            self.last_language = attributes.get('language') or ''
+            if self.cancelled.is_set():
+                return None
+            yield Step(ratelimit.acquire, 'opensubtitles_download', afunc=ratelimit.aacquire)
+            dl_response = yield Step(self._request, 'POST', f"{self.base_url}/download", json={"file_id": file_id},
+                                     headers=self.headers, afunc=self._arequest)
             download_link = dl_response.json().get('link')
 
             if download_link:
-                return requests.get(download_link).text
+                # İndirme bağlantısı API kotasından düşmez
+                return (yield Step(self._request, 'GET', download_link, upstream=None, afunc=self._arequest)).text
             return None
+        except ratelimit.RateLimited:
+            raise
         except Exception as e:
             print(f"OpenSubtitles Error: {e}")
             return None
 
+    @metrics.timed('opensubtitles')
+    def get_subtitle(self, imdb_id):
+        """OpenSubtitles API üzerinden altyazı indirir."""
+        return steps.run(self._subtitle_flow(imdb_id))
+
+    @metrics.timed('opensubtitles')
+    async def aget_subtitle(self, imdb_id):
+        """get_subtitle'ın async karşılığı (httpx)."""
+        return await steps.arun(self._subtitle_flow(imdb_id))
+
+    @metrics.timed('subliminal')
     def get_subtitle_alt(self, movie_title):
         """Subliminal kullanarak alternatif kaynaklardan indirir."""
         try:
             print(f"📡 Subliminal ile aranıyor: {movie_title}")
+            subliminal, languages = registry.get('subliminal')
             video = subliminal.Video.fromname(movie_title)
-            languages = {Language('eng'), Language('tur')}
+            ratelimit.acquire('subliminal')
+            if self.cancelled.is_set():
+                return None
             best_subs = subliminal.download_best_subtitles([video], languages)
             
             if video in best_subs and best_subs[video]:
                 sub = best_subs[video][0]
+                self.last_language = str(sub.language)
                 return sub.content.decode('utf-8', errors='ignore')
             return None
+        except ratelimit.RateLimited:
+            raise
         except Exception as e:
             print(f"Subliminal Error: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    async def aget_subtitle_alt(self, movie_title):
+        """Subliminal'in async API'si yok; indirme ayrı bir thread'de yapılır (hız sınırı orada uygulanır)."""
+        async with ratelimit.slot('subliminal'):
+            return await asyncio.to_thread(self.get_subtitle_alt, movie_title)
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Movie
+from .featured import invalidate_pool
+from .response_cache import invalidate_movie
+from .search_index import local_index
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def movie_changed(sender, instance, **kwargs):
+    # Önbellekteki detay sayfası / analiz yanıtı eskimesin
+    invalidate_movie(instance)
+
+
+@receiver(post_save, sender=Movie)
+def movie_added(sender, instance, created, **kwargs):
+    # Yeni film ana sayfa havuzuna bir sonraki istekte girsin. Güncellemeler (bölüm yazımı,
+    # prewarm) havuzu düşürmez; kartlardaki değişiklik POOL_TTL içinde yansır
+    if created:
+        invalidate_pool()
+
+
+@receiver(post_delete, sender=Movie)
+def movie_removed(sender, instance, **kwargs):
+    # Silinen film havuzda kırık kart olarak kalmasın
+    invalidate_pool()
+
+
+@receiver(post_save, sender=Movie)
+def index_movie(sender, instance, **kwargs):
+    # Yeni film canlı aramada hemen çıksın
+    local_index.update_movie(instance)
+
+
+@receiver(post_delete, sender=Movie)
+def unindex_movie(sender, instance, **kwargs):
+    local_index.remove_movie(instance.imdb_id)
@@ -0,0 +1,78 @@
+import threading
+import uuid
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import AnalysisLease
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Aynı anahtar için eşzamanlı çağrıları tekilleştirir (process içi).
+    İlk gelen (lider) işi yapar, diğerleri onun sonucunu bekler.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+# --- Process'ler arası kilit (DB lease) ---
+
+def acquire_lease(key, ttl_seconds):
+    """
+    Lease alınırsa sahiplik token'ı, başka bir worker tutuyorsa None döner.
+    Süresi dolmuş lease (çökmüş worker) devralınır.
+    """
+    owner = uuid.uuid4().hex
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+
+    if AnalysisLease.objects.filter(key=key, expires_at__lt=now).update(owner=owner, expires_at=expires_at):
+        return owner
+    try:
+        with transaction.atomic():
+            AnalysisLease.objects.create(key=key, owner=owner, expires_at=expires_at)
+        return owner
+    except IntegrityError:
+        return None
+
+
+def release_lease(key, owner):
+    AnalysisLease.objects.filter(key=key, owner=owner).delete()
+
+
+def lease_is_held(key):
+    return AnalysisLease.objects.filter(key=key, expires_at__gte=timezone.now()).exists()
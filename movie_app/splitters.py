@@ -0,0 +1,208 @@
+import asyncio
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from .subtitles import PROMPT_LINE_RE, _to_ms, format_ms, iter_text_lines, parse_subtitle, parse_timestamp
+
+# AIService hata durumunda bu başlıkla tek bir sahte bölüm döner
+ERROR_TITLE_PREFIX = "Analiz Hatası"
+
+# Prompt'taki kurallarla aynı: 4-8 bölüm, her biri 20-40 dakika
+MIN_EPISODES, MAX_EPISODES = 4, 8
+MIN_EPISODE_MS, MAX_EPISODE_MS = 20 * 60 * 1000, 40 * 60 * 1000
+TARGET_EPISODE_MS = 30 * 60 * 1000
+# Kesim noktasının ideal konumdan en fazla ne kadar sapabileceği
+SEARCH_RADIUS_MS = 6 * 60 * 1000
+# Diyalog yoğunluğunun ölçüldüğü pencere (kesimin iki yanı)
+DENSITY_WINDOW_MS = 60 * 1000
+# Son bölümün bitişi altyazının sonundan en fazla bu kadar sapabilir (model saniyeleri yuvarlayabiliyor)
+END_TOLERANCE_MS = 60 * 1000
+
+
+class EpisodeSplitter(ABC):
+    """
+    Bölümleme motorları için ortak arayüz. Tüm motorlar aynı JSON şeklini döner:
+    [{"episode": 1, "start": "00:00:00", "end": "00:32:15", "title": "..."}, ...]
+    """
+    name = None
+
+    @abstractmethod
+    def split_movie_into_episodes(self, subtitle_text, mode='auto'):
+        """Altyazı metnini (temiz prompt metni ya da ham SRT) bölüm listesine çevirir."""
+
+    async def asplit_movie_into_episodes(self, subtitle_text, mode='auto'):
+        """Async yol için varsayılan: senkron motoru ayrı bir thread'de çalıştırır."""
+        return await asyncio.to_thread(self.split_movie_into_episodes, subtitle_text, mode)
+
+
+def is_error_result(episodes):
+    """AIService'in hata durumunda döndüğü sahte sonucu tanır."""
+    return (isinstance(episodes, list) and len(episodes) == 1
+            and str(episodes[0].get('title', '')).startswith(ERROR_TITLE_PREFIX))
+
+
+class InvalidEpisodes(ValueError):
+    """Model cevabı bölüm listesi kurallarına uymuyor."""
+
+
+def validate_episodes(episodes, end_ms=0):
+    """
+    Bölüm listesini doğrular ve normalize edilmiş kopyasını döner (numaralar 1..n, zamanlar HH:MM:SS).
+    Bölümler 00:00:00'dan başlayıp boşluksuz ardışık olmalı; end_ms verilirse son bölüm
+    altyazının sonunda bitmeli. Kurala uymayan listede InvalidEpisodes fırlatır.
+    """
+    if not isinstance(episodes, list) or not episodes:
+        raise InvalidEpisodes("Bölüm listesi boş ya da liste değil")
+
+    result = []
+    previous_end = 0
+    for number, item in enumerate(episodes, 1):
+        if not isinstance(item, dict):
+            raise InvalidEpisodes(f"{number}. bölüm nesne değil: {item!r}")
+        start = parse_timestamp(str(item.get('start', '')))
+        end = parse_timestamp(str(item.get('end', '')))
+        if start is None or end is None:
+            raise InvalidEpisodes(f"{number}. bölümün zamanı okunamadı: {item.get('start')!r} - {item.get('end')!r}")
+        if start // 1000 != previous_end // 1000:
+            raise InvalidEpisodes(f"{number}. bölüm {format_ms(previous_end)} yerine {format_ms(start)} ile başlıyor")
+        if end <= start:
+            raise InvalidEpisodes(f"{number}. bölüm başlamadan bitiyor: {format_ms(start)} - {format_ms(end)}")
+        title = str(item.get('title') or '').strip()
+        if not title:
+            raise InvalidEpisodes(f"{number}. bölümün başlığı yok")
+        result.append({"episode": number, "start": format_ms(start), "end": format_ms(end), "title": title})
+        previous_end = end
+
+    if end_ms and abs(previous_end - end_ms) > END_TOLERANCE_MS:
+        raise InvalidEpisodes(f"Son bölüm {format_ms(previous_end)} ile bitiyor, altyazı {format_ms(end_ms)} ile")
+    return result
+
+
+def snap_episodes(episodes, cues):
+    """
+    Bölümler arası sınırları en yakın gerçek cue başlangıcına çeker (CueList.nearest_start),
+    böylece bir replik iki bölüme bölünmez. İlk başlangıç ve son bitiş değişmez; sıralamayı
+    bozacak bir kaydırma yapılmaz. Hata sonucu ve boş cue listesi olduğu gibi döner.
+    """
+    if not cues or not isinstance(episodes, list) or len(episodes) < 2 or is_error_result(episodes):
+        return episodes
+
+    snapped = [dict(episode) for episode in episodes]
+    previous = parse_timestamp(snapped[0]['start']) or 0
+    for current, following in zip(snapped, snapped[1:]):
+        boundary = parse_timestamp(current['end'])
+        next_end = parse_timestamp(following['end'])
+        if boundary is None or next_end is None:
+            return episodes
+        nearest = cues.nearest_start(boundary)
+        # HH:MM:SS'e yuvarlanınca da bölüm boş kalmamalı
+        if previous // 1000 < nearest // 1000 < next_end // 1000:
+            boundary = nearest
+        current['end'] = following['start'] = format_ms(boundary)
+        previous = boundary
+    return snapped
+
+
+def subtitle_end_ms(subtitle_text):
+    """Ham altyazının ya da clean_subtitle() çıktısının son zaman damgası; zaman kodu yoksa 0."""
+    starts, ends, _ = _timeline(subtitle_text or "")
+    return max(ends, default=0)
+
+
+def _timeline(subtitle_text):
+    """Ham SRT/VTT ya da clean_subtitle() çıktısından (starts, ends, texts) üretir."""
+    if '-->' in subtitle_text:
+        cues = parse_subtitle(subtitle_text)
+        return list(cues.starts), list(cues.ends), cues.texts
+
+    starts, texts = [], []
+    for line in iter_text_lines(subtitle_text):
+        match = PROMPT_LINE_RE.match(line)
+        if match:
+            starts.append(_to_ms(*match.groups(), '0'))
+            texts.append(line[match.end():].strip())
+    # Temiz metinde bitiş zamanı yok; repliği bir sonrakinin başına kadar sürmüş say
+    ends = starts[1:] + starts[-1:]
+    return starts, ends, texts
+
+
+class LocalSplitter(EpisodeSplitter):
+    """
+    API çağrısı yapmayan, deterministik bölümleme motoru.
+    Kesim noktalarını diyalog boşlukları ve yoğunluğuna göre, hedef bölüm uzunluklarına
+    yakın yerlerden seçer. Gemini yavaşken ya da kota dolduğunda anında sonuç verir.
+    """
+    name = 'local'
+
+    def split_movie_into_episodes(self, subtitle_text, mode='auto'):
+        starts, ends, texts = _timeline(subtitle_text or "")
+        if not starts:
+            return []
+        if any(a > b for a, b in zip(starts, starts[1:])):
+            # Sırası bozuk altyazı: bisect için başlangıca göre sırala
+            starts, ends, texts = map(list, zip(*sorted(zip(starts, ends, texts))))
+
+        total_ms = max(ends[-1], starts[-1])
+        count = min(MAX_EPISODES, max(MIN_EPISODES, round(total_ms / TARGET_EPISODE_MS)))
+
+        cuts = [0]
+        for k in range(1, count):
+            remaining = count - k
+            ideal = cuts[-1] + (total_ms - cuts[-1]) / (remaining + 1)
+            cuts.append(self._best_cut(starts, ends, cuts[-1], ideal, total_ms, remaining))
+        cuts.append(total_ms)
+
+        episodes = []
+        for i in range(count):
+            episodes.append({
+                "episode": i + 1,
+                "start": format_ms(cuts[i]),
+                "end": format_ms(cuts[i + 1]),
+                "title": self._title(starts, texts, cuts[i], cuts[i + 1], i + 1),
+            })
+        return episodes
+
+    def _best_cut(self, starts, ends, previous_cut, ideal, total_ms, remaining):
+        """
+        İki replik arasındaki en iyi kesimi seçer. Aday: i. replik ile (i+1). replik arası,
+        kesim (i+1). repliğin başı. Puan: uzun sessizlik ve seyrek diyalog artı, ideal konumdan uzaklık eksi.
+        """
+        low = max(ideal - SEARCH_RADIUS_MS, previous_cut + MIN_EPISODE_MS)
+        high = min(ideal + SEARCH_RADIUS_MS, previous_cut + MAX_EPISODE_MS)
+        # Kalan bölümler de 20 dakikanın altına düşmesin
+        high = min(high, total_ms - remaining * MIN_EPISODE_MS)
+        if low > high:
+            return int(ideal)
+
+        best, best_score = int(ideal), None
+        for i in range(max(bisect_left(starts, low) - 1, 0), min(bisect_right(starts, high), len(starts) - 1)):
+            cut = starts[i + 1]
+            if not low <= cut <= high:
+                continue
+            gap_s = max(0, starts[i + 1] - ends[i]) / 1000
+            density = (bisect_left(starts, cut + DENSITY_WINDOW_MS)
+                       - bisect_left(starts, cut - DENSITY_WINDOW_MS))
+            distance_min = abs(cut - ideal) / 60000
+            score = gap_s - 0.3 * density - 0.8 * distance_min
+            if best_score is None or score > best_score:
+                best, best_score = cut, score
+        return best
+
+    def _title(self, starts, texts, start_ms, end_ms, number):
+        """Bölümün ilk anlamlı repliğini başlık yapar."""
+        for i in range(bisect_left(starts, start_ms), bisect_left(starts, end_ms)):
+            words = texts[i].strip('-– ').split()
+            if len(words) >= 3:
+                line = " ".join(words[:8]).rstrip('.,!?…')
+                return f"“{line}”"
+        # "Bölüm N" kullanma: detay sayfası bu öneki başlıktan siliyor
+        return f"Perde {number}"
+
+
+def get_splitter(name):
+    """İsimle bölümleme motoru döner: 'gemini' ya da 'local'."""
+    if name == LocalSplitter.name:
+        return LocalSplitter()
+    if name == 'gemini':
+        from .services import AIService
+        return AIService()
+    raise ValueError(f"Bilinmeyen bölümleme motoru: {name}")
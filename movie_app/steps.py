@@ -0,0 +1,101 @@
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+
+# Sync ve async yolun tek bir akışı paylaşması için küçük sürücü.
+# Akış bir üreteç olarak yazılır ve bloklayan her işi Step olarak yield eder. run() adımı
+# doğrudan çalıştırır, arun() async karşılığını bekler. Sonuç (ya da hata) üretece geri
+# gönderilir, böylece try/except, yeniden deneme ve önbellek mantığı tek yerde kalır.
+
+
+class Step:
+    """
+    Bloklayan tek iş: sync yolda func(*args, **kwargs) çağrılır. Async yolda afunc verildiyse
+    o beklenir, verilmediyse func sync_to_async ile (DB işleri için) çalıştırılır.
+    """
+    __slots__ = ('func', 'afunc', 'args', 'kwargs')
+
+    def __init__(self, func, *args, afunc=None, **kwargs):
+        self.func = func
+        self.afunc = afunc
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        return self.func(*self.args, **self.kwargs)
+
+    async def arun(self):
+        afunc = self.afunc or sync_to_async(self.func)
+        return await afunc(*self.args, **self.kwargs)
+
+
+def sleep(seconds):
+    """Sync yolda time.sleep, async yolda asyncio.sleep."""
+    return Step(time.sleep, seconds, afunc=asyncio.sleep)
+
+
+def run(flow):
+    """Üreteci sync yolda sonuna kadar çalıştırır ve dönüş değerini döner."""
+    send, value = flow.send, None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value, send = step.run(), flow.send
+        except Exception as e:
+            value, send = e, flow.throw
+
+
+async def arun(flow):
+    """run()'ın async karşılığı: adımlar event loop'u bloklamadan beklenir."""
+    send, value = flow.send, None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value, send = await step.arun(), flow.send
+        except Exception as e:
+            value, send = e, flow.throw
+
+
+def iterate(flow):
+    """
+    Step dışında değer de yield eden akışlar için (ör. SSE mesajları): adımları çalıştırır,
+    diğer değerleri çağırana verir.
+    """
+    send, value = flow.send, None
+    while True:
+        try:
+            item = send(value)
+        except StopIteration:
+            return
+        if not isinstance(item, Step):
+            yield item
+            send, value = flow.send, None
+            continue
+        try:
+            value, send = item.run(), flow.send
+        except Exception as e:
+            value, send = e, flow.throw
+
+
+async def aiterate(flow):
+    """iterate()'in async karşılığı (async üreteç)."""
+    send, value = flow.send, None
+    while True:
+        try:
+            item = send(value)
+        except StopIteration:
+            return
+        if not isinstance(item, Step):
+            yield item
+            send, value = flow.send, None
+            continue
+        try:
+            value, send = await item.arun(), flow.send
+        except Exception as e:
+            value, send = e, flow.throw
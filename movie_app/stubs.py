@@ -0,0 +1,227 @@
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .subtitles import format_ms
+
+# Benchmark'lar için yerel sahte upstream sunucuları. Gerçek API'lere (ve kotaya) hiç dokunmaz.
+# Her sunucu `latency` saniye (± jitter) gecikmeyle cevap verir ve `error_rate` oranında
+# `error_status` döner (hata enjeksiyonu). Çağrı ve hata sayıları sunucu üzerinde tutulur.
+
+TIMESTAMP_RE = re.compile(r'(\d{2}):(\d{2}):(\d{2})')
+# Sahte altyazı: her STUB_CUE_MS'de bir replik, toplam STUB_MOVIE_MS
+STUB_MOVIE_MS = 2 * 60 * 60 * 1000
+STUB_CUE_MS = 4000
+STUB_EPISODE_MS = 30 * 60 * 1000
+
+
+def stub_srt(duration_ms=STUB_MOVIE_MS, step_ms=STUB_CUE_MS):
+    blocks = []
+    for i, start in enumerate(range(0, duration_ms, step_ms), 1):
+        end = start + step_ms - 500
+        blocks.append(f"{i}\n{format_ms(start)},000 --> {format_ms(end)},500\nReplik {i}.\n")
+    return "\n".join(blocks)
+
+
+def stub_episodes(prompt):
+    """Prompt'taki en büyük zaman damgasına kadar ~30 dakikalık ardışık bölümler."""
+    stamps = [int(h) * 3600000 + int(m) * 60000 + int(s) * 1000 for h, m, s in TIMESTAMP_RE.findall(prompt)]
+    end_ms = max(stamps, default=STUB_EPISODE_MS)
+    count = max(1, min(8, round(end_ms / STUB_EPISODE_MS)))
+    bounds = [end_ms * i // count for i in range(count + 1)]
+    return [
+        {'episode': i + 1, 'start': format_ms(bounds[i]), 'end': format_ms(bounds[i + 1]), 'title': f'Stub Bölüm {i + 1}'}
+        for i in range(count)
+    ]
+
+
+class StubHandler(BaseHTTPRequestHandler, ABC):
+    """Ortak davranış: gecikme, hata enjeksiyonu, sayım. Alt sınıflar respond() yazar."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def _serve(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        server = self.server
+        server.count()
+        if server.latency:
+            time.sleep(max(0.0, server.latency * random.uniform(1 - server.jitter, 1 + server.jitter)))
+        if server.error_rate and random.random() < server.error_rate:
+            server.count(error=True)
+            self.send_json(server.error_status, {'error': 'injected'})
+            return
+        self.respond(method, urlparse(self.path), body)
+
+    @abstractmethod
+    def respond(self, method, url, body):
+        """İsteğe cevap yazar (send_json / send_body ile)."""
+
+    def send_body(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, status, body):
+        self.send_body(status, json.dumps(body).encode(), 'application/json')
+
+    def log_message(self, *args):
+        pass
+
+
+class StubOMDbHandler(StubHandler):
+    """Sahte OMDb: `s=` araması sorguyu başlık olarak döner, `i=` film detayı döner."""
+
+    def respond(self, method, url, body):
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if 's' in params:
+            query = params['s']
+            body = {
+                'Response': 'True', 'totalResults': '1',
+                'Search': [{'Title': query.title(), 'Year': '2007', 'imdbID': 'tt%07d' % (zlib.crc32(query.encode()) % 10 ** 7),
+                            'Type': 'movie', 'Poster': 'N/A'}],
+            }
+        else:
+            imdb_id = params.get('i', 'tt0000000')
+            body = {'Response': 'True', 'Title': f'Stub Film {imdb_id}', 'Year': '2007', 'Poster': 'N/A',
+                    'Plot': 'Stub.', 'imdbRating': '7.0', 'Genre': 'Drama', 'Runtime': '120 min'}
+        self.send_json(200, body)
+
+
+class StubOpenSubtitlesHandler(StubHandler):
+    """Sahte OpenSubtitles: arama -> indirme linki -> SRT dosyası (SubtitleService akışı)."""
+
+    def respond(self, method, url, body):
+        if url.path.endswith('/subtitles'):
+            imdb_id = parse_qs(url.query).get('imdb_id', ['0'])[0]
+            self.send_json(200, {'data': [{'attributes': {'language': 'en', 'files': [{'file_id': int(imdb_id)}]}}]})
+        elif url.path.endswith('/download'):
+            file_id = json.loads(body or b'{}').get('file_id', 0)
+            self.send_json(200, {'link': f'{self.server.url}files/{file_id}.srt'})
+        elif url.path.startswith('/files/'):
+            self.send_body(200, self.server.srt, 'application/x-subrip; charset=utf-8')
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+
+class StubGeminiHandler(StubHandler):
+    """
+    Sahte Gemini generateContent: prompt'un zaman aralığını kapsayan bölüm listesi döner.
+    streamGenerateContent (alt=sse) aynı cevabı STREAM_CHUNKS parçada, aralara gecikme koyarak akıtır.
+    """
+    STREAM_CHUNKS = 8
+
+    def respond(self, method, url, body):
+        request = json.loads(body or b'{}')
+        prompt = " ".join(
+            part.get('text', '') for content in request.get('contents', []) for part in content.get('parts', [])
+        )
+        text = json.dumps(stub_episodes(prompt), ensure_ascii=False)
+        if 'streamGenerateContent' in url.path:
+            self.stream(prompt, text)
+            return
+        self.send_json(200, self.chunk(text, 'STOP', prompt, text))
+
+    @staticmethod
+    def chunk(part, finish_reason, prompt, text):
+        body = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': part}]}}]}
+        if finish_reason:
+            body['candidates'][0]['finishReason'] = finish_reason
+            body['usageMetadata'] = {
+                'promptTokenCount': len(prompt) // 4,
+                'candidatesTokenCount': len(text) // 4,
+                'totalTokenCount': (len(prompt) + len(text)) // 4,
+            }
+        return body
+
+    def stream(self, prompt, text):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        size = -(-len(text) // self.STREAM_CHUNKS)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        for number, piece in enumerate(pieces, 1):
+            if number > 1 and self.server.latency:
+                # İlk parça gecikmeden sonra gelir; kalanlar akış süresini taklit eder
+                time.sleep(self.server.latency / len(pieces))
+            last = number == len(pieces)
+            event = self.chunk(piece, 'STOP' if last else None, prompt, text)
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode())
+            self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Yük testinde bağlantı kuyruğu taşmasın
+    request_queue_size = 256
+
+    def __init__(self, handler, latency=0.0, error_rate=0.0, error_status=503, jitter=0.0):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.jitter = jitter
+        self.calls = 0
+        self.errors = 0
+        self.srt = stub_srt().encode()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/'
+
+    def count(self, error=False):
+        """calls tüm istekleri sayar; errors bunlardan hata enjekte edilenleri."""
+        with self._lock:
+            if error:
+                self.errors += 1
+            else:
+                self.calls += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+STUB_HANDLERS = {
+    'omdb': StubOMDbHandler,
+    'opensubtitles': StubOpenSubtitlesHandler,
+    'gemini': StubGeminiHandler,
+}
+
+
+def start_stubs(latency=None, error_rate=None, error_status=503, jitter=0.0):
+    """
+    Üç upstream için sunucuları başlatır ve servislerin okuduğu ortam değişkenlerini döner.
+    latency/error_rate: {'omdb': 0.05, ...} şeklinde upstream başına değerler.
+    """
+    latency, error_rate = latency or {}, error_rate or {}
+    servers = {
+        name: StubServer(handler, latency=latency.get(name, 0.0), error_rate=error_rate.get(name, 0.0),
+                         error_status=error_status, jitter=jitter).start()
+        for name, handler in STUB_HANDLERS.items()
+    }
+    env = {
+        'OMDB_API_KEY': 'stub', 'OMDB_BASE_URL': servers['omdb'].url,
+        'OPENSUBTITLES_API_KEY': 'stub', 'OPENSUBTITLES_BASE_URL': servers['opensubtitles'].url.rstrip('/'),
+        'GEMINI_API_KEY': 'stub', 'GEMINI_BASE_URL': servers['gemini'].url.rstrip('/'),
+    }
+    return servers, env
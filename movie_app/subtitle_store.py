@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from .models import StoredSubtitle
+from .subtitles import CueList
+
+
+def store_root():
+    return Path(getattr(settings, 'SUBTITLE_STORE_DIR', Path(settings.BASE_DIR) / 'subtitle_store'))
+
+
+def blob_path(sha256):
+    # objects/ab/abcdef... — tek klasörde binlerce dosya birikmesin
+    return store_root() / 'objects' / sha256[:2] / f"{sha256}.gz"
+
+
+# Ayrıştırılmış cue indeksinin dosya biçimi; CueList değişirse artırılır (eski dosyalar okunmaz)
+CUE_INDEX_VERSION = 2
+
+
+def cues_path(sha256):
+    """Altyazının ayrıştırılmış CueList'i, içerikle aynı hash ile blob'un yanında durur."""
+    return store_root() / 'objects' / sha256[:2] / f"{sha256}.v{CUE_INDEX_VERSION}.cues"
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _atomic_write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Önce geçici dosyaya yaz, sonra atomik olarak taşı (yarım dosya kalmasın)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def save_subtitle(imdb_id, provider, text, language=''):
+    """
+    Altyazıyı gzip ile sıkıştırıp içerik hash'i ile saklar ve indeksi günceller.
+    Aynı içerik farklı filmler/sağlayıcılar için tekrar yazılmaz.
+    """
+    data = text.encode('utf-8')
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = blob_path(sha256)
+
+    if not path.exists():
+        _atomic_write(path, gzip.compress(data, compresslevel=6))
+
+    entry, _ = StoredSubtitle.objects.update_or_create(
+        imdb_id=imdb_id, language=language or '', provider=provider,
+        defaults={'sha256': sha256, 'size': len(data), 'stored_size': path.stat().st_size},
+    )
+    return entry
+
+
+def read_subtitle(entry):
+    """İndeks kaydının altyazı metnini döner; dosya kaybolmuşsa None."""
+    try:
+        with gzip.open(blob_path(entry.sha256), 'rb') as f:
+            return f.read().decode('utf-8')
+    except (FileNotFoundError, OSError, EOFError):
+        return None
+
+
+def save_cues(sha256, cues):
+    """
+    Arşivdeki altyazının CueList'ini diske yazar; böylece transkript isteği hangi process'e
+    düşerse düşsün altyazıyı yeniden ayrıştırmaz. Blob'u olmayan (arşivlenmemiş) metin yazılmaz.
+    """
+    path = cues_path(sha256)
+    if path.exists() or not blob_path(sha256).exists():
+        return
+    _atomic_write(path, cues.to_bytes())
+
+
+def read_cues(sha256):
+    """
+    save_cues ile yazılmış CueList; yoksa ya da okunamazsa (yarım/bozuk dosya) None.
+    Dosya sadece veri içerir (diziler + JSON), okumak kod çalıştırmaz.
+    """
+    try:
+        with open(cues_path(sha256), 'rb') as f:
+            return CueList.from_bytes(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def latest_entry(imdb_id):
+    return StoredSubtitle.objects.filter(imdb_id=imdb_id).order_by('-created_at').first()
+
+
+def find_subtitle(imdb_id, provider=None, language=None):
+    """Film için arşivdeki en yeni altyazıyı (kayıt, metin) olarak döner."""
+    entries = StoredSubtitle.objects.filter(imdb_id=imdb_id)
+    if provider:
+        entries = entries.filter(provider=provider)
+    if language is not None:
+        entries = entries.filter(language=language)
+
+    for entry in entries.order_by('-created_at'):
+        text = read_subtitle(entry)
+        if text is not None:
+            return entry, text
+        # Dosyası silinmiş kaydı temizle
+        entry.delete()
+    return None
+
+
+def delete_entries(entries):
+    """İndeks kayıtlarını siler; başka kayıt kullanmıyorsa dosyayı da siler. Silinen byte'ı döner."""
+    freed = 0
+    for entry in entries:
+        entry.delete()
+        if not StoredSubtitle.objects.filter(sha256=entry.sha256).exists():
+            path = blob_path(entry.sha256)
+            if path.exists():
+                freed += path.stat().st_size
+                path.unlink()
+            cues_path(entry.sha256).unlink(missing_ok=True)
+    return freed
+
+
+def orphan_blobs():
+    """İndekste karşılığı olmayan dosyalar (blob'lar, cue indeksleri ve eski sürüm cue indeksleri)."""
+    objects_dir = store_root() / 'objects'
+    if not objects_dir.exists():
+        return []
+    known = set(StoredSubtitle.objects.values_list('sha256', flat=True))
+    current = f".v{CUE_INDEX_VERSION}.cues"
+    return [p for p in objects_dir.glob('*/*') if p.suffix in ('.gz', '.cues')
+            and (p.name[:64] not in known or p.suffix == '.cues' and not p.name.endswith(current))]
@@ -0,0 +1,274 @@
+import json
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+# SRT: 00:01:02,345  VTT: 00:01:02.345 veya 01:02.345 (saat opsiyonel)
+TIMESTAMP_RE = re.compile(
+    r'^\s*(?:(\d{1,2}):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*'
+    r'(?:(\d{1,2}):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})'
+)
+TAG_RE = re.compile(r'<[^>]*>|\{\\[^}]*\}')
+AD_RE = re.compile(r'(?i)(opensubtitles|subtitles|translated|encoded|advertisement)')
+
+# to_prompt_text() satırlarının başındaki zaman damgası
+PROMPT_LINE_RE = re.compile(r'^\[(\d{2}):(\d{2}):(\d{2})\]')
+
+# CueList.to_bytes() başlığı: cue sayısı (little-endian uint32)
+CUE_HEADER = struct.Struct('<I')
+
+# Satır bazında çözmeyi denediğimiz kodlamalar (Türkçe altyazılar çoğunlukla cp1254)
+FALLBACK_ENCODINGS = ('utf-8', 'cp1254')
+
+
+def _to_ms(h, m, s, frac):
+    # ",5" -> 500ms, ",05" -> 50ms
+    return ((int(h or 0) * 60 + int(m)) * 60 + int(s)) * 1000 + int(frac.ljust(3, '0'))
+
+
+def format_ms(ms):
+    """Milisaniyeyi HH:MM:SS formatına çevirir."""
+    seconds = ms // 1000
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_timestamp(value):
+    """'HH:MM:SS' (veya 'HH:MM:SS,mmm') metnini milisaniyeye çevirir, hatalıysa None."""
+    match = re.match(r'^\s*(?:(\d{1,2}):)?(\d{1,2}):(\d{1,2})(?:[,.](\d{1,3}))?\s*$', value or '')
+    if not match:
+        return None
+    h, m, s, frac = match.groups()
+    return _to_ms(h, m, s, frac or '0')
+
+
+def decode_line(raw):
+    """Bytes satırı çözer; bozuk kodlamada bir sonrakine geçer, en son karakterleri atlar."""
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('utf-8', errors='ignore')
+
+
+def iter_text_lines(text):
+    """Büyük bir metni kopyalamadan satır satır dolaşır (splitlines() tüm listeyi üretir)."""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find('\n', start)
+        if end == -1:
+            end = length
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_file_lines(path):
+    """Dosyayı binary açıp satır satır, kodlamasını çözerek okur."""
+    with open(path, 'rb') as f:
+        for raw in f:
+            yield decode_line(raw)
+
+
+def _lines(source):
+    if isinstance(source, bytes):
+        for raw in source.splitlines():
+            yield decode_line(raw)
+    elif isinstance(source, str):
+        yield from iter_text_lines(source)
+    else:
+        for line in source:
+            yield decode_line(line) if isinstance(line, bytes) else line
+
+
+def _clean_line(line):
+    # Regex'leri sadece gerektiğinde çalıştır; satırların çoğu düz metin
+    if '<' in line or '{' in line:
+        line = TAG_RE.sub('', line)
+    line = line.strip()
+    if not line or AD_RE.search(line):
+        return ''
+    return line
+
+
+def iter_cues(source):
+    """
+    SRT/VTT içeriğini satır satır okuyup (start_ms, end_ms, text) üretir.
+    source: str, bytes ya da satır üreten herhangi bir iterable (dosya nesnesi vb.).
+    Zaman kodu bozuk bloklar ve boş kalan (reklam, etiket) cue'lar atlanır.
+    """
+    start_ms = end_ms = None
+    text_parts = []
+    first = True
+
+    for line in _lines(source):
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        line = line.rstrip('\r\n')
+
+        match = TIMESTAMP_RE.match(line) if '-->' in line else None
+        if match:
+            # Boş satır olmadan yeni bir cue başlarsa öncekini kapat
+            if start_ms is not None and text_parts:
+                yield start_ms, end_ms, ' '.join(text_parts)
+            g = match.groups()
+            start_ms = _to_ms(*g[:4])
+            end_ms = _to_ms(*g[4:])
+            if end_ms < start_ms:
+                start_ms = None
+            text_parts = []
+            continue
+
+        if not line.strip():
+            if start_ms is not None and text_parts:
+                yield start_ms, end_ms, ' '.join(text_parts)
+            start_ms = None
+            text_parts = []
+            continue
+
+        # Cue dışındaki satırlar: sıra numarası, WEBVTT başlığı, NOTE/STYLE blokları
+        if start_ms is None:
+            continue
+
+        cleaned = _clean_line(line)
+        if cleaned:
+            text_parts.append(cleaned)
+
+    if start_ms is not None and text_parts:
+        yield start_ms, end_ms, ' '.join(text_parts)
+
+
+class CueList:
+    """Cue'ları kompakt dizilerde tutar: başlangıç/bitiş uint32 dizilerde, metinler listede."""
+
+    def __init__(self):
+        self.starts = array('I')
+        self.ends = array('I')
+        self.texts = []
+
+    def append(self, start_ms, end_ms, text):
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self.texts.append(text)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.texts)
+
+    def __getitem__(self, index):
+        return self.starts[index], self.ends[index], self.texts[index]
+
+    def to_bytes(self):
+        """Disk biçimi: başlık, little-endian uint32 starts ve ends dizileri, ardından JSON metin listesi."""
+        starts, ends = array('I', self.starts), array('I', self.ends)
+        if sys.byteorder == 'big':
+            starts.byteswap()
+            ends.byteswap()
+        texts = json.dumps(self.texts, ensure_ascii=False).encode('utf-8')
+        return CUE_HEADER.pack(len(self)) + starts.tobytes() + ends.tobytes() + texts
+
+    @classmethod
+    def from_bytes(cls, data):
+        """to_bytes() ile yazılmış veriden CueList kurar; bozuk ya da eksik veride ValueError."""
+        try:
+            (count,) = CUE_HEADER.unpack_from(data)
+        except struct.error as e:
+            raise ValueError(f"Cue indeksi okunamadı: {e}") from e
+        size = count * array('I').itemsize
+        offset = CUE_HEADER.size
+        cues = cls()
+        cues.starts.frombytes(data[offset:offset + size])
+        cues.ends.frombytes(data[offset + size:offset + 2 * size])
+        if sys.byteorder == 'big':
+            cues.starts.byteswap()
+            cues.ends.byteswap()
+        cues.texts = json.loads(data[offset + 2 * size:].decode('utf-8'))
+        if not (len(cues.starts) == len(cues.ends) == count and isinstance(cues.texts, list)
+                and len(cues.texts) == count and all(isinstance(text, str) for text in cues.texts)):
+            raise ValueError("Cue indeksi okunamadı: uzunluklar tutmuyor")
+        return cues
+
+    @property
+    def duration_ms(self):
+        return max(self.ends) if self.ends else 0
+
+    def sort(self):
+        """Cue'ları başlangıç zamanına göre sıralar; aramalar (bisect) sıralı starts dizisine dayanır."""
+        starts = self.starts
+        if all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1)):
+            return
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        self.starts = array('I', (starts[i] for i in order))
+        self.ends = array('I', (self.ends[i] for i in order))
+        self.texts = [self.texts[i] for i in order]
+
+    def span(self, start_ms, end_ms=None):
+        """[start_ms, end_ms) aralığında başlayan cue'ların (ilk, son+1) indeksleri; O(log n)."""
+        first = bisect_left(self.starts, start_ms)
+        last = len(self.starts) if end_ms is None else bisect_left(self.starts, end_ms, first)
+        return first, max(first, last)
+
+    def between(self, start_ms, end_ms=None):
+        first, last = self.span(start_ms, end_ms)
+        return [self[i] for i in range(first, last)]
+
+    def nearest_start(self, ms):
+        """ms'ye en yakın cue başlangıcı (eşitlikte önceki); cue yoksa None."""
+        if not self.starts:
+            return None
+        i = bisect_left(self.starts, ms)
+        if i == 0:
+            return self.starts[0]
+        if i == len(self.starts):
+            return self.starts[-1]
+        before, after = self.starts[i - 1], self.starts[i]
+        return before if ms - before <= after - ms else after
+
+    def to_prompt_text(self):
+        """AI için zaman damgalı kompakt metin: her satır '[HH:MM:SS] replik'."""
+        return "\n".join(f"[{format_ms(s)}] {t}" for s, _, t in self)
+
+
+def parse_subtitle(source):
+    """Altyazıyı tek geçişte CueList'e çevirir (başlangıç zamanına göre sıralı)."""
+    cues = CueList()
+    for start_ms, end_ms, text in iter_cues(source):
+        cues.append(start_ms, end_ms, text)
+    cues.sort()
+    return cues
+
+
+def parse_subtitle_file(path):
+    return parse_subtitle(iter_file_lines(path))
+
+
+def split_prompt_windows(prompt_text, window_ms):
+    """
+    to_prompt_text() çıktısını ardışık zaman pencerelerine böler.
+    [(start_ms, end_ms, text), ...] döner; zaman damgası yoksa tek pencere olur.
+    """
+    windows = []
+    lines = []
+    window_start = None
+    last_ms = 0
+
+    for line in iter_text_lines(prompt_text):
+        match = PROMPT_LINE_RE.match(line)
+        ms = _to_ms(*match.groups(), '0') if match else last_ms
+        if window_start is None:
+            window_start = ms
+        elif ms - window_start >= window_ms and lines:
+            windows.append((window_start, last_ms, "\n".join(lines)))
+            lines = []
+            window_start = ms
+        lines.append(line)
+        last_ms = ms
+
+    if lines:
+        windows.append((window_start, last_ms, "\n".join(lines)))
+    return windows
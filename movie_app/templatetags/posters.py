@@ -0,0 +1,10 @@
+from django import template
+from .. import posters
+
+register = template.Library()
+
+
+@register.filter
+def poster(src, variant='grid'):
+    """{{ movie.poster|poster:'hero' }} -> yerel, boyutlandırılmış poster adresi."""
+    return posters.poster_url(src, variant)
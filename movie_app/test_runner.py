@@ -0,0 +1,18 @@
+import tempfile
+from django.test import runner
+from .cache import isolated_cache
+
+
+class DiscoverRunner(runner.DiscoverRunner):
+    """Test çalıştırması boyunca önbellek geçici bir dizinde tutulur, sonunda silinir."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self._cache_override = isolated_cache(self._cache_dir.name)
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        self._cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1525 @@
-from django.test import TestCase
+import asyncio
+import io
+import subprocess
+import sys
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from . import analysis, catalog, featured, jobs, metrics, posters, ratelimit, registry, replay, response_cache, stubs, transcripts
+from .search_index import SearchIndex, local_index
+from .models import AnalysisJob, Movie, StoredSubtitle, UpstreamBucket
+from . import services
+from .cache import TTLCache
+from .jsonstream import JSONArrayStream
+from .http_sessions import aclose_async_clients, build_session
+from .services import AIService, MovieInfoService
+from . import subtitle_store
+from .providers import ProviderResult, arace_providers, race_providers
+from .splitters import (EpisodeSplitter, InvalidEpisodes, LocalSplitter, is_error_result, snap_episodes,
+                        validate_episodes)
+from .subtitles import parse_timestamp
+from .singleflight import SingleFlight, acquire_lease, release_lease
+from .subtitles import parse_subtitle, parse_subtitle_file, format_ms
 
-# Create your tests here.
+TEST_SRT = os.path.join(settings.BASE_DIR, 'test.srt')
+# DB'siz testler paylaşılan (DB'deki) hız sınırına dokunmasın
+without_shared_limits = override_settings(UPSTREAM_LIMITS={})
+
+
+class SubtitleParserTests(SimpleTestCase):
+    def test_parses_srt_cues(self):
+        raw = "1\n00:00:52,810 --> 00:00:57,548\n<i>Before time</i> began,\nthere was the Cube.\n\n2\n00:00:58,088 --> 00:01:00,217\nWe know not.\n"
+        cues = parse_subtitle(raw)
+        self.assertEqual(len(cues), 2)
+        self.assertEqual(cues[0], (52810, 57548, "Before time began, there was the Cube."))
+        self.assertEqual(cues.duration_ms, 60217)
+
+    def test_bom_crlf_and_vtt(self):
+        raw = "\ufeffWEBVTT\r\n\r\nNOTE yorum\r\n\r\n01:02.500 --> 01:04.000 align:start\r\nMerhaba\r\n\r\n"
+        cues = parse_subtitle(raw)
+        self.assertEqual(list(cues), [(62500, 64000, "Merhaba")])
+
+    def test_bad_encoding_bytes(self):
+        raw = "1\n00:00:01,000 --> 00:00:02,000\nŞahin geldi\n".encode('cp1254')
+        cues = parse_subtitle(raw)
+        self.assertEqual(cues.texts, ["Şahin geldi"])
+
+    def test_skips_malformed_and_ad_cues(self):
+        raw = (
+            "1\n00:00:01,000 --> 00:00:02\nbozuk\n\n"
+            "2\n00:00:05,000 --> 00:00:03,000\nters zaman\n\n"
+            "3\n00:00:06,000 --> 00:00:07,000\nSubtitles by OpenSubtitles.org\n\n"
+            "4\n00:00:08,000 --> 00:00:09,000\nsağlam\n"
+        )
+        self.assertEqual(parse_subtitle(raw).texts, ["sağlam"])
+
+    def test_test_srt_stream_matches_string(self):
+        cues = parse_subtitle_file(TEST_SRT)
+        with open(TEST_SRT, encoding='utf-8') as f:
+            self.assertEqual(list(parse_subtitle(f.read())), list(cues))
+        self.assertGreater(len(cues), 1000)
+        self.assertEqual(format_ms(cues.starts[0]), "00:00:52")
+
+
+class TranscriptTests(TestCase):
+    SRT = (
+        "3\n00:20:05,500 --> 00:20:08,000\nÜçüncü\n\n"
+        "1\n00:00:01,000 --> 00:00:03,000\nBirinci\n\n"
+        "2\n00:19:40,000 --> 00:19:42,000\nİkinci\n\n"
+        "4\n00:41:00,000 --> 00:41:02,000\nSon\n"
+    )
+
+    def setUp(self):
+        transcripts._transcripts.clear()
+
+    def test_cue_index_is_sorted_and_snaps_boundaries(self):
+        cues = parse_subtitle(self.SRT)
+        self.assertEqual(cues.texts, ['Birinci', 'İkinci', 'Üçüncü', 'Son'])
+        self.assertEqual([text for _, _, text in cues.between(60_000, 1_205_500)], ['İkinci'])
+        self.assertEqual(cues.between(1_205_500)[0][2], 'Üçüncü')
+        self.assertEqual(cues.nearest_start(1_200_000), 1_205_500)
+
+        episodes = [
+            {'episode': 1, 'start': '00:00:00', 'end': '00:20:00', 'title': 'A'},
+            {'episode': 2, 'start': '00:20:00', 'end': '00:41:02', 'title': 'B'},
+        ]
+        snapped = snap_episodes(episodes, cues)
+        self.assertEqual((snapped[0]['end'], snapped[1]['start']), ('00:20:05', '00:20:05'))
+        self.assertEqual(snapped[1]['end'], '00:41:02')
+        self.assertEqual(episodes[0]['end'], '00:20:00')
+
+    @override_settings(ANALYSIS_TEST_MODE=True)
+    def test_episode_and_range_transcripts_parse_once(self):
+        Movie.objects.create(imdb_id='tt1', title='Film', episode_data=[
+            {'episode': 1, 'start': '00:00:00', 'end': '00:30:00', 'title': 'Giriş'},
+            {'episode': 2, 'start': '00:30:00', 'end': '01:00:00', 'title': 'Son'},
+        ])
+        first = self.client.get('/transcript/tt1/?episode=2').json()
+        self.assertEqual((first['episode'], first['title'], first['start']), (2, 'Son', '00:30:00'))
+        self.assertTrue(first['cues'])
+        self.assertTrue(all(cue['start_ms'] >= 30 * 60 * 1000 for cue in first['cues']))
+
+        with mock.patch('movie_app.transcripts.parse_subtitle_file') as parse:
+            ranged = self.client.get('/transcript/tt1/?start=00:00:50&end=00:01:00').json()
+            parse.assert_not_called()
+        self.assertEqual(ranged['cues'][0]['start'], '00:00:52')
+
+        self.assertEqual(self.client.get('/transcript/tt1/?episode=9').status_code, 404)
+        self.assertEqual(self.client.get('/transcript/tt1/?start=yarım').status_code, 400)
+        self.assertEqual(self.client.get('/transcript/tt1/?episode=iki').status_code, 400)
+
+
+class SingleFlightTests(TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'sonuç'
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('tt1', work))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['sonuç'] * 8)
+
+    def test_lease_is_exclusive_until_released_or_expired(self):
+        owner = acquire_lease('analyze:tt1', 60)
+        self.assertIsNotNone(owner)
+        self.assertIsNone(acquire_lease('analyze:tt1', 60))
+        release_lease('analyze:tt1', owner)
+        self.assertIsNotNone(acquire_lease('analyze:tt1', -1))
+        # Süresi dolmuş lease devralınabilir
+        self.assertIsNotNone(acquire_lease('analyze:tt1', 60))
+
+    def test_follower_reuses_result_while_lease_held(self):
+        payload = {'source': 'OpenSubtitles', 'episodes': [], 'movie_info': {}}
+        with mock.patch.object(analysis, 'run_analysis', return_value=payload) as run:
+            self.assertEqual(analysis.analyze_single_flight('tt2'), payload)
+            run.assert_called_once_with('tt2', on_episode=None)
+
+        owner = acquire_lease('analyze:tt3', 60)
+        with mock.patch.object(analysis, 'wait_for_leader', return_value=payload) as wait, \
+                mock.patch.object(analysis, 'run_analysis') as run:
+            self.assertEqual(analysis.analyze_single_flight('tt3'), payload)
+            wait.assert_called_once()
+            run.assert_not_called()
+        release_lease('analyze:tt3', owner)
+
+
+class AnalysisJobTests(TransactionTestCase):
+    def test_analyze_enqueues_once_and_reports_status(self):
+        first = self.client.get('/analyze/', {'imdb_id': 'tt0418279'})
+        second = self.client.get('/analyze/', {'imdb_id': 'tt0418279'})
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()['job_id'], second.json()['job_id'])
+
+        status = self.client.get(f"/analyze/status/{first.json()['job_id']}/")
+        self.assertEqual(status.json()['status'], 'queued')
+
+    def test_concurrent_enqueue_reuses_the_winning_job(self):
+        existing = jobs.enqueue_analysis('tt2')
+        # Diğer istek kontrolden sonra işi oluşturmuş gibi: ilk kontrol boş döner
+        with mock.patch.object(jobs, '_active_job', side_effect=[None, existing]):
+            self.assertEqual(jobs.enqueue_analysis('tt2'), existing)
+        self.assertEqual(AnalysisJob.objects.filter(imdb_id='tt2').count(), 1)
+
+        existing.status = AnalysisJob.DONE
+        existing.save()
+        self.assertNotEqual(asyncio.run(jobs.aenqueue_analysis('tt2')), existing)
+
+    def test_analyze_returns_cached_episodes_without_job(self):
+        Movie.objects.create(imdb_id='tt1', title='Matrix', episode_data=[{'episode': 1}])
+        response = self.client.get('/analyze/', {'imdb_id': 'tt1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['source'], 'Veritabanı')
+        self.assertFalse(AnalysisJob.objects.exists())
+
+    def test_worker_runs_jobs(self):
+        ok = jobs.enqueue_analysis('tt2')
+        bad = jobs.enqueue_analysis('tt3')
+        payload = {'source': 'OpenSubtitles', 'episodes': [{'episode': 1}], 'movie_info': {}}
+
+        def fake_analyze(imdb_id, on_episode=None):
+            if imdb_id == 'tt3':
+                raise analysis.AnalysisError('Altyazı yok', status=404)
+            return payload
+
+        with mock.patch.object(jobs, 'analyze_single_flight', side_effect=fake_analyze):
+            call_command('run_worker', once=True, concurrency=2, stdout=io.StringIO())
+
+        ok.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual(ok.status, AnalysisJob.DONE)
+        self.assertEqual(jobs.job_payload(ok)['episodes'], payload['episodes'])
+        self.assertEqual(bad.status, AnalysisJob.FAILED)
+        self.assertEqual(bad.error, 'Altyazı yok')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Sahte OMDb: her isteğin geldiği bağlantıyı (client port) kaydeder."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.ports.append(self.client_address[1])
+        if self.path.startswith('/poster/'):
+            return self.send_poster()
+        extra = {}
+        if self.server.fail_next:
+            self.server.fail_next -= 1
+            status, body = 503, b'{}'
+            if self.server.retry_after:
+                status, extra = 429, {'Retry-After': str(self.server.retry_after)}
+        elif 's=yok' in self.path:
+            status, body = 200, b'{"Response": "False", "Error": "Movie not found!"}'
+        else:
+            status, body = 200, json.dumps({
+                'Response': 'True', 'Title': 'Transformers', 'totalResults': '1',
+                'Search': [{'Title': 'Transformers', 'imdbID': 'tt0418279'}]
+            }).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in extra.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_poster(self):
+        """Sahte poster sunucusu: /poster/missing.jpg 404, diğerleri 1000x1500 JPEG."""
+        if self.path == '/poster/missing.jpg':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = stub_poster()
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def stub_poster():
+    """Pillow varsa gerçek bir JPEG, yoksa sadece JPEG imzası taşıyan baytlar."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return b'\xff\xd8\xff\xe0' + b'\0' * 4096
+    buffer = io.BytesIO()
+    Image.new('RGB', (1000, 1500), (200, 30, 30)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class StubServerMixin:
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.ports = []
+        self.server.fail_next = 0
+        self.server.retry_after = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        services._search_cache.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_service(self, fast_retry=True):
+        service = MovieInfoService()
+        service.api_key = 'test'
+        service.base_url = self.url
+        if fast_retry:
+            service.session = build_session(backoff=0)
+        return service
+
+
+@without_shared_limits
+class HttpSessionTests(StubServerMixin, SimpleTestCase):
+    def test_connections_are_reused_across_service_instances(self):
+        for _ in range(5):
+            service = self.make_service(fast_retry=False)
+            self.assertEqual(service.get_movie_details('tt0418279')['title'], 'Transformers')
+        self.assertEqual(len(self.server.ports), 5)
+        self.assertEqual(len(set(self.server.ports)), 1)
+
+    def test_retries_on_503(self):
+        self.server.fail_next = 2
+        details = self.make_service().get_movie_details('tt0418279')
+        self.assertEqual(details['title'], 'Transformers')
+        self.assertEqual(len(self.server.ports), 3)
+
+    def test_long_retry_after_is_not_slept(self):
+        # Saatlik Retry-After worker'ı uyutmaz: çağıran hemen "sonra tekrar dene" alır
+        self.server.fail_next, self.server.retry_after = 1, 3600
+        service = self.make_service(fast_retry=False)
+        service.session = build_session(upstream='omdb')
+        started = time.monotonic()
+        with self.assertRaises(ratelimit.RateLimited) as ctx:
+            service.get_movie_details('tt0418279')
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual((ctx.exception.upstream, ctx.exception.retry_after), ('omdb', 3600))
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_async_long_retry_after_is_not_slept(self):
+        self.server.fail_next, self.server.retry_after = 1, 3600
+        service = self.make_service()
+
+        async def details():
+            try:
+                return await service.aget_movie_details('tt0418279')
+            finally:
+                await aclose_async_clients()
+
+        with self.assertRaises(ratelimit.RateLimited) as ctx:
+            asyncio.run(details())
+        self.assertEqual(ctx.exception.upstream, 'omdb')
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_short_retry_after_is_honoured(self):
+        self.server.fail_next, self.server.retry_after = 1, 1
+        started = time.monotonic()
+        self.assertEqual(self.make_service().get_movie_details('tt0418279')['title'], 'Transformers')
+        self.assertGreaterEqual(time.monotonic() - started, 1)
+
+
+@without_shared_limits
+class AutocompleteCacheTests(StubServerMixin, SimpleTestCase):
+    def test_repeat_and_accent_variants_hit_cache(self):
+        service = self.make_service()
+        first = service.search_candidates('Transformers')
+        self.assertEqual(service.search_candidates('  transformers '), first)
+        self.assertEqual(service.search_candidates('Transförmers'), first)
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_longer_query_filters_complete_prefix(self):
+        service = self.make_service()
+        service.search_candidates('transfor')
+        self.assertEqual(service.search_candidates('transformers')[0]['imdbID'], 'tt0418279')
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_negative_results_cached_but_errors_are_not(self):
+        service = self.make_service()
+        self.assertEqual(service.search_candidates('yok'), [])
+        self.assertEqual(service.search_candidates('yok'), [])
+        self.assertEqual(len(self.server.ports), 1)
+
+        self.server.fail_next = 10
+        self.assertEqual(service.search_candidates('optimus'), [])
+        self.server.fail_next = 0
+        self.assertEqual(len(service.search_candidates('optimus')), 1)
+
+    def test_ttl_and_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b', None), None)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('d', 4, ttl=-1)
+        self.assertEqual(cache.get('d', None), None)
+
+
+class PosterProxyTests(StubServerMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(POSTER_CACHE_DIR=tmp.name, POSTER_HOSTS=('127.0.0.1',))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def test_poster_is_fetched_once_and_served_with_long_cache_headers(self):
+        src = f'{self.url}poster/tt1.jpg'
+        url = posters.poster_url(src, 'grid')
+        self.assertTrue(url.startswith('/poster/grid/?src='))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'\xff\xd8\xff'))
+
+        # Diğer varyantlar ve tekrar istekler diskten gelir
+        self.assertEqual(self.client.get(posters.poster_url(src, 'thumb')).status_code, 200)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_variants_are_resized(self):
+        # Pillow requirements.txt'te sabitlenmiş; yüklü değilse test atlanmaz, başarısız olur
+        from PIL import Image
+        response = self.client.get(posters.poster_url(f'{self.url}poster/tt2.jpg', 'thumb'))
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (80, 120))
+
+    def test_original_fallback_is_not_cached_as_immutable(self):
+        src = f'{self.url}poster/tt3.jpg'
+        with mock.patch.object(posters, '_image_module', return_value=None):
+            response = self.client.get(posters.poster_url(src, 'grid'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+        # Varyant üretilince aynı URL uzun süreli (immutable) sunulur
+        response = self.client.get(posters.poster_url(src, 'grid'))
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('grid', response['ETag'])
+
+    def test_unknown_hosts_and_missing_posters(self):
+        self.assertEqual(posters.poster_url('https://example.com/a.jpg', 'grid'), 'https://example.com/a.jpg')
+        self.assertEqual(posters.poster_url('N/A', 'grid'), '')
+        self.assertEqual(self.client.get('/poster/grid/?src=https://example.com/a.jpg').status_code, 404)
+        self.assertEqual(self.client.get(f'/poster/huge/?src={self.url}poster/tt1.jpg').status_code, 404)
+
+        # Kaynak alınamazsa tarayıcı orijinale yönlenir; hata kısa süre önbellekte tutulur
+        src = f'{self.url}poster/missing.jpg'
+        for _ in range(2):
+            response = self.client.get(posters.poster_url(src, 'grid'))
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response['Location'], src)
+        self.assertEqual(len(self.server.ports), 1)
+
+
+class SubtitleStoreTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.settings_override = override_settings(SUBTITLE_STORE_DIR=tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        with open(TEST_SRT, encoding='utf-8') as f:
+            self.raw = f.read()
+
+    def test_round_trip_is_compressed_and_deduplicated(self):
+        a = subtitle_store.save_subtitle('tt1', 'opensubtitles', self.raw, 'en')
+        b = subtitle_store.save_subtitle('tt2', 'subliminal', self.raw, 'en')
+        self.assertEqual(a.sha256, b.sha256)
+        self.assertLess(a.stored_size, a.size / 2)
+
+        entry, text = subtitle_store.find_subtitle('tt1')
+        self.assertEqual(text, self.raw)
+        self.assertEqual(entry.provider, 'opensubtitles')
+        self.assertIsNone(subtitle_store.find_subtitle('tt1', provider='subliminal'))
+
+    def test_prune_keeps_shared_blob_until_last_reference(self):
+        subtitle_store.save_subtitle('tt1', 'opensubtitles', self.raw, 'en')
+        subtitle_store.save_subtitle('tt2', 'opensubtitles', self.raw, 'en')
+
+        call_command('subtitle_store', prune=True, imdb_id='tt1', stdout=io.StringIO())
+        self.assertEqual(subtitle_store.find_subtitle('tt2')[1], self.raw)
+
+        call_command('subtitle_store', prune=True, max_size=0, stdout=io.StringIO())
+        self.assertFalse(StoredSubtitle.objects.exists())
+        self.assertEqual(list(subtitle_store.store_root().glob('objects/*/*.gz')), [])
+
+    def test_analysis_reads_store_before_network(self):
+        subtitle_store.save_subtitle('tt1', 'opensubtitles', self.raw, 'en')
+        Movie.objects.create(imdb_id='tt1', title='Transformers', movie_info={'title': 'Transformers'})
+        episodes = [{'episode': 1, 'start': '00:00:00', 'end': '02:23:00', 'title': 'Tek'}]
+
+        with mock.patch.object(analysis, 'race_providers') as race, \
+                mock.patch.object(analysis, 'AIService') as ai_service:
+            ai_service.return_value.split_movie_into_episodes.return_value = episodes
+            result = analysis.run_analysis('tt1')
+
+        race.assert_not_called()
+        self.assertEqual(result['source'], 'OpenSubtitles (Arşiv)')
+        self.assertEqual(Movie.objects.get(imdb_id='tt1').episode_data, episodes)
+
+    def test_cue_index_is_shared_through_the_store(self):
+        entry = subtitle_store.save_subtitle('tt1', 'opensubtitles', self.raw, 'en')
+        analysis._parse_subtitle('tt1', self.raw, AIService())
+        self.assertTrue(subtitle_store.cues_path(entry.sha256).exists())
+
+        # Başka bir process: önbelleği boş, indeksi diskten okur, altyazıyı ayrıştırmaz
+        transcripts._transcripts.clear()
+        with mock.patch.object(transcripts, 'parse_subtitle') as parse:
+            cues = transcripts.load_cues('tt1')
+        parse.assert_not_called()
+        self.assertEqual(list(cues), list(parse_subtitle(self.raw)))
+
+        call_command('subtitle_store', prune=True, max_size=0, stdout=io.StringIO())
+        self.assertFalse(subtitle_store.cues_path(entry.sha256).exists())
+
+    def test_unreadable_cue_index_is_a_miss(self):
+        entry = subtitle_store.save_subtitle('tt1', 'opensubtitles', self.raw, 'en')
+        cues = parse_subtitle(self.raw)
+        subtitle_store.save_cues(entry.sha256, cues)
+        path = subtitle_store.cues_path(entry.sha256)
+        self.assertEqual(list(subtitle_store.read_cues(entry.sha256)), list(cues))
+
+        data = path.read_bytes()
+        for broken in (data[:len(data) // 2], b'\x80\x05N.', b''):
+            path.write_bytes(broken)
+            self.assertIsNone(subtitle_store.read_cues(entry.sha256))
+
+        # Eski sürümün dosyası indeksli blob'a ait olsa da temizlenir
+        old = path.with_name(f"{entry.sha256}.v1.cues")
+        old.write_bytes(b'eski')
+        self.assertEqual(subtitle_store.orphan_blobs(), [old])
+
+    def test_archive_index_error_does_not_fail_analysis(self):
+        winner = ProviderResult('opensubtitles', self.raw, 'en', 120)
+        with mock.patch.object(subtitle_store.StoredSubtitle.objects, 'update_or_create',
+                               side_effect=IntegrityError('UNIQUE constraint failed')):
+            analysis._archive_winner('tt1', winner)
+        # Savepoint geri alındı; testin transaction'ı kullanılabilir
+        self.assertFalse(StoredSubtitle.objects.exists())
+
+
+class ProviderRaceTests(SimpleTestCase):
+    SRT = "1\n00:00:01,000 --> 00:00:02,000\nMerhaba\n"
+
+    def patch_providers(self, opensubtitles, subliminal):
+        def slow(delay, value):
+            def fetch(*args):
+                time.sleep(delay)
+                return value
+            return fetch
+
+        self.enterContext(mock.patch('movie_app.services.SubtitleService.get_subtitle', side_effect=slow(*opensubtitles)))
+        self.enterContext(mock.patch('movie_app.services.SubtitleService.get_subtitle_alt', side_effect=slow(*subliminal)))
+
+    def test_fastest_valid_provider_wins(self):
+        self.patch_providers(opensubtitles=(0.5, self.SRT), subliminal=(0.05, self.SRT))
+        started = time.monotonic()
+        result = race_providers('tt1', 'Transformers')
+        self.assertEqual(result.provider, 'subliminal')
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertGreaterEqual(result.latency_ms, 50)
+
+    def test_invalid_answer_does_not_win(self):
+        self.patch_providers(opensubtitles=(0.2, self.SRT), subliminal=(0.01, '<html>hata</html>'))
+        self.assertEqual(race_providers('tt1', 'Transformers').provider, 'opensubtitles')
+
+    def test_deadline_is_enforced(self):
+        self.patch_providers(opensubtitles=(1, self.SRT), subliminal=(0.01, None))
+        started = time.monotonic()
+        self.assertIsNone(race_providers('tt1', 'Transformers', deadlines={'opensubtitles': 0.2}))
+        self.assertLess(time.monotonic() - started, 0.6)
+
+    @without_shared_limits
+    def test_loser_skips_the_quota_download(self):
+        requests_made = []
+        searched = threading.Event()
+
+        def request(service, method, url, **kwargs):
+            requests_made.append(method)
+            time.sleep(0.2)
+            searched.set()
+            return mock.Mock(json=lambda: {'data': [{'attributes': {'files': [{'file_id': 1}], 'language': 'tr'}}]})
+
+        self.enterContext(mock.patch('movie_app.services.SubtitleService._request', autospec=True, side_effect=request))
+        self.enterContext(mock.patch('movie_app.services.SubtitleService.get_subtitle_alt', return_value=self.SRT))
+        self.assertEqual(race_providers('tt1', 'Transformers').provider, 'subliminal')
+
+        # Kaybeden OpenSubtitles araması bitti ama kota düşen indirme isteği atılmadı
+        self.assertTrue(searched.wait(1))
+        time.sleep(0.05)
+        self.assertEqual(requests_made, ['GET'])
+
+
+class FakeResponse:
+    def __init__(self, text, prompt_tokens=100, output_tokens=10):
+        self.text = text
+        self.usage_metadata = mock.Mock(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+
+
+def make_ai_service(generate):
+    # Sonuç önbelleği testler arasında taşınmasın
+    cache.clear()
+    with mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'test'}):
+        service = AIService()
+    service.client = mock.Mock()
+    service.client.models.generate_content.side_effect = generate
+    return service
+
+
+@without_shared_limits
+class ChunkedSplitTests(SimpleTestCase):
+    EPISODES = [{"episode": 1, "start": "00:00:00", "end": "02:16:10", "title": "Tek"}]
+
+    def setUp(self):
+        with open(TEST_SRT, encoding='utf-8') as f:
+            self.raw = f.read()
+
+    def test_chunked_mode_maps_windows_then_reduces(self):
+        prompts = []
+
+        def generate(model, contents, config=None):
+            prompts.append(contents)
+            if 'Movie summary:' in contents:
+                return FakeResponse('```json\n' + json.dumps(self.EPISODES) + '\n```')
+            return FakeResponse('- [00:01:00] Olay')
+
+        service = make_ai_service(generate)
+        clean = service.clean_subtitle(self.raw)
+        self.assertEqual(service.split_movie_into_episodes(clean, mode='chunked'), self.EPISODES)
+
+        # 12 dakikalık pencereler + bir reduce çağrısı
+        self.assertEqual(service.usage['calls'], len(prompts))
+        self.assertGreater(len(prompts), 5)
+        self.assertIn('02:16:10', prompts[-1])
+        self.assertEqual(service.usage['prompt_tokens'], 100 * len(prompts))
+
+    def test_single_mode_sends_one_prompt(self):
+        service = make_ai_service(lambda model, contents, config=None: FakeResponse(json.dumps(self.EPISODES)))
+        clean = service.clean_subtitle(self.raw)
+        self.assertEqual(service.split_movie_into_episodes(clean, mode='single'), self.EPISODES)
+        self.assertEqual(service.usage['calls'], 1)
+
+
+@without_shared_limits
+class LocalSplitterTests(SimpleTestCase):
+    def setUp(self):
+        with open(TEST_SRT, encoding='utf-8') as f:
+            self.raw = f.read()
+        self.cues = parse_subtitle(self.raw)
+
+    def assert_valid_episodes(self, episodes, final_ms):
+        self.assertTrue(4 <= len(episodes) <= 8)
+        self.assertEqual(episodes[0]['start'], '00:00:00')
+        self.assertEqual(parse_timestamp(episodes[-1]['end']) // 1000, final_ms // 1000)
+        for i, ep in enumerate(episodes):
+            self.assertEqual(ep['episode'], i + 1)
+            self.assertTrue(ep['title'])
+            length = parse_timestamp(ep['end']) - parse_timestamp(ep['start'])
+            self.assertTrue(20 * 60000 <= length <= 40 * 60000, ep)
+            if i:
+                self.assertEqual(ep['start'], episodes[i - 1]['end'])
+
+    def test_clean_text_and_raw_srt(self):
+        splitter = LocalSplitter()
+        self.assertIsInstance(splitter, EpisodeSplitter)
+        with self.assertRaises(TypeError):
+            EpisodeSplitter()
+        from_clean = splitter.split_movie_into_episodes(self.cues.to_prompt_text())
+        self.assert_valid_episodes(from_clean, self.cues.starts[-1])
+        self.assert_valid_episodes(splitter.split_movie_into_episodes(self.raw), self.cues.duration_ms)
+        # Deterministik
+        self.assertEqual(from_clean, splitter.split_movie_into_episodes(self.cues.to_prompt_text()))
+
+    def test_ai_error_is_recognised(self):
+        service = make_ai_service(mock.Mock(side_effect=RuntimeError('429 quota')))
+        clean = service.clean_subtitle(self.raw)
+        self.assertTrue(is_error_result(service.split_movie_into_episodes(clean)))
+        service.client.models.generate_content.assert_called()
+        self.assertEqual(LocalSplitter().split_movie_into_episodes(''), [])
+
+
+@without_shared_limits
+class LocalFallbackTests(TestCase):
+    def test_analysis_falls_back_to_local_on_ai_error(self):
+        with open(TEST_SRT, encoding='utf-8') as f:
+            raw = f.read()
+        Movie.objects.create(imdb_id='tt1', title='Transformers', movie_info={'title': 'Transformers'})
+        service = make_ai_service(mock.Mock(side_effect=RuntimeError('429 quota')))
+        winner = ProviderResult('opensubtitles', raw, 'en', 120)
+
+        with mock.patch.object(analysis, 'AIService', return_value=service), \
+                mock.patch.object(analysis, 'race_providers', return_value=winner), \
+                mock.patch.object(analysis, 'save_subtitle'):
+            result = analysis.run_analysis('tt1')
+
+        self.assertEqual(result['source'], 'OpenSubtitles · Yerel Bölümleme')
+        self.assertEqual(len(result['episodes']), 5)
+        service.client.models.generate_content.assert_called()
+        # Geçici sonuç kaydedilmez: film sonraki istekte Gemini ile tekrar denenir
+        self.assertEqual(Movie.objects.get(imdb_id='tt1').episode_data, [])
+
+
+class ValidatedResultCacheTests(TestCase):
+    EPISODES = [
+        {"episode": 1, "start": "00:00:00", "end": "00:40:00", "title": "Bir"},
+        {"episode": 2, "start": "00:40:00", "end": "01:20:05", "title": "İki"},
+    ]
+    TEXT = "[00:00:01] Merhaba\n[00:39:59] Orta\n[01:20:05] Son"
+
+    def test_validate_episodes(self):
+        loose = [dict(self.EPISODES[0], episode='1', start='0:00:00'), dict(self.EPISODES[1], end='01:20:05,500')]
+        self.assertEqual(validate_episodes(loose, 80 * 60000 + 5000), self.EPISODES)
+        bad = {
+            'gap': [self.EPISODES[0], dict(self.EPISODES[1], start='00:41:00')],
+            'timestamp': [self.EPISODES[0], dict(self.EPISODES[1], end='???')],
+            'short': [self.EPISODES[0]],
+            'empty': [],
+        }
+        for name, episodes in bad.items():
+            with self.subTest(name), self.assertRaises(InvalidEpisodes):
+                validate_episodes(episodes, 80 * 60000 + 5000)
+
+    def test_invalid_answer_is_retried_then_cached(self):
+        answers = ['```json\n[{"episode": 1, "start": "00:00:00", "end": "00:30:00", "title": "Eksik"}]\n```',
+                   json.dumps(self.EPISODES)]
+        configs = []
+
+        def generate(model, contents, config=None):
+            configs.append(config)
+            return FakeResponse(answers.pop(0))
+
+        service = make_ai_service(generate)
+        self.assertEqual(service.split_movie_into_episodes(self.TEXT, mode='single'), self.EPISODES)
+        self.assertEqual(configs[0].response_schema, services.EPISODE_SCHEMA)
+        self.assertEqual(service.usage['calls'], 2)
+
+        # Aynı altyazı + prompt sürümü + model: Gemini'ye gitmeden önbellekten
+        self.assertEqual(AIService.split_movie_into_episodes(service, self.TEXT, mode='single'), self.EPISODES)
+        self.assertEqual(service.usage['calls'], 2)
+        # Prompt sürümü artınca eski kayıt kullanılmaz
+        with mock.patch.object(services, 'PROMPT_VERSION', services.PROMPT_VERSION + 1):
+            self.assertIsNone(cache.get(service.cache_key(self.TEXT, 'single')))
+
+    def test_failure_is_negative_cached_and_never_saved(self):
+        generate = mock.Mock(side_effect=RuntimeError('503 overloaded'))
+        service = make_ai_service(generate)
+        Movie.objects.create(imdb_id='tt1', title='Film', movie_info={'title': 'Film'})
+        winner = ProviderResult('opensubtitles', "1\n00:00:01,000 --> 00:00:02,000\nMerhaba\n", 'en', 10)
+
+        with mock.patch.object(analysis, 'AIService', return_value=service), \
+                mock.patch.object(analysis, 'race_providers', return_value=winner), \
+                mock.patch.object(analysis, 'save_subtitle'), \
+                mock.patch.object(analysis, 'FALLBACK_SPLITTER', None):
+            for _ in range(2):
+                with self.assertRaises(analysis.AnalysisError) as ctx:
+                    analysis.run_analysis('tt1')
+                self.assertEqual(ctx.exception.status, 503)
+
+        # İlk analizde iki deneme, ikincisi negatif önbellekten
+        self.assertEqual(generate.call_count, services.LLM_ATTEMPTS)
+        movie = Movie.objects.get(imdb_id='tt1')
+        self.assertEqual((movie.episode_data, movie.analysis_status), ([], Movie.PENDING))
+
+        cache.clear()  # Negatif kaydın süresi doldu
+        self.assertTrue(is_error_result(service.split_movie_into_episodes('[00:00:01] Merhaba')))
+        self.assertEqual(generate.call_count, 2 * services.LLM_ATTEMPTS)
+
+
+class EpisodeStreamingTests(TestCase):
+    EPISODES = ValidatedResultCacheTests.EPISODES
+    TEXT = ValidatedResultCacheTests.TEXT
+
+    def test_json_array_stream_any_chunking(self):
+        items = self.EPISODES + [{"episode": 3, "title": "Kaçış \\\" ]} [{", "extra": [1, {"a": 2}]}]
+        text = '```json\n' + json.dumps(items, ensure_ascii=False, indent=2) + '\n```'
+        for size in (1, 5, 64, len(text)):
+            stream, seen = JSONArrayStream(), []
+            for i in range(0, len(text), size):
+                seen.extend(stream.feed(text[i:i + size]))
+            self.assertEqual((seen, stream.done), (items, True))
+
+    def test_streaming_publishes_episodes_as_they_complete(self):
+        text = json.dumps(self.EPISODES)
+        cut = text.index('}, {') + 3
+        service = make_ai_service(None)
+        service.client.models.generate_content_stream.return_value = iter([
+            FakeResponse(text[:cut - 10], output_tokens=0), FakeResponse(text[cut - 10:cut + 5], output_tokens=0),
+            FakeResponse(text[cut + 5:], prompt_tokens=50, output_tokens=20),
+        ])
+        published = []
+        result = service.split_movie_into_episodes(self.TEXT, mode='single', on_episode=published.append)
+
+        self.assertEqual(result, self.EPISODES)
+        self.assertEqual(published, [self.EPISODES[:1], self.EPISODES])
+        self.assertEqual(service.usage, {'calls': 1, 'prompt_tokens': 50, 'output_tokens': 20})
+        service.client.models.generate_content.assert_not_called()
+
+    def test_publish_failure_does_not_fail_gemini(self):
+        service = make_ai_service(None)
+        service.client.models.generate_content_stream.return_value = iter([FakeResponse(json.dumps(self.EPISODES))])
+        result = service.split_movie_into_episodes(self.TEXT, mode='single',
+                                                   on_episode=mock.Mock(side_effect=OperationalError('locked')))
+        self.assertEqual(result, self.EPISODES)
+        self.assertEqual(service.usage['calls'], 1)
+
+    def test_stream_poll_backs_off_while_idle(self):
+        job = AnalysisJob.objects.create(imdb_id='tt1', status=AnalysisJob.RUNNING)
+        flow = jobs._stream_flow(job.id)
+        self.assertEqual(flow.send(None).func, jobs._stream_state)
+        self.assertIn('event: status', flow.send(job))
+        intervals = [flow.send(None).args[0]]
+        for _ in range(4):
+            self.assertEqual(flow.send(None).func, jobs._stream_state)
+            intervals.append(flow.send(job).args[0])
+        self.assertEqual(intervals, [0.25, 0.5, 1.0, 2.0, 2.0])
+
+        # Yeni bölüm gelince aralık başa döner
+        flow.send(None)
+        job.partial = self.EPISODES[:1]
+        self.assertIn('event: episode', flow.send(job))
+        self.assertEqual(flow.send(None).args[0], jobs.STREAM_POLL_INTERVAL)
+
+    def test_stream_endpoint_sends_partial_then_final(self):
+        job = AnalysisJob.objects.create(imdb_id='tt1')
+        payload = {'source': 'OpenSubtitles', 'episodes': self.EPISODES, 'movie_info': {}}
+
+        def fake_analyze(imdb_id, on_episode=None):
+            on_episode(self.EPISODES[:1])
+            self.assertEqual(AnalysisJob.objects.get(id=job.id).partial, self.EPISODES[:1])
+            on_episode(self.EPISODES)
+            return payload
+
+        with mock.patch.object(jobs, 'analyze_single_flight', side_effect=fake_analyze):
+            jobs.execute_job(job.id)
+
+        response = self.client.get(f'/analyze/stream/{job.id}/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        events = [block.split('\n')[0][len('event: '):] for block in body.strip().split('\n\n')]
+        self.assertEqual(events, ['status', 'episode', 'episode', 'done'])
+        self.assertEqual(json.loads(body.split('event: done\ndata: ')[1])['episodes'], self.EPISODES)
+
+        # Yeniden deneme: gönderilenlerle uyuşmayan liste önce 'reset'
+        state = {'status': AnalysisJob.RUNNING, 'sent': self.EPISODES}
+        retry = AnalysisJob(status=AnalysisJob.RUNNING, partial=[dict(self.EPISODES[0], title='Yeni')])
+        messages, finished = jobs.job_events(retry, state)
+        self.assertEqual([m.split('\n')[0] for m in messages], ['event: reset', 'event: episode'])
+        self.assertFalse(finished)
+        self.assertEqual(self.client.get('/analyze/stream/999/').status_code, 404)
+
+
+class PrewarmTests(TransactionTestCase):
+    def test_prewarm_resumes_from_checkpoint(self):
+        from .management.commands import prewarm
+        for name in ('omdb', 'opensubtitles', 'subliminal', 'gemini'):
+            self.addCleanup(ratelimit.configure, name, None)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ids_path = os.path.join(tmp.name, 'ids.txt')
+        checkpoint = os.path.join(tmp.name, 'prewarm.checkpoint')
+        with open(ids_path, 'w') as f:
+            f.write("tt0000001\n# yorum\ntt0000002,Foo\n{\"imdb_id\": \"tt0000003\"}\ntt0000001\n")
+
+        analyzed = []
+
+        def fake_analyze(imdb_id):
+            analyzed.append(imdb_id)
+            if imdb_id == 'tt0000003':
+                raise analysis.AnalysisError('Altyazı yok', status=404)
+            movie = Movie.objects.get(imdb_id=imdb_id)
+            movie.episode_data = [{'episode': 1}]
+            movie.save()
+            return {'source': 'OpenSubtitles'}
+
+        def details(imdb_id):
+            return {'title': f'Film {imdb_id}', 'year': '2007', 'poster': 'N/A'}
+
+        with mock.patch('movie_app.services.MovieInfoService.get_movie_details', side_effect=details), \
+                mock.patch('movie_app.management.commands.prewarm.analyze_single_flight', side_effect=fake_analyze):
+            # Test veritabanı paylaşımlı bellek içi SQLite; eşzamanlı yazmalarda "table is locked" verir
+            call_command('prewarm', ids_path, checkpoint=checkpoint, concurrency=1, stdout=io.StringIO())
+            self.assertEqual(sorted(analyzed), ['tt0000001', 'tt0000002', 'tt0000003'])
+            self.assertEqual(prewarm.load_checkpoint(checkpoint), {'tt0000001', 'tt0000002'})
+
+            # İkinci çalıştırma sadece başarısız olanı tekrar dener
+            analyzed.clear()
+            call_command('prewarm', ids_path, checkpoint=checkpoint, stdout=io.StringIO())
+            self.assertEqual(analyzed, ['tt0000003'])
+
+        self.assertEqual(Movie.objects.filter(analysis_status=Movie.DONE).count(), 2)
+
+    @without_shared_limits
+    def test_local_fallback_result_is_not_checkpointed_as_done(self):
+        from .management.commands import prewarm
+        tmp = self.enterContext(tempfile.TemporaryDirectory())
+        checkpoint, ids_path = os.path.join(tmp, 'prewarm.checkpoint'), os.path.join(tmp, 'ids.txt')
+        with open(ids_path, 'w') as f:
+            f.write('tt0000001\n')
+        with open(TEST_SRT, encoding='utf-8') as f:
+            winner = ProviderResult('opensubtitles', f.read(), 'en', 120)
+        Movie.objects.create(imdb_id='tt0000001', title='Transformers', movie_info={'title': 'Transformers'})
+        service = make_ai_service(mock.Mock(side_effect=RuntimeError('503 overloaded')))
+
+        with mock.patch.object(analysis, 'AIService', return_value=service), \
+                mock.patch.object(analysis, 'race_providers', return_value=winner), \
+                mock.patch.object(analysis, 'save_subtitle'):
+            out = io.StringIO()
+            call_command('prewarm', ids_path, checkpoint=checkpoint, concurrency=1, stdout=out,
+                         omdb_rps=0, opensubtitles_rps=0, subliminal_rps=0, gemini_rps=0)
+
+        self.assertIn('0 done, 1 failed', out.getvalue())
+        self.assertEqual(prewarm.load_checkpoint(checkpoint), set())
+        self.assertNotEqual(Movie.objects.get(imdb_id='tt0000001').analysis_status, Movie.DONE)
+
+    def test_rate_limiter_spaces_calls(self):
+        limiter = ratelimit.RateLimiter(rate=20)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+
+class ConcurrentRateLimitTests(TransactionTestCase):
+    @override_settings(UPSTREAM_LIMITS={'omdb': {'rate': 1000, 'burst': 1000}})
+    def test_concurrent_takes_do_not_fail_open(self):
+        # Aynı kovayı eşzamanlı kullanan thread'ler kilit hatasıyla sınırı atlamamalı
+        metrics.reset()
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(10):
+                    ratelimit.acquire('omdb')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        with mock.patch('builtins.print'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertNotIn('ratelimit_errors_total', metrics.render())
+        self.assertEqual(UpstreamBucket.objects.get(name='omdb').version, 80)
+
+
+class SharedRateLimitTests(TestCase):
+    # Saniyede 0.001 jeton: test süresince kova dolmaz
+    SPEC = {'rate': 0.001, 'burst': 4, 'daily': 10}
+
+    def test_bulk_leaves_reserve_for_interactive_calls(self):
+        self.assertEqual(ratelimit.take('omdb', self.SPEC, ratelimit.BULK), (True, 0.0))
+        taken, wait = ratelimit.take('omdb', self.SPEC, ratelimit.BULK)
+        self.assertEqual((taken, wait > 0), (True, False))
+        # Rezerv (burst'ün yarısı) etkileşimli isteklere kaldı: toplu iş jeton almadan bekler
+        taken, wait = ratelimit.take('omdb', self.SPEC, ratelimit.BULK)
+        self.assertFalse(taken)
+        self.assertGreater(wait, 0)
+        self.assertEqual(ratelimit.take('omdb', self.SPEC), (True, 0.0))
+        self.assertEqual(ratelimit.take('omdb', self.SPEC), (True, 0.0))
+
+        # Kova boş: sıradaki etkileşimli çağrı beklemek yerine retry_after alır
+        with self.assertRaises(ratelimit.RateLimited) as ctx:
+            ratelimit.take('omdb', self.SPEC)
+        self.assertFalse(ctx.exception.quota)
+        self.assertGreater(ctx.exception.retry_after, ratelimit.INTERACTIVE_MAX_WAIT)
+
+    def test_daily_quota_is_shared_and_bulk_gets_a_share(self):
+        spec = {'daily': 10}
+        for _ in range(8):
+            ratelimit.take('opensubtitles_download', spec, ratelimit.BULK)
+        with self.assertRaises(ratelimit.RateLimited) as ctx:
+            ratelimit.take('opensubtitles_download', spec, ratelimit.BULK)
+        self.assertTrue(ctx.exception.quota)
+
+        # Sayaç DB'de: başka bir worker da aynı kullanımı görür
+        bucket = UpstreamBucket.objects.get(name='opensubtitles_download')
+        self.assertEqual(bucket.used, 8)
+        ratelimit.take('opensubtitles_download', spec)
+        ratelimit.take('opensubtitles_download', spec)
+        with self.assertRaises(ratelimit.RateLimited):
+            ratelimit.take('opensubtitles_download', spec)
+
+    def test_limiter_db_error_lets_the_call_through(self):
+        # Kilitli tablo upstream hatası sayılıp önbelleğe yazılmamalı
+        locked = OperationalError('database table is locked')
+        cases = ValidatedResultCacheTests
+        service = make_ai_service(lambda **kwargs: FakeResponse(json.dumps(cases.EPISODES)))
+        with override_settings(UPSTREAM_LIMITS={'gemini': {'rate': 1, 'burst': 1}}), \
+                mock.patch.object(ratelimit, 'take', side_effect=locked):
+            self.assertEqual(service.split_movie_into_episodes(cases.TEXT, mode='single'), cases.EPISODES)
+            asyncio.run(ratelimit.aacquire('gemini'))
+        service.client.models.generate_content.assert_called_once()
+        # Savepoint sayesinde testin transaction'ı kullanılabilir kaldı
+        self.assertFalse(UpstreamBucket.objects.exists())
+
+    def test_autocomplete_and_failed_job_report_retry_after(self):
+        error = ratelimit.RateLimited('omdb', 42)
+        with mock.patch('movie_app.views.autocomplete', side_effect=error):
+            response = self.client.get('/autocomplete/?q=matrix')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '42')
+        self.assertEqual(response.json()['results'], [])
+
+        job = AnalysisJob.objects.create(imdb_id='tt1')
+        with mock.patch('movie_app.jobs.analyze_single_flight', side_effect=error):
+            jobs.execute_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.error_status, 429)
+        self.assertEqual(jobs.job_payload(job)['retry_after'], 42)
+
+
+class FeaturedPoolTests(TestCase):
+    def setUp(self):
+        featured.invalidate_pool()
+        for i in range(20):
+            Movie.objects.create(imdb_id=f'tt{i:07d}', title=f'Film {i}',
+                                 movie_info={'poster': 'N/A' if i % 2 else 'http://img/p.jpg', 'year': '2007'},
+                                 episode_data=[{'episode': 1}] * (i % 3))
+
+    def test_index_uses_cached_pool_without_queries(self):
+        self.client.get('/')
+        # Sayfa önbelleğini atla ki havuzun kendisi test edilsin
+        featured.cache.delete(response_cache.INDEX_KEY)
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        movies = response.context['movies']
+        self.assertEqual(len(movies), 12)
+        self.assertEqual(len({m['slug'] for m in movies}), 12)
+        self.assertNotIn('src="N/A"', response.content.decode())
+
+    def test_only_new_movies_invalidate_pool(self):
+        self.assertEqual(len(featured.refresh_pool()), 20)
+        Movie.objects.create(imdb_id='tt9999999', title='Yeni Film')
+        self.assertIsNone(featured.cache.get(featured.POOL_KEY))
+        self.assertEqual(len(featured.refresh_pool()), 21)
+
+        # Güncelleme (ör. analiz sonucu yazımı) havuzu düşürmez
+        movie = Movie.objects.get(imdb_id='tt9999999')
+        movie.episode_data = [{'episode': 1}]
+        movie.save()
+        self.assertIsNotNone(featured.cache.get(featured.POOL_KEY))
+
+    def test_large_table_is_sampled_by_pk_range(self):
+        with CaptureQueriesContext(connection) as queries:
+            pool = featured.build_pool(size=5)
+        self.assertTrue(1 <= len(pool) <= 5)
+        self.assertLessEqual(len(queries), 1 + featured.MAX_SAMPLE_ROUNDS)
+        self.assertNotIn('RANDOM', " ".join(q['sql'] for q in queries).upper())
+
+
+class MovieDenormalizedFieldsTests(TestCase):
+    def test_save_keeps_columns_in_sync(self):
+        movie = Movie.objects.create(imdb_id='tt1', title='Matrix', movie_info={'poster': 'N/A', 'year': '1999'})
+        self.assertEqual((movie.analysis_status, movie.poster_url, movie.year), (Movie.PENDING, '', '1999'))
+        self.assertIsNone(analysis.analyzed_movie('tt1'))
+
+        movie.episode_data = [{'episode': 1}, {'episode': 2}]
+        movie.save(update_fields=['episode_data'])
+        movie.refresh_from_db()
+        self.assertEqual((movie.analysis_status, movie.episode_count), (Movie.DONE, 2))
+        self.assertIsNotNone(movie.analyzed_at)
+        self.assertEqual(analysis.analyzed_movie('tt1').episode_data, movie.episode_data)
+
+        movie.episode_data = [{'episode': 1, 'title': 'Analiz Hatası: 429', 'start': '00:00:00', 'end': '???'}]
+        movie.save()
+        self.assertEqual(movie.analysis_status, Movie.FAILED)
+
+    def test_bench_command_runs_on_small_table(self):
+        # Komut kendi geçici DB'sini kurar; test DB'sinin içinden değil ayrı process'te çalışır
+        output = subprocess.run(
+            [sys.executable, 'manage.py', 'bench_movies', '--rows', '300', '--repeat', '1'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env=dict(os.environ, DJANGO_CACHE_DIR=settings.CACHES['default']['LOCATION']))
+        self.assertIn('analysis_status', output.stdout)
+        self.assertFalse(Movie.objects.filter(imdb_id__startswith='bench').exists())
+
+
+class CatalogImportTests(TestCase):
+    ROWS = [
+        {'imdbID': 'tt0133093', 'Title': 'Matrix', 'Year': '1999', 'Poster': 'N/A'},
+        {'imdbID': 'tt0234215', 'Title': 'Matrix'},
+        {'imdbID': 'tt0111161', 'Title': 'Şehir Işıkları'},
+        {'imdbID': 'tt0111162', 'Title': 'Sehir Isiklari'},
+        {'imdbID': 'tt0133093', 'Title': 'The Matrix'},
+        {'imdbID': 'tt0000002', 'Title': 'Dune: Part One', 'Year': '2021'},
+        {'imdbID': 'tt0242653', 'Title': 'matrix'},
+        {'imdbID': 'bad', 'Title': 'Geçersiz'},
+    ]
+
+    def setUp(self):
+        Movie.objects.create(imdb_id='tt0000001', title='Matrix')
+        Movie.objects.create(imdb_id='tt0000002', title='Dune')
+
+    def sequential_slugs(self):
+        """Aynı satırlar tek tek save() edilseydi oluşacak slug'lar (sonra geri alınır)."""
+        savepoint = transaction.savepoint()
+        for row in self.ROWS:
+            normalized = catalog.normalize(row)
+            if normalized is None:
+                continue
+            imdb_id, info = normalized
+            movie, _ = Movie.objects.get_or_create(imdb_id=imdb_id, defaults={'title': info['title']})
+            if not movie.movie_info:
+                movie.movie_info = info
+                movie.save()
+        slugs = dict(Movie.objects.values_list('imdb_id', 'slug'))
+        transaction.savepoint_rollback(savepoint)
+        return slugs
+
+    def test_bulk_slugs_match_save_across_chunks(self):
+        expected = self.sequential_slugs()
+        self.assertEqual(expected['tt0234215'], 'matrix-tt0234215')
+
+        for chunk_size in (1, 3, 100):
+            savepoint = transaction.savepoint()
+            importer = catalog.CatalogImporter(chunk_size=chunk_size)
+            importer.run(iter(self.ROWS))
+            self.assertEqual(dict(Movie.objects.values_list('imdb_id', 'slug')), expected)
+            self.assertEqual(importer.counts, {'created': 5, 'updated': 1, 'skipped': 1, 'invalid': 1, 'failed': 0})
+            dune = Movie.objects.get(imdb_id='tt0000002')
+            self.assertEqual((dune.title, dune.year), ('Dune', '2021'))
+            transaction.savepoint_rollback(savepoint)
+
+    def test_taken_fallback_slug_fails_only_that_row(self):
+        Movie.objects.create(imdb_id='tt0000003', title='Heat', slug='heat')
+        Movie.objects.create(imdb_id='tt0000004', title='Başka', slug='heat-tt0113277')
+        importer = catalog.CatalogImporter()
+        importer.run(iter([{'imdbID': 'tt0113277', 'Title': 'Heat'}, {'imdbID': 'tt0113278', 'Title': 'Heat'}]))
+        self.assertEqual(importer.counts['failed'], 1)
+        self.assertFalse(Movie.objects.filter(imdb_id='tt0113277').exists())
+        self.assertEqual(Movie.objects.get(imdb_id='tt0113278').slug, 'heat-tt0113278')
+
+    def test_command_streams_csv_and_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'catalog.csv')
+            call_command('import_catalog', generate=50, write_file=csv_path, stdout=io.StringIO())
+            out = io.StringIO()
+            call_command('import_catalog', csv_path, chunk_size=7, stdout=out)
+            self.assertIn('50 created', out.getvalue())
+
+            jsonl_path = os.path.join(tmp, 'catalog.jsonl')
+            with open(jsonl_path, 'w', encoding='utf-8') as f:
+                f.write('{"imdb_id": "tt0000001", "title": "Matrix", "plot": "Yeni"}\nbozuk satır\n')
+            out = io.StringIO()
+            call_command('import_catalog', jsonl_path, update=True, stdout=out)
+            self.assertIn('1 updated', out.getvalue())
+            self.assertIn('1 invalid', out.getvalue())
+        self.assertEqual(Movie.objects.get(imdb_id='tt0000001').movie_info['plot'], 'Yeni')
+        self.assertEqual(Movie.objects.count(), 52)
+
+    def test_command_needs_source_or_generate(self):
+        with self.assertRaisesMessage(CommandError, 'Give either a source file or --generate N'):
+            call_command('import_catalog', stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, '--write-file needs --generate N'):
+            call_command('import_catalog', 'catalog.csv', write_file='out.csv', stdout=io.StringIO())
+        self.assertEqual(Movie.objects.count(), 2)
+
+    def test_import_outdates_search_index_of_other_processes(self):
+        other = SearchIndex()  # Başka bir web process'inin indeksi
+        other.build()
+        other._checked_at = 0
+        self.assertFalse(other._outdated())
+
+        call_command('import_catalog', generate=3, stdout=io.StringIO())
+        self.assertFalse(other._outdated())  # Kontrol aralığı henüz dolmadı
+        other._checked_at = 0
+        self.assertTrue(other._outdated())
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        featured.cache.clear()
+        self.movie = Movie.objects.create(
+            imdb_id='tt0418279', title='Transformers', movie_info={'title': 'Transformers', 'year': '2007'},
+            episode_data=[{'episode': 1, 'title': 'Giriş', 'start': '00:00:00', 'end': '00:30:00'}],
+        )
+
+    def test_detail_page_served_from_cache_with_conditional_get(self):
+        first = self.client.get('/transformers/')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/transformers/')
+        self.assertIsNone(second.context)
+        self.assertEqual(second.content, first.content)
+
+        not_modified = self.client.get('/transformers/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        # Doldurma zamanı Last-Modified olarak sunulmaz; doğrulama yalnızca ETag ile
+        self.assertFalse(first.has_header('Last-Modified'))
+        future = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(self.client.get('/transformers/', HTTP_IF_MODIFIED_SINCE=future).status_code, 200)
+
+    def test_analyze_cache_invalidated_on_save(self):
+        first = self.client.get('/analyze/', {'imdb_id': 'tt0418279'})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/analyze/', {'imdb_id': 'tt0418279'}).content, first.content)
+
+        self.movie.episode_data = self.movie.episode_data * 2
+        self.movie.save()
+        changed = self.client.get('/analyze/', {'imdb_id': 'tt0418279'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()['episodes']), 2)
+
+    def test_invalidation_reaches_other_processes_and_old_slug(self):
+        self.client.get('/transformers/')
+        self.assertIsNotNone(featured.cache.get(response_cache.detail_key('transformers')))
+        # run_worker gibi ayrı bir process'in kaydı: aynı önbellek dizinini görür
+        code = ("import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings'); django.setup(); "
+                "from types import SimpleNamespace; from movie_app.response_cache import invalidate_movie; "
+                "invalidate_movie(SimpleNamespace(imdb_id='tt0418279', slug='transformers'))")
+        subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, check=True, env=dict(
+            os.environ, PYTHONPATH=str(settings.BASE_DIR), DJANGO_CACHE_DIR=settings.CACHES['default']['LOCATION']))
+        self.assertIsNone(featured.cache.get(response_cache.detail_key('transformers')))
+
+        self.client.get('/transformers/')
+        self.assertIsNotNone(featured.cache.get(response_cache.detail_key('transformers')))
+        movie = Movie.objects.get(imdb_id='tt0418279')
+        movie.slug = 'transformers-2007'
+        movie.save()
+        self.assertIsNone(featured.cache.get(response_cache.detail_key('transformers')))
+
+    def test_pending_analysis_is_not_cached(self):
+        Movie.objects.create(imdb_id='tt0000001', title='Yeni Film')
+        self.assertEqual(self.client.get('/analyze/', {'imdb_id': 'tt0000001'}).status_code, 202)
+        self.assertIsNone(featured.cache.get(response_cache.analyze_key('tt0000001')))
+
+
+class LocalSearchIndexTests(TestCase):
+    def setUp(self):
+        local_index.clear()
+        Movie.objects.create(imdb_id='tt0211915', title='Amélie', movie_info={
+            'year': '2001', 'poster': 'http://img/amelie.jpg',
+            'aka_titles': ["Le Fabuleux Destin d'Amélie Poulain"],
+        })
+        Movie.objects.create(imdb_id='tt0120737', title='Yüzüklerin Efendisi: Yüzük Kardeşliği',
+                             movie_info={'year': '2001'})
+
+    def test_accent_insensitive_prefix_and_aka_titles(self):
+        self.assertEqual(local_index.search('amelie'), [
+            {'Title': 'Amélie', 'Year': '2001', 'imdbID': 'tt0211915', 'Type': 'movie', 'Poster': 'http://img/amelie.jpg'},
+        ])
+        self.assertEqual(local_index.search('fabuleux dest')[0]['imdbID'], 'tt0211915')
+        self.assertEqual(local_index.search('YUZUK kard')[0]['Poster'], 'N/A')
+        self.assertEqual(local_index.search('yuzuk matrix'), [])
+
+    def test_saved_movie_is_indexed_without_rebuild(self):
+        local_index.search('amelie')
+        Movie.objects.create(imdb_id='tt0133093', title='The Matrix')
+        with self.assertNumQueries(0):
+            self.assertEqual(local_index.search('matr')[0]['imdbID'], 'tt0133093')
+
+    def test_deferred_movie_info_keeps_aka_titles(self):
+        local_index.search('amelie')
+        movie = Movie.objects.only('imdb_id', 'title', 'year', 'poster_url').get(imdb_id='tt0211915')
+        movie.title = 'Amélie (2001)'
+        local_index.update_movie(movie)
+        self.assertNotIn('movie_info', movie.__dict__)
+        self.assertEqual(local_index.search('fabuleux')[0]['Title'], 'Amélie (2001)')
+
+    def test_concurrent_first_searches_build_once(self):
+        builds = []
+
+        def slow_build():
+            builds.append(1)
+            time.sleep(0.1)
+            local_index.built_at = time.monotonic()
+
+        with mock.patch.object(local_index, 'build', side_effect=slow_build):
+            threads = [threading.Thread(target=local_index.search, args=('amelie',)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(builds), 1)
+
+    @mock.patch.object(MovieInfoService, 'search_candidates')
+    def test_view_merges_omdb_only_when_local_hits_are_few(self, remote):
+        remote.return_value = [
+            {'Title': 'Amélie', 'Year': '2001', 'imdbID': 'tt0211915', 'Type': 'movie', 'Poster': 'N/A'},
+            {'Title': 'Amelie Rose', 'Year': '2005', 'imdbID': 'tt9', 'Type': 'movie', 'Poster': 'N/A'},
+        ]
+        results = self.client.get('/autocomplete/', {'q': 'amel'}).json()['results']
+        self.assertEqual([r['imdbID'] for r in results], ['tt0211915', 'tt9'])
+
+        for i in range(3):
+            Movie.objects.create(imdb_id=f'tt100000{i}', title=f'Matrix {i}')
+        remote.reset_mock()
+        results = self.client.get('/autocomplete/', {'q': 'matrix'}).json()['results']
+        self.assertEqual(len(results), 3)
+        remote.assert_not_called()
+
+
+class AsyncPathTests(StubServerMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        local_index.clear()
+        self.enterContext(mock.patch.dict(os.environ, {'OMDB_API_KEY': 'test', 'OMDB_BASE_URL': self.url}))
+
+    @override_settings(ROOT_URLCONF='core.asgi_urls')
+    async def test_async_views_share_results_with_sync_views(self):
+        response = await self.async_client.get('/autocomplete/', {'q': 'transformers'})
+        self.assertEqual(response.json()['results'][0]['imdbID'], 'tt0418279')
+
+        await Movie.objects.acreate(imdb_id='tt0418279', title='Transformers', episode_data=[{'episode': 1}])
+        response = await self.async_client.get('/analyze/', {'imdb_id': 'tt0418279'})
+        self.assertEqual(response.json()['episodes'], [{'episode': 1}])
+        response = await self.async_client.get('/analyze/', {'imdb_id': 'tt0000001'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(await AnalysisJob.objects.acount(), 1)
+
+    def test_async_worker_runs_queued_jobs(self):
+        AnalysisJob.objects.create(imdb_id='tt1')
+        AnalysisJob.objects.create(imdb_id='tt2')
+        result = {'source': 'OpenSubtitles', 'episodes': [{'episode': 1}]}
+        with mock.patch('movie_app.jobs.aanalyze_with_lease', new=mock.AsyncMock(return_value=result)):
+            call_command('run_worker', mode='async', once=True, concurrency=2, stdout=io.StringIO())
+        self.assertEqual(set(AnalysisJob.objects.values_list('status', flat=True)), {AnalysisJob.DONE})
+
+
+@without_shared_limits
+class AsyncServiceTests(SimpleTestCase):
+    SRT = "1\n00:00:01,000 --> 00:00:02,000\nMerhaba\n"
+
+    async def test_chunked_split_bounds_gemini_concurrency(self):
+        with open(TEST_SRT, encoding='utf-8') as f:
+            text = parse_subtitle(f.read()).to_prompt_text()
+        active, peak = 0, 0
+        episodes = '[{"episode": 1, "start": "00:00:00", "end": "02:16:10", "title": "Tek"}]'
+
+        async def generate(model, contents, config=None):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return FakeResponse(episodes if 'Movie summary' in contents else '- [00:00:10] olay')
+
+        service = make_ai_service(None)
+        service.client.aio.models.generate_content = generate
+        with mock.patch.dict(ratelimit.CONCURRENCY, {'gemini': 2}):
+            result = await service.asplit_movie_into_episodes(text, mode='chunked')
+        self.assertEqual(result[0]['title'], 'Tek')
+        self.assertEqual(peak, 2)
+        self.assertGreater(service.usage['calls'], 3)
+
+    async def test_async_race_cancels_slow_provider(self):
+        def slow(delay, value):
+            async def fetch(*args):
+                await asyncio.sleep(delay)
+                return value
+            return fetch
+
+        with mock.patch.object(services.SubtitleService, 'aget_subtitle', side_effect=slow(1, self.SRT)), \
+                mock.patch.object(services.SubtitleService, 'aget_subtitle_alt', side_effect=slow(0.02, self.SRT)):
+            started = time.monotonic()
+            result = await arace_providers('tt1', 'Transformers')
+        self.assertEqual(result.provider, 'subliminal')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    async def test_async_split_retries_and_caches_like_sync(self):
+        answers = ['[{"episode": 1, "start": "00:00:05", "end": "00:00:02", "title": "Bozuk"}]',
+                   '[{"episode": 1, "start": "00:00:00", "end": "00:00:02", "title": "Tek"}]']
+
+        async def generate(model, contents, config=None):
+            return FakeResponse(answers.pop(0))
+
+        service = make_ai_service(None)
+        service.client.aio.models.generate_content = generate
+        text = parse_subtitle(self.SRT).to_prompt_text()
+        # Ortak akış: geçersiz cevap tekrar denenir, geçerli sonuç önbellekten döner
+        self.assertEqual((await service.asplit_movie_into_episodes(text, mode='single'))[0]['title'], 'Tek')
+        self.assertEqual(service.usage['calls'], 2)
+        self.assertEqual(service.split_movie_into_episodes(text, mode='single')[0]['title'], 'Tek')
+        self.assertEqual(service.usage['calls'], 2)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        featured.cache.clear()
+
+    def test_stages_and_cache_hits_exposed(self):
+        Movie.objects.create(imdb_id='tt1', title='Film', episode_data=[{'episode': 1}])
+        response = self.client.get('/analyze/', {'imdb_id': 'tt1'})
+        self.assertRegex(response['Server-Timing'], r'^db_read;dur=[\d.]+, total;dur=[\d.]+$')
+        self.client.get('/analyze/', {'imdb_id': 'tt2'})
+
+        with override_settings(METRICS_TOKEN='secret'):
+            text = self.client.get('/metrics/', headers={'Authorization': 'Bearer secret'}).content.decode()
+        self.assertIn('movie_cache_requests_total{cache="analysis_db",result="hit"} 1', text)
+        self.assertIn('movie_cache_requests_total{cache="analysis_db",result="miss"} 1', text)
+        self.assertIn('movie_stage_seconds_count{stage="view:analyze"} 2', text)
+        self.assertIn('movie_stage_seconds_bucket{stage="db_read",le="+Inf"} 2', text)
+
+    def test_gemini_tokens_counted(self):
+        episodes = '[{"episode": 1, "start": "00:00:00", "end": "00:00:01", "title": "Tek"}]'
+        service = make_ai_service(lambda **kwargs: FakeResponse(episodes, prompt_tokens=120, output_tokens=7))
+        service.split_movie_into_episodes('[00:00:01] Merhaba', mode='single')
+        text = metrics.render()
+        self.assertIn('movie_gemini_tokens_total{kind="prompt"} 120', text)
+        self.assertIn('movie_gemini_tokens_total{kind="output"} 7', text)
+        self.assertIn('movie_stage_seconds_count{stage="gemini"} 1', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_require_token_or_staff(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', headers={'Authorization': 'Bearer yanlis'}).status_code, 403)
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user('ops', is_staff=True))
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_worker_endpoint_serves_process_metrics(self):
+        # Process havuzundaki işin metrikleri sonuçla ana process'e taşınır
+        metrics.inc('gemini_calls_total', 3)
+        collected = metrics.drain()
+        self.assertNotIn('gemini_calls_total', metrics.render())
+        metrics.merge(collected)
+        metrics.merge(collected)
+
+        server = metrics.start_http_server(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/metrics'
+        session = build_session(retries=0)
+        self.assertEqual(session.get(url).status_code, 403)
+        response = session.get(url, headers={'Authorization': 'Bearer secret'})
+        self.assertIn('movie_gemini_calls_total{} 6', response.text)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_records_nothing(self):
+        response = self.client.get('/analyze/', {'imdb_id': 'tt2'})
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics.render(), '# TYPE movie_stage_seconds histogram\n')
+
+
+class ReplayHarnessTests(TransactionTestCase):
+    def test_read_and_generate_log(self):
+        entries = replay.read_log([
+            '# yorum\n', '\n', '{"path": "/autocomplete/?q=matrix", "at": 0.5}\n', '{"url": "/", "method": "head"}\n',
+        ])
+        self.assertEqual(entries, [replay.LogEntry('GET', '/autocomplete/?q=matrix', 0.5), replay.LogEntry('HEAD', '/', None)])
+
+        paths = [r['path'] for r in replay.generate_log(80, seed=1)]
+        self.assertEqual(len(paths), 80)
+        for i, path in enumerate(paths):
+            if path.startswith('/analyze/'):
+                self.assertIn(f"/open/{path.rsplit('=', 1)[1]}/", paths[:i])
+
+    def test_replay_against_stubs_reports_endpoints_and_upstream_calls(self):
+        servers, env = stubs.start_stubs(latency={'omdb': 0.01})
+        for server in servers.values():
+            self.addCleanup(server.stop)
+        self.enterContext(mock.patch.dict(os.environ, env))
+        services._search_cache.clear()
+        local_index.clear()
+        entries = replay.read_log(json.dumps(r) for r in replay.generate_log(30, seed=2))
+
+        rows, elapsed = replay.Replayer(entries, concurrency=1, workers=0).run()
+        by_endpoint = {row['endpoint']: row for row in rows}
+        self.assertEqual(sum(row['count'] for row in rows), 30)
+        self.assertEqual({'autocomplete', 'open_movie', 'analyze'} - set(by_endpoint), set())
+        self.assertEqual(sum(row['errors'] for row in rows), 0)
+        self.assertGreaterEqual(by_endpoint['open_movie']['p99_ms'], by_endpoint['open_movie']['p50_ms'])
+        self.assertGreater(servers['omdb'].calls, 0)
+        self.assertEqual(servers['gemini'].calls, 0)
+
+    def test_injected_errors_are_retried_and_counted(self):
+        server = stubs.StubServer(stubs.StubOMDbHandler, error_rate=1.0).start()
+        self.addCleanup(server.stop)
+        service = MovieInfoService()
+        service.api_key, service.base_url = 'test', server.url
+        service.session = build_session(backoff=0)
+        self.assertIsNone(service.get_movie_details('tt1'))
+        self.assertEqual((server.calls, server.errors), (4, 4))
+
+    @override_settings(ANALYSIS_TEST_MODE=True)
+    def test_test_mode_is_a_setting(self):
+        Movie.objects.create(imdb_id='tt1', title='Transformers', movie_info={'title': 'Transformers'})
+        service = make_ai_service(lambda **kwargs: FakeResponse('[{"episode": 1, "start": "00:00:00", "end": "02:16:10", "title": "Tek"}]'))
+        with mock.patch.object(analysis, 'AIService', return_value=service), \
+                mock.patch.object(analysis, 'race_providers') as race:
+            result = analysis.run_analysis('tt1')
+        self.assertEqual(result['source'], 'Yerel Test Dosyası')
+        race.assert_not_called()
+
+
+class LazyRegistryTests(SimpleTestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_startup_does_not_import_heavy_sdks(self):
+        code = ("import os, sys, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings'); "
+                "django.setup(); import core.urls, movie_app.jobs; "
+                "print(sorted(m for m in ('google.genai', 'subliminal', 'babelfish') if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True,
+                                text=True, check=True, env=dict(os.environ, PYTHONPATH=str(settings.BASE_DIR)))
+        self.assertEqual(output.stdout.strip(), '[]')
+
+    def test_clients_are_shared_singletons(self):
+        built = []
+
+        def factory(api_key, base_url):
+            time.sleep(0.01)
+            built.append((api_key, base_url))
+            return mock.Mock()
+
+        with mock.patch.dict(registry._factories, {'genai': factory}), \
+                mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'k', 'GEMINI_BASE_URL': ''}):
+            clients = []
+            threads = [threading.Thread(target=lambda: clients.append(AIService().client)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(built, [('k', '')])
+            self.assertEqual(len({id(client) for client in clients}), 1)
+
+            # Farklı yapılandırma ayrı istemci; async istemci event loop başına
+            self.assertIsNot(registry.get('genai', 'k2', ''), clients[0])
+
+            async def loop_client():
+                return AIService().aio, AIService().aio
+            first, second = asyncio.run(loop_client())
+            self.assertIs(first, second)
+            self.assertIsNot(asyncio.run(loop_client())[0], first)
@@ -0,0 +1,120 @@
+import os
+from django.conf import settings
+from . import metrics
+from .cache import TTLCache
+from .models import Movie
+from .subtitle_store import find_subtitle, latest_entry, read_cues, save_cues
+from .subtitles import format_ms, parse_subtitle, parse_subtitle_file, parse_timestamp
+
+# Film başına ayrıştırılmış altyazı (başlangıca göre sıralı CueList) iki seviyede tutulur:
+# process içi TTLCache ve arşivde blob'un yanındaki cue indeksi (subtitle_store.save_cues).
+# Analiz worker'da yapılsa da web process'i altyazıyı yeniden ayrıştırmaz, indeksi diskten
+# okur; ilk okumadan sonra process önbelleğinden gelir. Aralığın sınırları sıralı başlangıç
+# dizisinde ikili aramayla (O(log n)) bulunur.
+TRANSCRIPT_CACHE_SIZE = 64
+TRANSCRIPT_TTL = 6 * 60 * 60
+
+_transcripts = TTLCache(maxsize=TRANSCRIPT_CACHE_SIZE, ttl=TRANSCRIPT_TTL)
+
+
+class TranscriptError(Exception):
+    def __init__(self, message, status=404):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def remember_cues(imdb_id, cues, sha256=None):
+    """
+    Analizin zaten ayrıştırdığı altyazıyı önbelleğe koyar (ilk transkript isteği parse etmesin).
+    sha256 verilirse (arşivdeki altyazı) indeks diğer process'ler için de diske yazılır.
+    """
+    _transcripts.set(imdb_id, cues)
+    if sha256:
+        try:
+            save_cues(sha256, cues)
+        except OSError as e:
+            print(f"Subtitle Store Error: {e}")
+
+
+def _stored_cues(imdb_id):
+    """Arşivdeki altyazının cue indeksi; indeks dosyası yoksa altyazı ayrıştırılıp yazılır."""
+    entry = latest_entry(imdb_id)
+    cues = read_cues(entry.sha256) if entry else None
+    metrics.cache_result('transcript_index', cues is not None)
+    if cues is not None:
+        return cues
+
+    stored = find_subtitle(imdb_id)
+    if not stored:
+        return None
+    with metrics.stage('transcript_parse'):
+        cues = parse_subtitle(stored[1])
+    if cues:
+        remember_cues(imdb_id, cues, stored[0].sha256)
+    return cues
+
+
+def load_cues(imdb_id):
+    """Filmin analizde kullanılan altyazısının CueList'i; bulunamazsa None."""
+    cues = _transcripts.get(imdb_id, None)
+    metrics.cache_result('transcript', cues is not None)
+    if cues is not None:
+        return cues
+
+    if settings.ANALYSIS_TEST_MODE:
+        path = os.path.join(settings.BASE_DIR, 'test.srt')
+        with metrics.stage('transcript_parse'):
+            cues = parse_subtitle_file(path) if os.path.exists(path) else None
+    else:
+        cues = _stored_cues(imdb_id)
+    if cues:
+        _transcripts.set(imdb_id, cues)
+    return cues or None
+
+
+def _episode_range(imdb_id, number):
+    episodes = (Movie.objects.filter(imdb_id=imdb_id, analysis_status=Movie.DONE)
+                .values_list('episode_data', flat=True).first())
+    if not episodes:
+        raise TranscriptError('Film henüz analiz edilmedi.')
+    for i, episode in enumerate(episodes):
+        if episode.get('episode') == number:
+            start_ms = parse_timestamp(episode.get('start')) or 0
+            # Son bölüm altyazının sonuna kadar sürer (AI bitişi birkaç saniye erken verebilir)
+            end_ms = None if i == len(episodes) - 1 else parse_timestamp(episode.get('end'))
+            return episode, start_ms, end_ms
+    raise TranscriptError(f'{number}. bölüm bulunamadı.')
+
+
+def transcript(imdb_id, episode=None, start=None, end=None):
+    """
+    Bölümün (episode=N) ya da [start, end) aralığının replikleri. start/end 'HH:MM:SS'
+    biçimindedir; verilmezse altyazının başı/sonu kullanılır. Aralıkta başlayan cue'lar döner.
+    """
+    info = {}
+    if episode is not None:
+        item, start_ms, end_ms = _episode_range(imdb_id, episode)
+        info = {'episode': episode, 'title': item.get('title')}
+    else:
+        start_ms = parse_timestamp(start) if start else 0
+        end_ms = parse_timestamp(end) if end else None
+        if start_ms is None or (end and end_ms is None):
+            raise TranscriptError('Zamanlar HH:MM:SS biçiminde olmalı.', status=400)
+        if end_ms is not None and end_ms <= start_ms:
+            raise TranscriptError('Bitiş başlangıçtan sonra olmalı.', status=400)
+
+    cues = load_cues(imdb_id)
+    if cues is None:
+        raise TranscriptError('Bu film için altyazı bulunamadı.')
+
+    selected = cues.between(start_ms, end_ms)
+    if end_ms is None:
+        end_ms = max((e for _, e, _ in selected), default=start_ms)
+    return {
+        'imdb_id': imdb_id,
+        **info,
+        'start': format_ms(start_ms),
+        'end': format_ms(end_ms),
+        'cues': [{'start': format_ms(s), 'start_ms': s, 'end_ms': e, 'text': text} for s, e, text in selected],
+    }
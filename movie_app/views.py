@@ -1,20 +1,28 @@
 import traceback
-import os
-from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from .models import Movie
-from .services import AIService, SubtitleService, MovieInfoService
-
-# --- MOD AYARI ---
-# True: API'leri atlar, sadece ana dizindeki 'test.srt' dosyasını okur.
-# False: Gerçek dünya modu. Önce OpenSubtitles, sonra Subliminal dener.
-TEST_MODE = False 
-
+from django.http import FileResponse, Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from . import metrics, posters
+from .ratelimit import RateLimited
+from .models import Movie, AnalysisJob
+from .services import MovieInfoService
+from .analysis import aanalyzed_movie, analyzed_movie, cached_result, ensure_movie
+from .jobs import aenqueue_analysis, astream_job, enqueue_analysis, job_payload, stream_job
+from .featured import featured_movies
+from .search_index import aautocomplete, autocomplete
+from .transcripts import TranscriptError, transcript
+from .response_cache import INDEX_KEY, INDEX_TTL, analyze_key, cached_response, detail_key
+
+def _rate_limited(error, **payload):
+    """Upstream sınırına takılan istek: 429 ve Retry-After başlığı."""
+    response = JsonResponse({**payload, 'error': error.message, 'retry_after': error.retry_after}, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+@cached_response(lambda request: INDEX_KEY, ttl=INDEX_TTL)
 def index(request):
-    # random.sample veya order_by('?') kullanılabilir
-    # Not: order_by('?') büyük veritabanlarında yavaştır ama başlangıç için harikadır.
-    movies = Movie.objects.exclude(title__isnull=True).order_by('?')[:12]
+    # order_by('?') yerine önbellekteki hazır havuzdan rastgele seçim (bkz. featured.py)
+    movies = featured_movies(12)
     return render(request, 'index.html', {'movies': movies})
 
 def open_movie_by_id(request, imdb_id):
@@ -25,25 +33,20 @@ def open_movie_by_id(request, imdb_id):
     """
     imdb_id = imdb_id.strip()
     
-    movie = Movie.objects.filter(imdb_id=imdb_id).first()
+    movie = Movie.objects.filter(imdb_id=imdb_id).only('slug').first()
     if movie and movie.slug:
         return redirect('movie_detail', slug=movie.slug)
     
-    info_service = MovieInfoService()
-    details = info_service.get_movie_details(imdb_id)
-    
-    if not details or not details.get('title'):
+    try:
+        new_movie = ensure_movie(imdb_id)
+    except RateLimited as e:
+        return _rate_limited(e)
+    if not new_movie or not new_movie.slug:
         return redirect('index')
-
-    new_movie = Movie.objects.create(
-        imdb_id=imdb_id,
-        title=details['title'],
-        movie_info=details,
-        episode_data=[] 
-    )
     
     return redirect('movie_detail', slug=new_movie.slug)
 
+@cached_response(lambda request, slug: detail_key(slug))
 def movie_detail(request, slug):
     """Film detay sayfası (SEO Uyumlu URL)."""
     movie = get_object_or_404(Movie, slug=slug)
@@ -53,86 +56,153 @@ def movie_detail(request, slug):
         'movie_info': movie.movie_info or {'title': movie.title}
     })
 
+def _analyze_cache_key(request):
+    imdb_id = request.GET.get('imdb_id', '').strip()
+    return analyze_key(imdb_id) if imdb_id else None
+
+@cached_response(_analyze_cache_key)
 def analyze_movie(request):
     """
-    Gelişmiş Analiz Motoru:
-    JavaScript tarafından çağrılır. Altyazı bulmak için 3 aşamalı hiyerarşi kullanır.
+    JavaScript tarafından çağrılır. Sonuç veritabanında varsa hemen döner,
+    yoksa analizi arka plan kuyruğuna ekler ve sayfanın takip edeceği iş bilgisini döner.
+    Kuyruğu `manage.py run_worker` işler.
     """
     try:
         imdb_id = request.GET.get('imdb_id', '').strip()
         if not imdb_id:
             return JsonResponse({'error': 'ID gerekli.'}, status=400)
 
-        movie_obj = Movie.objects.filter(imdb_id=imdb_id).first()
-        
         # 1. Önbellek Kontrolü
-        if movie_obj and movie_obj.episode_data:
-             return JsonResponse({
-                'source': 'Veritabanı',
-                'episodes': movie_obj.episode_data,
-                'movie_info': movie_obj.movie_info
-            })
-
-        info_service = MovieInfoService()
-        sub_service = SubtitleService()
-        ai_service = AIService()
-
-        movie_info = movie_obj.movie_info if movie_obj else info_service.get_movie_details(imdb_id)
-        
-        # --- ALTYAZI TEMİN HİYERARŞİSİ ---
-        raw_sub = ""
-        source_label = ""
-
-        if TEST_MODE:
-            # TEST MODU: Sadece yerel dosya
-            try:
-                with open(os.path.join(settings.BASE_DIR, 'test.srt'), 'r', encoding='utf-8') as f:
-                    raw_sub = f.read()
-                source_label = "Yerel Test Dosyası"
-            except FileNotFoundError:
-                return JsonResponse({'error': 'test.srt bulunamadı.'}, status=500)
-        else:
-            # GERÇEK MOD: Zincirleme Arama
-            # A: OpenSubtitles API dene
-            raw_sub = sub_service.get_subtitle(imdb_id)
-            source_label = "OpenSubtitles"
-
-            # B: Bulunamazsa Subliminal (Multi-Provider) dene
-            if not raw_sub:
-                print("⚠️ OpenSubtitles bulamadı, Subliminal deneniyor...")
-                raw_sub = sub_service.get_subtitle_alt(movie_info['title'])
-                source_label = "Subliminal (Alternatif Kaynaklar)"
-
-        if not raw_sub:
-            return JsonResponse({'error': 'Hiçbir kaynakta uygun altyazı bulunamadı.'}, status=404)
-
-        # --- AI ANALİZ ---
-        clean_sub = ai_service.clean_subtitle(raw_sub)
-        episodes = ai_service.split_movie_into_episodes(clean_sub)
-
-        if isinstance(episodes, dict) and "error" in episodes:
-             return JsonResponse({'error': episodes['error']}, status=500)
-
-        # Sonucu Veritabanına Yaz
-        if movie_obj:
-            movie_obj.episode_data = episodes
-            movie_obj.save()
-        
-        return JsonResponse({
-            'source': source_label,
-            'episodes': episodes,
-            'movie_info': movie_info
-        })
+        cached = cached_result(analyzed_movie(imdb_id))
+        metrics.cache_result('analysis_db', cached is not None)
+        if cached:
+            return JsonResponse(cached)
+
+        job = enqueue_analysis(imdb_id)
+        return JsonResponse(job_payload(job), status=202)
+
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'error': str(e)}, status=500)
+
+@cached_response(_analyze_cache_key)
+async def aanalyze_movie(request):
+    """analyze_movie'nin async karşılığı (ASGI altında core/asgi_urls.py yönlendirir)."""
+    try:
+        imdb_id = request.GET.get('imdb_id', '').strip()
+        if not imdb_id:
+            return JsonResponse({'error': 'ID gerekli.'}, status=400)
+
+        cached = cached_result(await aanalyzed_movie(imdb_id))
+        metrics.cache_result('analysis_db', cached is not None)
+        if cached:
+            return JsonResponse(cached)
+
+        job = await aenqueue_analysis(imdb_id)
+        return JsonResponse(job_payload(job), status=202)
 
     except Exception as e:
         traceback.print_exc()
         return JsonResponse({'error': str(e)}, status=500)
 
+def analysis_status(request, job_id):
+    """Kuyruktaki analiz işinin durumu: queued, running, done veya failed."""
+    job = get_object_or_404(AnalysisJob, id=job_id)
+    return JsonResponse(job_payload(job))
+
+def _event_stream(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # nginx gibi proxy'ler olayları biriktirmesin
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def analysis_stream(request, job_id):
+    """
+    Analiz işini Server-Sent Events ile izler: Gemini cevabı akarken tamamlanan her bölüm
+    'episode' olayı olarak gider, iş bitince tam sonuç 'done' (ya da 'failed') ile gelir.
+    WSGI'da her izleyici analiz boyunca bir thread tutar; yoğun kullanımda ASGI sürümü tercih edilmeli.
+    """
+    get_object_or_404(AnalysisJob, id=job_id)
+    return _event_stream(stream_job(job_id))
+
+async def aanalysis_stream(request, job_id):
+    """analysis_stream'in async karşılığı: bekleyen bağlantılar thread tutmaz."""
+    if not await AnalysisJob.objects.filter(id=job_id).aexists():
+        return JsonResponse({'error': 'Analiz işi bulunamadı.'}, status=404)
+    return _event_stream(astream_job(job_id))
+
+def episode_transcript(request, imdb_id):
+    """
+    Bölümün (?episode=N) ya da bir zaman aralığının (?start=HH:MM:SS&end=HH:MM:SS) replikleri.
+    Altyazı film başına bir kez ayrıştırılır; aralık sıralı cue indeksinde ikili aramayla bulunur.
+    """
+    episode = request.GET.get('episode', '').strip()
+    try:
+        if episode and not episode.isdigit():
+            raise TranscriptError('Bölüm numarası sayı olmalı.', status=400)
+        return JsonResponse(transcript(
+            imdb_id.strip(),
+            episode=int(episode) if episode else None,
+            start=request.GET.get('start', '').strip(),
+            end=request.GET.get('end', '').strip(),
+        ))
+    except TranscriptError as e:
+        return JsonResponse({'error': e.message}, status=e.status)
+
+def _with_thumbs(results):
+    """Açılır listedeki posterler yerel küçük kopyadan gelsin (önbellekteki sözlükler değiştirilmez)."""
+    return [{**result, 'PosterThumb': posters.poster_url(result.get('Poster'), 'thumb')} for result in results]
+
 def autocomplete_movies(request):
     """Canlı arama önerileri."""
     query = request.GET.get('q', '').strip()
     if len(query) < 3: return JsonResponse({'results': []})
     
-    info_service = MovieInfoService()
-    results = info_service.search_candidates(query)
-    return JsonResponse({'results': results})
\ No newline at end of file
+    # Önce yerel indeks; yeterli sonuç yoksa OMDb (bkz. search_index.py)
+    try:
+        results = autocomplete(query, MovieInfoService())
+    except RateLimited as e:
+        return _rate_limited(e, results=[])
+    return JsonResponse({'results': _with_thumbs(results)})
+
+async def aautocomplete_movies(request):
+    """autocomplete_movies'in async karşılığı: OMDb beklenirken event loop başka istekleri işler."""
+    query = request.GET.get('q', '').strip()
+    if len(query) < 3: return JsonResponse({'results': []})
+
+    try:
+        results = await aautocomplete(query, MovieInfoService())
+    except RateLimited as e:
+        return _rate_limited(e, results=[])
+    return JsonResponse({'results': _with_thumbs(results)})
+
+# Poster dosyaları kaynak URL ile adreslenir ve değişmez: tarayıcı bir yıl önbellekte tutar
+POSTER_MAX_AGE = 365 * 24 * 60 * 60
+# Varyant üretilemeyip orijinal sunulduysa (Pillow yok, bozuk resim) kısa süre: varyant
+# sonradan üretilince aynı URL'den gelsin, tarayıcı boyutlandırılmamış dosyada takılı kalmasın
+POSTER_FALLBACK_MAX_AGE = 60 * 60
+
+def poster(request, variant):
+    """
+    Yerel poster kopyası (?src= OMDb poster adresi). İlk istekte indirilip boyutlandırılır,
+    sonra diskten parça parça akıtılır. Kaynak alınamazsa tarayıcı orijinal adrese yönlendirilir.
+    """
+    src = request.GET.get('src', '')
+    if variant not in posters.VARIANTS or not posters.is_allowed(src):
+        raise Http404('Poster bulunamadı.')
+
+    path = posters.poster_file(src, variant)
+    if path is None:
+        return HttpResponseRedirect(src)
+
+    tag = posters.etag(posters.source_digest(src), path)
+    response = get_conditional_response(request, etag=tag)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type=posters.content_type(path))
+    response['ETag'] = tag
+    if posters.is_original(path):
+        patch_cache_control(response, public=True, max_age=POSTER_FALLBACK_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True, max_age=POSTER_MAX_AGE, immutable=True)
+    return response